@@ -0,0 +1,112 @@
+"""
+    benchmarks.bench_decode
+    ^^^^^^^^^^^^^^^^^^^^^^^
+
+    Measures JSON decode time per MB of the installed decoders and the cost
+    of gzip decompression for typical response shapes (a browse page, a
+    gallery page and a deep comment thread)
+
+    Usage: python benchmarks/bench_decode.py [--repeat N]
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+import zlib
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from deviantart.decoders import BACKENDS, json_loads, load_backend  # noqa: E402
+from deviantart.transport import read_body  # noqa: E402
+
+
+def load_mock(name):
+    with open(os.path.join(ROOT, "tests", "mocks", "response_%s.json" % name)) as f:
+        return json.load(f)
+
+
+def browse_page(size):
+    deviation = load_mock("deviation")
+    results = []
+    for i in range(size):
+        item = copy.deepcopy(deviation)
+        item["deviationid"] = "{:08X}-C9D1-A9B1-D823-47C4E3D2DB95".format(i)
+        results.append(item)
+    return {"has_more": True, "next_offset": size, "estimated_total": 10000, "results": results}
+
+
+def comment_thread(depth, width):
+    comment = load_mock("comments_siblings")["thread"][0]
+    thread = []
+    parents = [None]
+    for level in range(depth):
+        children = []
+        for parent in parents:
+            for i in range(width):
+                item = dict(comment, commentid="{}-{}-{}".format(level, len(thread), i), parentid=parent)
+                thread.append(item)
+                children.append(item["commentid"])
+        parents = children[:width]
+    return {"has_more": False, "next_offset": None, "has_less": False, "prev_offset": None, "thread": thread}
+
+
+SHAPES = [
+    ("browse (24 deviations)", lambda: browse_page(24)),
+    ("gallery (120 deviations)", lambda: browse_page(120)),
+    ("comments (maxdepth 5)", lambda: comment_thread(5, 10)),
+]
+
+
+def per_mb(func, body, repeat):
+    start = time.time()
+    for _ in range(repeat):
+        func(body)
+    elapsed = (time.time() - start) / repeat
+    return elapsed * 1000 / (len(body) / 1024.0 / 1024.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    decoders = [("json", json_loads)]
+    for name in BACKENDS:
+        loads = load_backend(name)
+        if loads is not None:
+            decoders.append((name, loads))
+
+    print("ms per MB of JSON, {} runs".format(args.repeat))
+    print("{:<26}{:>10}{:>8}".format("shape", "size", "gzip") + "".join("{:>12}".format(name) for name, _ in decoders) + "{:>12}".format("gunzip"))
+
+    for shape, build in SHAPES:
+        body = json.dumps(build()).encode("utf-8")
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        compressed = compressor.compress(body) + compressor.flush()
+
+        def gunzip(data):
+            chunks = [data[i:i + 4096] for i in range(0, len(data), 4096)]
+            chunks.reverse()
+            return read_body(lambda size: chunks.pop() if chunks else b"", {"content-encoding": "gzip"})
+
+        row = "{:<26}{:>9.0f}K{:>7.0%}".format(shape, len(body) / 1024.0, len(compressed) / float(len(body)))
+        for _, loads in decoders:
+            row += "{:>12.1f}".format(per_mb(loads, body, args.repeat))
+        # decompression time per MB of decompressed JSON
+        start = time.time()
+        for _ in range(args.repeat):
+            gunzip(compressed)
+        row += "{:>12.1f}".format((time.time() - start) / args.repeat * 1000 / (len(body) / 1024.0 / 1024.0))
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+    benchmarks.bench_memory
+    ^^^^^^^^^^^^^^^^^^^^^^^
+
+    Measures the memory every decoded model takes, with the slotted model
+    classes and with equivalent classes keeping their attributes in a
+    per-instance __dict__ (as the models did before they got __slots__)
+
+    Only the models themselves are counted, not the decoded response values
+    they refer to. Nested models (the author of a deviation, the subject of
+    a message) are included.
+
+    Usage: python benchmarks/bench_memory.py [--count N]
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+from bench_models import SHAPES
+
+from deviantart import comment, deviation, message, status, user  # noqa: E402
+from deviantart.schema import Field, define  # noqa: E402
+
+#: The model classes by name
+MODELS = dict((cls.__name__, cls) for cls in (comment.Comment, deviation.Deviation, message.Message, status.Status, user.User))
+
+#: Models before the models nesting them
+DEFINE_ORDER = ("User", "Deviation", "Comment", "Status", "Message")
+
+
+def _with_dict(cls):
+
+    """A copy of a slotted class that keeps its attributes in a __dict__"""
+
+    slots = set(getattr(cls, "__slots__", ()))
+    namespace = dict((name, value) for name, value in vars(cls).items() if name not in slots and name not in ("__slots__", "__dict__", "__weakref__"))
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+def _define(models):
+
+    """Generates the decoders of models (name => class), nesting each other"""
+
+    def model(cls):
+        return cls and models[cls.__name__]
+
+    for name in DEFINE_ORDER:
+        fields = [
+            Field(f.name, f.key, f.required, model(f.model),
+                  f.models and dict((key, model(cls)) for key, cls in f.models.items()), f.many)
+            for f in MODELS[name].fields
+        ]
+        define(models[name], fields)
+
+
+@contextmanager
+def dict_models():
+
+    """Decodes nested models to copies with a __dict__ of the model classes"""
+
+    copies = dict((name, _with_dict(cls)) for name, cls in MODELS.items())
+    _define(copies)
+    try:
+        yield copies
+    finally:
+        _define(MODELS)
+
+
+def retained(cls, items, count):
+
+    """Bytes per object kept alive after decoding count objects from items"""
+
+    payload = [items[i % len(items)] for i in range(count)]
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        models = []
+        for item in payload:
+            model = cls()
+            model.from_dict(item)
+            models.append(model)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    # the list holding the models is not part of them
+    return (after - before - sys.getsizeof(models)) / float(count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("bytes per decoded object, {} objects".format(args.count))
+    print("{:<28}{:>10}{:>12}{:>12}{:>10}".format("shape", "model", "__dict__", "__slots__", "saved"))
+
+    for shape, model, payload in SHAPES:
+        items = payload()
+        slotted = retained(model, items, args.count)
+        with dict_models() as copies:
+            with_dict = retained(copies[model.__name__], items, args.count)
+
+        print("{:<28}{:>10}{:>12.0f}{:>12.0f}{:>10.0%}".format(shape, model.__name__, with_dict, slotted, 1 - slotted / with_dict))
+
+
+if __name__ == "__main__":
+    main()
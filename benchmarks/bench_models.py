@@ -0,0 +1,164 @@
+"""
+    benchmarks.bench_models
+    ^^^^^^^^^^^^^^^^^^^^^^^
+
+    Measures how fast the models are built from decoded responses (by
+    deviantart.schema.decode_many, as in the listing methods) and how much
+    memory they take, for typical response shapes (a gallery page, a
+    deep comment thread, a stacked message feed with nested subjects, a
+    watcher list and a status feed)
+
+    Usage: python benchmarks/bench_models.py [--repeat N] [--lazy] [--identity-map] [--json]
+
+    With --lazy the lazy models of :mod:`deviantart.lazy` are built instead,
+    no field of them being read. With --identity-map every page is decoded
+    with an identity map of its own, sharing the repeated users. With --json
+    every shape is printed as one JSON object per line, to be appended to a
+    file and compared over time.
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import copy
+import json
+import platform
+import time
+import tracemalloc
+
+from bench_decode import browse_page, comment_thread, load_mock
+
+from deviantart.comment import Comment
+from deviantart.deviation import Deviation
+from deviantart.identity import IdentityMap
+from deviantart.lazy import lazy_class
+from deviantart.message import Message
+from deviantart.schema import decode_many
+from deviantart.status import Status
+from deviantart.user import User
+
+
+def users(size):
+    user = load_mock("user_profile_devart")["user"]
+    return [dict(user, userid="{:08X}-9A7B-3FA1-BBF5-5F8841ABB8D7".format(i), username="user{}".format(i)) for i in range(size)]
+
+
+def statuses(size):
+    author = users(1)[0]
+    return [{
+        "statusid": "{:08X}-D3C1-4B5A-8E3B-6B4E9F1A2C3D".format(i),
+        "body": "Status update number {} with a few words of text".format(i),
+        "ts": "2015-01-01T00:00:00-0800",
+        "url": "http://devart.deviantart.com/statuses/{}".format(i),
+        "comments_count": i % 7,
+        "is_share": False,
+        "is_deleted": False,
+        "author": author,
+    } for i in range(size)]
+
+
+def message_feed(size):
+    deviation = load_mock("deviation")
+    people = users(10)
+    kinds = ["deviation", "profile", "status"]
+
+    results = []
+    for i in range(size):
+        kind = kinds[i % len(kinds)]
+        if kind == "deviation":
+            subject = {"deviation": copy.deepcopy(deviation)}
+        elif kind == "profile":
+            subject = {"profile": people[i % 10]}
+        else:
+            subject = {"status": statuses(1)[0]}
+        results.append({
+            "messageid": "{:08X}-0000-0000-0000-000000000000".format(i),
+            "type": "feedback.{}".format(kind),
+            "orphaned": False,
+            "ts": "2015-01-01T00:00:00-0800",
+            "stackid": "stack{}".format(i // 5),
+            "stack_count": 5,
+            "originator": people[i % 10],
+            "subject": subject,
+            "html": "<b>user{}</b> did something".format(i % 10),
+        })
+    return results
+
+
+def build(cls, identity_map=False):
+    if identity_map:
+        return lambda items: decode_many(cls, items, IdentityMap())
+    return lambda items: decode_many(cls, items)
+
+
+#: (shape, model, items) of every benchmarked response
+SHAPES = [
+    ("gallery (120 deviations)", Deviation, lambda: browse_page(120)["results"]),
+    ("comments (maxdepth 5)", Comment, lambda: comment_thread(5, 10)["thread"]),
+    ("messages (stacked feed)", Message, lambda: message_feed(50)),
+    ("watchers (50 users)", User, lambda: users(50)),
+    ("statuses (50)", Status, lambda: statuses(50)),
+]
+
+
+def items_per_sec(decode, items, repeat):
+    start = time.time()
+    for _ in range(repeat):
+        decode(items)
+    return len(items) * repeat / (time.time() - start)
+
+
+def peak_memory(decode, items):
+
+    """Peak bytes allocated while decoding items, the models being kept"""
+
+    tracemalloc.start()
+    try:
+        models = decode(items)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del models
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--lazy", action="store_true", help="build lazy models")
+    parser.add_argument("--identity-map", action="store_true", help="share repeated users")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per shape")
+    args = parser.parse_args()
+
+    if not args.json:
+        print("{}model decoding, {} runs".format("lazy " if args.lazy else "", args.repeat))
+        print("{:<28}{:>10}{:>8}{:>14}{:>12}{:>14}".format("shape", "model", "items", "items/sec", "peak KB", "bytes/item"))
+
+    for shape, model, payload in SHAPES:
+        items = payload()
+        decode = build(lazy_class(model) if args.lazy else model, args.identity_map)
+
+        rate = items_per_sec(decode, items, args.repeat)
+        peak = peak_memory(decode, items)
+
+        if args.json:
+            print(json.dumps({
+                "shape": shape,
+                "model": model.__name__,
+                "lazy": args.lazy,
+                "identity_map": args.identity_map,
+                "items": len(items),
+                "items_per_sec": round(rate),
+                "peak_bytes": peak,
+                "bytes_per_item": peak // len(items),
+                "python": platform.python_version(),
+                "time": int(time.time()),
+            }, sort_keys=True))
+        else:
+            print("{:<28}{:>10}{:>8}{:>14,.0f}{:>12.1f}{:>14}".format(shape, model.__name__, len(items), rate, peak / 1024.0, peak // len(items)))
+
+
+if __name__ == "__main__":
+    main()
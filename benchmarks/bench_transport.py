@@ -0,0 +1,108 @@
+"""
+    benchmarks.bench_transport
+    ^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    Compares requests/sec of the pooled keep-alive transport with opening a
+    new connection per call (the way sanction talks to the API)
+
+    Usage: python benchmarks/bench_transport.py [--requests N] [--threads N]
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from deviantart.transport import PooledTransport, UrllibTransport  # noqa: E402
+
+BODY = json.dumps({
+    "deviationid": "234546F5-C9D1-A9B1-D823-47C4E3D2DB95",
+    "printid": None,
+    "title": "Jark Promo",
+    "stats": {"comments": 12, "favourites": 340},
+}).encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def run(transport, url, requests, threads):
+    per_thread = requests // threads
+
+    def worker():
+        for _ in range(per_thread):
+            transport.request("GET", url)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.time() - start
+
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = "http://127.0.0.1:{}/api/v1/oauth2/deviation/x".format(server.server_address[1])
+
+    results = [
+        ("per-call connections", UrllibTransport()),
+        ("pooled keep-alive", PooledTransport(maxsize=args.threads)),
+    ]
+
+    print("{} requests, {} threads".format(args.requests, args.threads))
+    for name, transport in results:
+        rate = run(transport, url, args.requests, args.threads)
+        print("{:<22} {:>10.1f} req/s".format(name, rate))
+        transport.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,4 +7,10 @@
     :copyright: (c) 2015 by Kevin Eichhorn
 """
 
-from .api import Api
\ No newline at end of file
+from .api import Api
+
+try:
+    from .aio import AsyncApi
+except SyntaxError:
+    # asyncio interface requires Python 3.5+
+    pass
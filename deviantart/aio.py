@@ -0,0 +1,884 @@
+"""
+    deviantart.aio
+    ^^^^^^^^^^^^^^
+
+    asyncio interface to the DeviantArt API (Python 3.5+)
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+import asyncio
+import functools
+import time
+from urllib.parse import urlsplit
+
+from .api import Api, DeviantartError
+from .cache import BaseCache
+from .cassette import ReplayTransport
+from .metrics import clock, endpoint_label
+from .pagination import CursorIterator, PageIterator, ParallelPageIterator, item_id
+from .singleflight import SingleFlight
+from .tracing import activated
+from .transport import CHUNK_SIZE, ConnectError, Response, decompressor, request_headers
+
+
+class AsyncTransport(object):
+
+    """Base class of all asyncio transports
+
+    Works like :class:`deviantart.transport.Transport`, but :meth:`request`
+    and :meth:`close` are coroutines.
+    """
+
+    async def request(self, method, url, body=None, headers=None):
+
+        """Send a request and return the :class:`deviantart.transport.Response`
+
+        :param method: the HTTP method
+        :param url: the absolute URL to request
+        :param body: the encoded request body
+        :param headers: additional request headers
+        """
+
+        raise NotImplementedError
+
+    async def close(self):
+
+        """Release all resources held by the transport"""
+
+        pass
+
+
+class _Connection(object):
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncPooledTransport(AsyncTransport):
+
+    """Non-blocking HTTP/1.1 transport that keeps connections alive
+
+    :param maxsize: the number of idle connections kept per host
+    :param idle_timeout: seconds after which an idle connection is discarded
+    :param timeout: seconds a single request may take
+    :param compress: whether to ask for gzip compressed responses
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=60, timeout=30, compress=True):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.compress = compress
+        self.connections_opened = 0
+
+        self._pools = {}
+
+    async def request(self, method, url, body=None, headers=None):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path = "{}?{}".format(path, parts.query)
+
+        host = parts.hostname
+        if parts.port:
+            host = "{}:{}".format(host, parts.port)
+
+        lines = ["{} {} HTTP/1.1".format(method, path), "Host: {}".format(host)]
+        for name, value in request_headers(headers, self.compress).items():
+            lines.append("{}: {}".format(name, value))
+        if body is not None:
+            lines.append("Content-Length: {}".format(len(body)))
+        raw = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b"")
+
+        start = time.monotonic()
+        conn, reused = await self._acquire(key)
+        connect_time = 0.0 if reused else time.monotonic() - start
+
+        try:
+            response, keep_alive = await asyncio.wait_for(self._exchange(conn, method, raw), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            conn.close()
+
+            if not reused or not getattr(e, "unsent", False):
+                raise
+
+            # the server closed the idle connection before we used it, the
+            # request never reached it so it is safe to send it again
+            start = time.monotonic()
+            conn, reused = await self._acquire(key, fresh=True)
+            connect_time = time.monotonic() - start
+            try:
+                response, keep_alive = await asyncio.wait_for(self._exchange(conn, method, raw), self.timeout)
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            conn.close()
+            raise
+
+        if keep_alive:
+            self._release(key, conn)
+        else:
+            conn.close()
+
+        response.connect_time = connect_time
+        return response
+
+    async def close(self):
+        pools, self._pools = self._pools, {}
+
+        for pool in pools.values():
+            for conn in pool:
+                conn.close()
+
+    async def _acquire(self, key, fresh=False):
+
+        """Take an idle connection for key out of the pool or open a new one"""
+
+        if not fresh:
+            now = time.monotonic()
+            pool = self._pools.get(key)
+            while pool:
+                conn = pool.pop()
+                if now - conn.last_used <= self.idle_timeout and not conn.reader.at_eof():
+                    return conn, True
+                conn.close()
+
+        scheme, host, port = key
+        try:
+            if scheme == "https":
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port or 443, ssl=True), self.timeout)
+            else:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port or 80), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise ConnectError(e)
+
+        self.connections_opened += 1
+
+        return _Connection(reader, writer), False
+
+    def _release(self, key, conn):
+
+        """Put a connection back into the pool of key"""
+
+        pool = self._pools.setdefault(key, [])
+        if len(pool) < self.maxsize:
+            conn.last_used = time.monotonic()
+            pool.append(conn)
+        else:
+            conn.close()
+
+    async def _exchange(self, conn, method, raw):
+
+        """Write a request to conn and read the response
+
+        Errors are marked unsent like the ones of
+        :meth:`deviantart.transport.PooledTransport._exchange`, when writing
+        failed or the connection was closed before the status line.
+        """
+
+        try:
+            conn.writer.write(raw)
+            await conn.writer.drain()
+
+            status_line = await conn.reader.readline()
+        except ConnectionError as e:
+            e.unsent = True
+            raise
+        if not status_line:
+            e = ConnectionResetError("Connection closed by server")
+            e.unsent = True
+            raise e
+
+        version, status, reason = (status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+
+        headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        status = int(status)
+        keep_alive = version == "HTTP/1.1"
+        connection = headers.get("connection", "").lower()
+        if connection == "close":
+            keep_alive = False
+        elif connection == "keep-alive":
+            keep_alive = True
+
+        decoder = decompressor(headers)
+        chunks = []
+        received = 0
+
+        async def read(size):
+            nonlocal received
+            chunk = await conn.reader.readexactly(size) if size else await conn.reader.read(CHUNK_SIZE)
+            received += len(chunk)
+            chunks.append(decoder.decompress(chunk) if decoder else chunk)
+            return chunk
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            pass
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await conn.reader.readline()).split(b";")[0], 16)
+                if not size:
+                    break
+                while size:
+                    size -= len(await read(min(size, CHUNK_SIZE)))
+                await conn.reader.readexactly(2)
+            while (await conn.reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+        elif "content-length" in headers:
+            size = int(headers["content-length"])
+            while size:
+                size -= len(await read(min(size, CHUNK_SIZE)))
+        else:
+            while await read(0):
+                pass
+            keep_alive = False
+
+        if decoder:
+            chunks.append(decoder.flush())
+        body = b"".join(chunks)
+
+        return Response.decoded(status, headers, body, reason, received), keep_alive
+
+
+class AsyncReplayTransport(AsyncTransport):
+
+    """:class:`deviantart.cassette.ReplayTransport` for :class:`AsyncApi`
+
+    :param path: the cassette file written by :class:`deviantart.cassette.RecordingTransport`
+    :param latency: seconds to wait before every response, "recorded" to wait as long as the recorded request took, or None
+    """
+
+    def __init__(self, path, latency=None):
+        self.replay = ReplayTransport(path, latency)
+
+    async def request(self, method, url, body=None, headers=None):
+        interaction = self.replay.next_interaction(method, url, body)
+
+        delay = self.replay.delay(interaction)
+        if delay:
+            await asyncio.sleep(delay)
+
+        return ReplayTransport.response(interaction)
+
+
+class AsyncSingleFlight(SingleFlight):
+
+    """:class:`deviantart.singleflight.SingleFlight` for coroutines"""
+
+    async def do(self, key, func, *args):
+
+        """Awaits func(*args) unless a call with the same key is in flight
+
+        :param key: identifies calls with the same result
+        :param func: the coroutine function to call
+        """
+
+        future, leader = self._join(key, asyncio.get_event_loop().create_future)
+
+        if not leader:
+            return await asyncio.shield(future)
+
+        try:
+            result = await func(*args)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # retrieved here, so no warning is logged if nobody waited
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            self._leave(key)
+
+        return result
+
+
+class AsyncPageIterator(PageIterator):
+
+    """:class:`deviantart.pagination.PageIterator` for :class:`AsyncApi`, iterated with ``async for``
+
+    fetch returns a coroutine, the pages are fetched ahead by a task. An
+    iteration left early should be ended with :meth:`aclose` (or ``async
+    with``), which waits for the cancelled fetches::
+
+        async with da.iter_gallery_all("devart") as deviations:
+            async for deviation in deviations:
+                if deviation.is_mature:
+                    break
+    """
+
+    def __init__(self, fetch, offset=0, key="results", max_items=None, prefetch=1, checkpoint=None):
+        PageIterator.__init__(self, fetch, offset, key, max_items, prefetch, checkpoint)
+        self._offset = self.offset
+        self._fetched = 0
+        self._task = None
+        self._cancelled = []
+
+    def __aiter__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _fetch_next(self):
+        if self._offset is None:
+            return None
+
+        page = await self.fetch(self._offset)
+        self._fetched += len(page[self.key])
+        self._offset = self._following(page, self._fetched)
+
+        return page
+
+    async def _produce(self):
+        try:
+            while True:
+                page = await self._fetch_next()
+                await self._queue.put((page, None))
+                if page is None:
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._queue.put((None, e))
+
+    async def _anext_page(self):
+        if self._error is not None:
+            raise self._error
+
+        if self.prefetch <= 0:
+            try:
+                return await self._fetch_next()
+            except Exception as e:
+                self._fail(e)
+                raise
+
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.prefetch)
+            self._task = asyncio.ensure_future(self._produce())
+
+        page, error = await self._queue.get()
+        if error is not None:
+            self._fail(error)
+            raise error
+
+        return page
+
+    async def __anext__(self):
+        try:
+            return await self._anext()
+        except Exception:
+            # the iteration is over, StopAsyncIteration included
+            await self._reap()
+            raise
+
+    async def _anext(self):
+        if self._limit_reached():
+            raise StopAsyncIteration
+
+        while not self._items:
+            if self._ended():
+                self.close()
+                raise StopAsyncIteration
+            if not self._consume(await self._anext_page()):
+                raise StopAsyncIteration
+
+        return self._emit()
+
+    def close(self):
+        PageIterator.close(self)
+        if self._task is not None:
+            self._task.cancel()
+            self._cancelled.append(self._task)
+            self._task = None
+
+    async def aclose(self):
+
+        """Closes the iterator and waits until its cancelled fetches are finished"""
+
+        self.close()
+        await self._reap()
+
+    async def _reap(self):
+
+        """Waits for the tasks cancelled so far"""
+
+        tasks, self._cancelled = self._cancelled, []
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AsyncParallelPageIterator(AsyncPageIterator, ParallelPageIterator):
+
+    """:class:`deviantart.pagination.ParallelPageIterator` for :class:`AsyncApi`, the pages are fetched by tasks"""
+
+    def __init__(self, fetch, offset=0, key="results", max_items=None, prefetch=1, fanout=4, identity=item_id, checkpoint=None):
+        ParallelPageIterator.__init__(self, fetch, offset, key, max_items, prefetch, fanout, identity, checkpoint)
+        self._offset = self.offset
+        self._fetched = 0
+        self._task = None
+        self._cancelled = []
+        self._pending = {}
+
+    def _cancel_pending(self):
+        for task in self._pending.values():
+            task.cancel()
+            self._cancelled.append(task)
+        self._pending.clear()
+
+    async def _fetch_next(self):
+        offset = self._offset
+        if offset is None:
+            return None
+
+        if self._step is None:
+            page = await self.fetch(offset)
+            self._fetched = len(page[self.key])
+            self._offset = self._plan(page, offset)
+            return page
+
+        if offset not in self._pending:
+            # the listing moved on differently than planned, start over from offset
+            self._cancel_pending()
+            self._next_window = offset
+        self._schedule(self._pending, lambda window: asyncio.ensure_future(self.fetch(window)))
+
+        page = await self._pending.pop(offset)
+        self._fetched += len(page[self.key])
+        self._offset = self._merged(page, offset, self._fetched)
+        if self._offset is None:
+            self._cancel_pending()
+
+        return page
+
+    def close(self):
+        AsyncPageIterator.close(self)
+        self._cancel_pending()
+
+
+class AsyncCursorIterator(AsyncPageIterator, CursorIterator):
+
+    """:class:`deviantart.pagination.CursorIterator` for :class:`AsyncApi`, iterated with ``async for``"""
+
+    def __init__(self, fetch, cursor="", key="results", max_items=None, prefetch=1, checkpoint=None, decode=None):
+        CursorIterator.__init__(self, fetch, cursor, key, max_items, prefetch, checkpoint, decode)
+        self._offset = self.offset
+        self._fetched = 0
+        self._task = None
+        self._cancelled = []
+
+
+class _Deferred(BaseException):
+
+    """Raised by :meth:`AsyncApi._req` when a method needs a response that
+    has not been fetched yet"""
+
+
+class AsyncApi(Api):
+
+    """The asyncio API Interface
+
+    Offers every method of :class:`deviantart.api.Api` as a coroutine. The
+    parameters are validated and the results are decoded by the very same
+    code as in the blocking interface, only the requests are sent through a
+    non-blocking transport. The iter_ methods and stream_messages return
+    iterators for ``async for``.
+
+    :param client_id: client_id provided by DeviantArt
+    :param client_secret: client_secret provided by DeviantArt
+    :param standard_grant_type: The used authorization type | client_credentials (read-only) or authorization_code
+    :param scope: The scope of data the application can access
+    :param transport: The :class:`AsyncTransport` used to send API requests
+    :param max_concurrency: The maximum number of requests in flight at once (unbounded if None)
+    :param rate_limiter: A :class:`deviantart.ratelimit.RateLimiter` pacing the requests (can be shared between instances)
+    :param retry_policy: The :class:`deviantart.retry.RetryPolicy` for failed requests (defaults to 3 retries of reads)
+    :param refresh_margin: Seconds before its expiry the access token is refreshed in the background
+    :param token_store: A :class:`deviantart.tokenstore.TokenStore` to share still valid tokens between processes
+    :param cache: A :class:`deviantart.cache.ResponseCache`, :class:`deviantart.cache.SQLiteCache` or :class:`deviantart.cache.TieredCache` for responses of read endpoints
+    :param coalesce: Whether concurrent identical read calls share one request
+    :param decoder: A function decoding JSON bodies (given as utf-8 bytes), or "auto" for the fastest installed JSON library
+    :param metrics: The :class:`deviantart.metrics.MetricsSink` measurements are reported to (defaults to a :class:`deviantart.metrics.Metrics`)
+    :param tracer: The :class:`deviantart.tracing.Tracer` opening a span for every API call
+    :param lazy: Whether models keep the decoded response and build each field when it is first read (see :mod:`deviantart.lazy`, they cannot be shared by an identity_map)
+    :param raw: Whether the decoded items of responses are returned as they are instead of models (the listing methods take a raw parameter as well)
+    :param identity_map: A :class:`deviantart.identity.IdentityMap` sharing repeated users between the results of all calls, or True for a new one (the listing methods take an identity_map parameter as well). Users fetched by name are always fetched anew.
+    """
+
+    _page_iterator = AsyncPageIterator
+    _parallel_page_iterator = AsyncParallelPageIterator
+    _cursor_iterator = AsyncCursorIterator
+
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        redirect_uri="",
+        standard_grant_type="client_credentials",
+        scope="browse feed message note stash user user.manage comment.post collection",
+        transport=None,
+        max_concurrency=None,
+        rate_limiter=None,
+        retry_policy=None,
+        refresh_margin=300,
+        token_store=None,
+        cache=None,
+        coalesce=True,
+        decoder=None,
+        metrics=None,
+        tracer=None,
+        lazy=False,
+        raw=False,
+        identity_map=None
+    ):
+
+        Api.__init__(
+            self,
+            client_id,
+            client_secret,
+            redirect_uri=redirect_uri,
+            standard_grant_type=standard_grant_type,
+            scope=scope,
+            transport=transport or AsyncPooledTransport(),
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            refresh_margin=refresh_margin,
+            token_store=token_store,
+            cache=cache,
+            coalesce=False,
+            decoder=decoder,
+            metrics=metrics,
+            tracer=tracer,
+            lazy=lazy,
+            raw=raw,
+            identity_map=identity_map
+        )
+        self.max_concurrency = max_concurrency
+        self.single_flight = AsyncSingleFlight() if coalesce else None
+
+        self._responses = None
+        self._semaphore = None
+        self._auth_lock = None
+        self._background_task = None
+
+
+
+    async def auth(self, code="", refresh_token=""):
+
+        """Authenticates user and retrieves (and refreshes) access token
+
+        :param code: code provided after redirect (authorization_code only)
+        :param refresh_token: the refresh_token to update access_token without authorization
+        """
+
+        params = self._token_params(code, refresh_token)
+        method, url, encdata, headers = self._prepare_token_request(params)
+
+        response = await self._asend(method, url, encdata, headers, idempotent=params['grant_type'] == "client_credentials")
+
+        self._store_token(params, response)
+
+
+
+    async def close(self):
+
+        """Close all connections of the transport"""
+
+        await self.transport.close()
+
+
+
+    async def _call(self, method, args, kwargs):
+
+        """Run a method of the blocking interface, fetching the responses
+        it asks for without blocking
+
+        The method is run synchronously until it needs a response that is not
+        there yet, which is then fetched and the method run again from the
+        start. Nothing is awaited while the method runs, so other tasks never
+        see the replayed responses.
+        """
+
+        responses = []
+
+        while True:
+            self._responses = iter(responses)
+            try:
+                return method(self, *args, **kwargs)
+            except _Deferred as e:
+                request = e.args
+            finally:
+                self._responses = None
+
+            responses.append(await self._areq(*request))
+
+
+
+    def _req(self, endpoint, get_data=dict(), post_data=dict(), idempotent=None):
+
+        """Replays an already fetched response or defers the API call"""
+
+        # models are built right after this returns, before anything is awaited
+        self._local.endpoint = endpoint_label(endpoint)
+
+        try:
+            return next(self._responses)
+        except StopIteration:
+            raise _Deferred(endpoint, get_data, post_data, idempotent)
+
+
+
+    def _in_span(self, fetch, span):
+
+        """Wraps the page fetching coroutine function of an iterator to make its requests children of span"""
+
+        async def run(*args):
+            with activated(span):
+                return await fetch(*args)
+
+        return run
+
+
+
+    async def _messages_page(self, params):
+
+        """Fetches an undecoded page of the messages feed without blocking"""
+
+        return await self._areq('/messages/feed', params)
+
+
+
+    async def _areq(self, endpoint, get_data=dict(), post_data=dict(), idempotent=None):
+
+        """Helper method to make API calls without blocking
+
+        :param endpoint: The endpoint to make the API call to
+        :param get_data: data send through GET
+        :param post_data: data send through POST
+        :param idempotent: whether the call may be retried after it was sent (defaults to True without post_data)
+        """
+
+        if idempotent is None:
+            idempotent = not post_data
+
+        label = endpoint_label(endpoint)
+        get_data = self._resolve_limit(label, get_data)
+        self.metrics.increment(label, "calls")
+        span, token = self.tracer.start(label, endpoint=endpoint, params=dict(get_data))
+        error = None
+
+        try:
+            cache_key, cached = self._cache_lookup(endpoint, get_data, post_data, idempotent)
+            if cached is not None and cached.fresh:
+                span.attributes["cached"] = True
+                return self._decode_timed(label, cached.response())
+
+            if idempotent and self.single_flight is not None:
+                key = cache_key or BaseCache.key(endpoint, get_data, post_data)
+                response = await self.single_flight.do(key, self._afetch, endpoint, get_data, post_data, idempotent, cached)
+            else:
+                response = await self._afetch(endpoint, get_data, post_data, idempotent, cached)
+
+            span.attributes["status"] = response.status
+            span.attributes["bytes"] = response.received
+            data = self._decode_timed(label, response)
+            self._cache_update(endpoint, cache_key, idempotent, response)
+        except Exception as e:
+            error = e
+            self.metrics.increment(label, "errors")
+            raise
+        finally:
+            self.tracer.finish(span, token, error)
+
+        return data
+
+
+
+    async def _afetch(self, endpoint, get_data, post_data, idempotent, cached=None):
+
+        """Sends an API call without blocking and returns its :class:`deviantart.transport.Response`
+
+        :param endpoint: The endpoint to make the API call to
+        :param get_data: data send through GET
+        :param post_data: data send through POST
+        :param idempotent: whether the call may be retried after it was sent
+        :param cached: a stale :class:`deviantart.cache.CacheEntry` to revalidate
+        """
+
+        await self._aensure_token()
+        token = self.access_token
+
+        method, url, encdata, headers = self._prepare_request(endpoint, get_data, post_data, cached)
+        response = await self._asend(method, url, encdata, headers, idempotent, endpoint)
+
+        if self._token_rejected(response):
+            # the call was not processed, so it is replayed once with a new token
+            await self._arefresh(token)
+            method, url, encdata, headers = self._prepare_request(endpoint, get_data, post_data, cached)
+            response = await self._asend(method, url, encdata, headers, idempotent, endpoint)
+
+        clamped = self._limit_rejected(endpoint, get_data, response)
+        if clamped is not None:
+            method, url, encdata, headers = self._prepare_request(endpoint, clamped, post_data, cached)
+            response = await self._asend(method, url, encdata, headers, idempotent, endpoint)
+
+        return self._cache_revalidated(cached, response)
+
+
+
+    async def _asend(self, method, url, encdata, headers, idempotent, endpoint=None):
+
+        """Sends a request through the transport, pacing and retrying it
+
+        :param method: The HTTP method
+        :param url: The absolute URL
+        :param encdata: The encoded request body
+        :param headers: The request headers
+        :param idempotent: whether the request may be retried after it was sent
+        :param endpoint: The API endpoint used for rate limiting (None to skip)
+        """
+
+        if self._semaphore is None and self.max_concurrency:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        attempt = 0
+
+        while True:
+            if self.rate_limiter is not None and endpoint is not None:
+                delay = self.rate_limiter.reserve(endpoint)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            response = error = None
+
+            try:
+                if self._semaphore is None:
+                    start = clock()
+                    response = await self.transport.request(method, url, body=encdata, headers=headers)
+                else:
+                    async with self._semaphore:
+                        start = clock()
+                        response = await self.transport.request(method, url, body=encdata, headers=headers)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                error = e
+            else:
+                if endpoint is not None:
+                    self._report_rate(endpoint, response)
+                    self._report_transfer(endpoint, response, clock() - start)
+
+            delay = self.retry_policy.backoff(attempt, idempotent, response=response, error=error)
+            if delay is None:
+                break
+
+            self._report_retry(attempt, delay, response, error)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if error is not None:
+            raise DeviantartError(error)
+
+        return response
+
+
+
+    async def _aensure_token(self):
+
+        """Makes sure a valid access token is present before a request"""
+
+        if self.access_token is None:
+            if self.standard_grant_type == "client_credentials" or self.token_store is not None:
+                await self._arefresh(None)
+            return
+
+        if self.token_expires is None:
+            return
+
+        remaining = self.token_expires - time.time()
+
+        if remaining <= 0:
+            await self._arefresh(self.access_token)
+        elif remaining <= self.refresh_margin:
+            if self._background_task is None or self._background_task.done():
+                self._background_task = asyncio.ensure_future(self._arefresh_quietly(self.access_token))
+
+
+
+    async def _arefresh(self, stale_token):
+
+        """Replaces stale_token by a new access token, one refresh at a time
+
+        The token_store is consulted first, but its file lock is not taken
+        as that would block the event loop while another process waits for
+        a token.
+
+        :param stale_token: the access token that has to be replaced
+        """
+
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+
+        async with self._auth_lock:
+            if self.access_token != stale_token:
+                return
+
+            if self.token_store is not None and self._load_token(stale_token):
+                return
+
+            if self.refresh_token:
+                await self.auth(refresh_token=self.refresh_token)
+            elif self.standard_grant_type == "client_credentials":
+                await self.auth()
+            else:
+                raise DeviantartError("The access token expired and no refresh_token is available, please authorize again.")
+
+
+
+    async def _arefresh_quietly(self, stale_token):
+
+        """Background refresh, a failure is retried by the next request"""
+
+        try:
+            await self._arefresh(stale_token)
+        except DeviantartError:
+            pass
+
+
+def _coroutine(method):
+
+    """Turns a method of the blocking interface into a coroutine"""
+
+    @functools.wraps(method)
+    async def call(self, *args, **kwargs):
+        return await self._call(method, args, kwargs)
+
+    return call
+
+
+#: Methods of the blocking interface that make no API calls themselves
+#: (the iter_ methods return iterators calling the coroutines)
+_LOCAL_METHODS = ("max_limit", "paginate", "resume", "span", "stats", "stream_messages")
+
+for _name, _method in list(vars(Api).items()):
+    if not _name.startswith(('_', 'iter_')) and callable(_method) and _name not in vars(AsyncApi) and _name not in _LOCAL_METHODS:
+        setattr(AsyncApi, _name, _coroutine(_method))
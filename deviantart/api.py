@@ -9,14 +9,29 @@
 
 from __future__ import absolute_import
 
+import threading
+import time
+
 try:
     from urllib import urlencode
-    from urllib2 import HTTPError
+    from httplib import HTTPException
 except ImportError:
     from urllib.parse import urlencode
-    from urllib.error import HTTPError
+    from http.client import HTTPException
 from sanction import Client
 
+from .cache import BaseCache
+from .decoders import best_decoder, json_loads
+from .identity import IdentityMap
+from .metrics import Metrics, clock, endpoint_label
+from .pagination import DEFAULT_LIMIT, MAX_LIMITS, PAGE_OPTIONS, RESUMED_OPTIONS, CursorIterator, PageIterator, ParallelPageIterator, rejected_limit
+from .ratelimit import parse_retry_after
+from .retry import RetryPolicy
+from .schema import decode, decode_many
+from .singleflight import SingleFlight
+from .tracing import Tracer, bind, current_span
+from .transport import PooledTransport
+from .lazy import lazy_class
 from .deviation import Deviation
 from .user import User
 from .comment import Comment
@@ -32,26 +47,83 @@ class DeviantartError(Exception):
         return self.args[0]
 
 
+def _identity_map(identity_map, lazy):
+
+    """The :class:`deviantart.identity.IdentityMap` an identity_map parameter stands for (None for none)
+
+    :param identity_map: An IdentityMap, True for a new one, False or None for none
+    :param lazy: Whether the models are lazy, which cannot be shared (ValueError)
+    """
+
+    if identity_map is None or identity_map is False:
+        return None
+    if lazy:
+        raise ValueError("Lazy models are not shared by an identity map")
+    if identity_map is True:
+        return IdentityMap()
+    return identity_map
+
+
 class Api(object):
 
     """The API Interface (handles requests to the DeviantArt API)
 
+       The listing methods (e.g. :meth:`browse`, :meth:`get_gallery_all` or
+       :meth:`get_comments`) take raw and identity_map parameters, which
+       replace the settings of the client for one call: raw=True returns the
+       decoded items, identity_map=True shares the users of the call only and
+       identity_map=False shares none.
+
        :param client_id: client_id provided by DeviantArt
        :param client_secret: client_secret provided by DeviantArt
        :param standard_grant_type: The used authorization type | client_credentials (read-only) or authorization_code
        :param scope: The scope of data the application can access    
+       :param transport: The transport used to send API requests (defaults to a keep-alive connection pool)
+       :param rate_limiter: A :class:`deviantart.ratelimit.RateLimiter` pacing the requests (can be shared between instances)
+       :param retry_policy: The :class:`deviantart.retry.RetryPolicy` for failed requests (defaults to 3 retries of reads)
+       :param refresh_margin: Seconds before its expiry the access token is refreshed in the background
+       :param token_store: A :class:`deviantart.tokenstore.TokenStore` to share still valid tokens between processes
+       :param cache: A :class:`deviantart.cache.ResponseCache`, :class:`deviantart.cache.SQLiteCache` or :class:`deviantart.cache.TieredCache` for responses of read endpoints
+       :param coalesce: Whether concurrent identical read calls share one request
+       :param decoder: A function decoding JSON bodies (given as utf-8 bytes), or "auto" for the fastest installed JSON library
+       :param metrics: The :class:`deviantart.metrics.MetricsSink` measurements are reported to (defaults to a :class:`deviantart.metrics.Metrics`)
+       :param tracer: The :class:`deviantart.tracing.Tracer` opening a span for every API call
+       :param lazy: Whether models keep the decoded response and build each field when it is first read (see :mod:`deviantart.lazy`, they cannot be shared by an identity_map)
+       :param raw: Whether the decoded items of responses are returned as they are instead of models
+       :param identity_map: A :class:`deviantart.identity.IdentityMap` sharing repeated users between the results of all calls, or True for a new one. Users fetched by name are always fetched anew.
     """
 
+    _page_iterator = PageIterator
+    _parallel_page_iterator = ParallelPageIterator
+    _cursor_iterator = CursorIterator
+
     def __init__(
         self,
         client_id,
         client_secret,
         redirect_uri="",
         standard_grant_type="client_credentials",
-        scope="browse feed message note stash user user.manage comment.post collection"
+        scope="browse feed message note stash user user.manage comment.post collection",
+        transport=None,
+        rate_limiter=None,
+        retry_policy=None,
+        refresh_margin=300,
+        token_store=None,
+        cache=None,
+        coalesce=True,
+        decoder=None,
+        metrics=None,
+        tracer=None,
+        lazy=False,
+        raw=False,
+        identity_map=None
     ):
 
-        """Instantiate Class and create OAuth Client"""
+        """Instantiate Class and create OAuth Client
+
+        No request is made here, the client_credentials token is fetched
+        (or taken from the token_store) by the first API call.
+        """
 
         self.client_id = client_id
         self.client_secret = client_secret
@@ -64,6 +136,26 @@ class Api(object):
         self.scope = scope
         self.access_token = None
         self.refresh_token = None
+        self.token_expires = None
+        self.refresh_margin = refresh_margin
+        self.token_store = token_store
+        self.cache = cache
+        self.transport = transport or PooledTransport()
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.single_flight = SingleFlight() if coalesce else None
+        self.decoder = best_decoder() if decoder == "auto" else decoder or json_loads
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.tracer = tracer or Tracer()
+        self.lazy = lazy
+        self.raw = raw
+        self.identity_map = _identity_map(identity_map, lazy)
+        self.page_limits = {}
+
+        self._token_lock = threading.Lock()
+        self._background_lock = threading.Lock()
+        self._background_refresh = None
+        self._local = threading.local()
 
         self.oauth = Client(
             auth_endpoint=self.auth_endpoint,
@@ -73,9 +165,6 @@ class Api(object):
             client_secret=self.client_secret,
         )
 
-        if self.standard_grant_type == "client_credentials":
-            self.auth()
-
 
 
     def auth(self, code="", refresh_token=""):
@@ -86,39 +175,219 @@ class Api(object):
         :param refresh_token: the refresh_token to update access_token without authorization
         """
 
+        params = self._token_params(code, refresh_token)
+        method, url, encdata, headers = self._prepare_token_request(params)
+
+        response = self._send(method, url, encdata, headers, idempotent=params['grant_type'] == "client_credentials")
+
+        self._store_token(params, response)
+
+
+
+    def _token_params(self, code="", refresh_token=""):
+
+        """Builds the parameters of a token request for the used grant type
+
+        :param code: code provided after redirect (authorization_code only)
+        :param refresh_token: the refresh_token to update access_token without authorization
+        """
+
         if refresh_token:
-            try:
-                self.oauth.request_token(grant_type="refresh_token", refresh_token=refresh_token)
-                self.refresh_token = self.oauth.refresh_token
-            except HTTPError as e:
-
-                if e.code == 401:
-                    raise DeviantartError("Unauthorized: Please check your credentials (client_id and client_secret).")
-                else:
-                    raise DeviantartError(e)
+            return {
+                "grant_type" : "refresh_token",
+                "refresh_token" : refresh_token
+            }
         elif self.standard_grant_type == "authorization_code":
-            try:
-                self.oauth.request_token(grant_type=self.standard_grant_type, redirect_uri=self.redirect_uri, code=code)
-                self.refresh_token = self.oauth.refresh_token
-            except HTTPError as e:
-
-                if e.code == 401:
-                    raise DeviantartError("Unauthorized: Please check your credentials (client_id and client_secret).")
-                else:
-                    raise DeviantartError(e)
+            return {
+                "grant_type" : self.standard_grant_type,
+                "redirect_uri" : self.redirect_uri,
+                "code" : code
+            }
         elif self.standard_grant_type == "client_credentials":
-            try:
-                self.oauth.request_token(grant_type=self.standard_grant_type)
-            except HTTPError as e:
-
-                if e.code == 401:
-                    raise DeviantartError("Unauthorized: Please check your credentials (client_id and client_secret).")
-                else:
-                    raise DeviantartError(e)
+            return {
+                "grant_type" : self.standard_grant_type
+            }
         else:
             raise DeviantartError('Unknown grant type.')
 
-        self.access_token = self.oauth.access_token
+
+
+    def _prepare_token_request(self, params):
+
+        """Builds method, url, body and headers of a token request
+
+        :param params: the parameters returned by _token_params
+        """
+
+        data = dict(params)
+        data['client_id'] = self.client_id
+        data['client_secret'] = self.client_secret
+
+        return "POST", self.token_endpoint, urlencode(data).encode('utf-8'), {
+            "Content-Type" : "application/x-www-form-urlencoded"
+        }
+
+
+
+    def _store_token(self, params, response):
+
+        """Takes over the tokens and their expiry from a token response
+
+        :param params: the parameters of the token request
+        :param response: The :class:`deviantart.transport.Response` of the token endpoint
+        """
+
+        if response.status == 401:
+            raise DeviantartError("Unauthorized: Please check your credentials (client_id and client_secret).")
+
+        data = self._handle_response(response)
+
+        if params['grant_type'] != "client_credentials":
+            self.refresh_token = data.get('refresh_token', self.refresh_token)
+
+        if 'expires_in' in data:
+            self.token_expires = time.time() + float(data['expires_in'])
+        else:
+            self.token_expires = None
+
+        self.access_token = data['access_token']
+
+        if self.token_store is not None:
+            self.token_store.save(self._token_key(), {
+                "access_token" : self.access_token,
+                "refresh_token" : self.refresh_token,
+                "expires" : self.token_expires
+            })
+
+
+
+    def _token_key(self):
+
+        """The key tokens of this client are stored under in the token_store"""
+
+        return "{}:{}".format(self.client_id, self.standard_grant_type)
+
+
+
+    def _load_token(self, stale_token):
+
+        """Takes over a token from the token_store if it differs from
+        stale_token and has not expired
+
+        :param stale_token: the access token that has to be replaced
+        """
+
+        token = self.token_store.load(self._token_key())
+
+        if not token or token['access_token'] == stale_token:
+            return False
+
+        if token['expires'] is not None and token['expires'] <= time.time():
+            return False
+
+        self.refresh_token = token['refresh_token']
+        self.token_expires = token['expires']
+        self.access_token = token['access_token']
+
+        return True
+
+
+
+    def _ensure_token(self):
+
+        """Makes sure a valid access token is present before a request
+
+        An expired token is refreshed right away, a token that expires within
+        refresh_margin seconds is refreshed in the background while the
+        request is sent with the current one.
+        """
+
+        if self.access_token is None:
+            if self.standard_grant_type == "client_credentials" or self.token_store is not None:
+                self._refresh(None)
+            return
+
+        if self.token_expires is None:
+            return
+
+        remaining = self.token_expires - time.time()
+
+        if remaining <= 0:
+            self._refresh(self.access_token)
+        elif remaining <= self.refresh_margin:
+            with self._background_lock:
+                if self._background_refresh is None or not self._background_refresh.is_alive():
+                    self._background_refresh = threading.Thread(target=self._refresh_quietly, args=(self.access_token,))
+                    self._background_refresh.daemon = True
+                    self._background_refresh.start()
+
+
+
+    def _refresh(self, stale_token):
+
+        """Replaces stale_token by a new access token
+
+        Only one refresh runs at a time. Threads waiting for it find the token
+        replaced and return without requesting another one. With a token_store
+        this holds for all processes sharing the store as well.
+
+        :param stale_token: the access token that has to be replaced
+        """
+
+        with self._token_lock:
+            if self.access_token != stale_token:
+                return
+
+            if self.token_store is None:
+                self._renew_token()
+                return
+
+            with self.token_store.lock():
+                if not self._load_token(stale_token):
+                    self._renew_token()
+
+
+
+    def _renew_token(self):
+
+        """Requests a new access token with the refresh_token or the client credentials"""
+
+        if self.refresh_token:
+            self.auth(refresh_token=self.refresh_token)
+        elif self.standard_grant_type == "client_credentials":
+            self.auth()
+        else:
+            raise DeviantartError("The access token expired and no refresh_token is available, please authorize again.")
+
+
+
+    def _refresh_quietly(self, stale_token):
+
+        """Background refresh, a failure is retried by the next request"""
+
+        try:
+            self._refresh(stale_token)
+        except DeviantartError:
+            pass
+
+
+
+    def _token_rejected(self, response):
+
+        """Checks whether the API rejected the access token as expired or invalid
+
+        :param response: The :class:`deviantart.transport.Response` to check
+        """
+
+        if response.status != 401:
+            return False
+
+        try:
+            data = self._decode(response)
+        except ValueError:
+            return False
+
+        return isinstance(data, dict) and data.get('error') == "invalid_token"
 
 
 
@@ -131,24 +400,20 @@ class Api(object):
 
 
 
-    def browse_dailydeviations(self):
+    def browse_dailydeviations(self, raw=None, identity_map=None):
 
         """Retrieves Daily Deviations"""
 
         response = self._req('/browse/dailydeviations')
 
 
-        deviations = []
-        for item in response['results']:
-            d = Deviation()
-            d.from_dict(item)
-            deviations.append(d)
+        deviations = self._models(Deviation, response['results'], raw, identity_map)
 
         return deviations
 
 
 
-    def browse_userjournals(self, username, featured=False, offset=0, limit=10):
+    def browse_userjournals(self, username, featured=False, offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch user journals from user
 
@@ -165,12 +430,7 @@ class Api(object):
             "limit":limit
         })
 
-        deviations = []
-
-        for item in response['results']:
-            d = Deviation()
-            d.from_dict(item)
-            deviations.append(d)
+        deviations = self._models(Deviation, response['results'], raw, identity_map)
 
         return {
             "results" : deviations,
@@ -180,7 +440,7 @@ class Api(object):
 
 
 
-    def browse_morelikethis_preview(self, seed):
+    def browse_morelikethis_preview(self, seed, raw=None, identity_map=None):
 
         """Fetch More Like This preview result for a seed deviation
 
@@ -193,22 +453,14 @@ class Api(object):
 
         returned_seed = response['seed']
 
-        author = User()
-        author.from_dict(response['author'])
+        if not self._raw(raw):
+            identity_map = self._identities(identity_map)
 
-        more_from_artist = []
+        author = self._model(User, response['author'], raw, identity_map)
 
-        for item in response['more_from_artist']:
-            d = Deviation()
-            d.from_dict(item)
-            more_from_artist.append(d)
+        more_from_artist = self._models(Deviation, response['more_from_artist'], raw, identity_map)
 
-        more_from_da = []
-
-        for item in response['more_from_da']:
-            d = Deviation()
-            d.from_dict(item)
-            more_from_da.append(d)
+        more_from_da = self._models(Deviation, response['more_from_da'], raw, identity_map)
 
         return {
             "seed" : returned_seed,
@@ -219,7 +471,7 @@ class Api(object):
 
 
 
-    def browse(self, endpoint="hot", category_path="", seed="", q="", timerange="24hr", tag="", offset=0, limit=10):
+    def browse(self, endpoint="hot", category_path="", seed="", q="", timerange="24hr", tag="", offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch deviations from public endpoints
 
@@ -281,12 +533,7 @@ class Api(object):
         else:
             raise DeviantartError("Unknown endpoint.")
 
-        deviations = []
-
-        for item in response['results']:
-            d = Deviation()
-            d.from_dict(item)
-            deviations.append(d)
+        deviations = self._models(Deviation, response['results'], raw, identity_map)
 
         return {
             "results" : deviations,
@@ -341,14 +588,13 @@ class Api(object):
         """
 
         response = self._req('/deviation/{}'.format(deviationid))
-        d = Deviation()
-        d.from_dict(response)
+        d = self._model(Deviation, response)
 
         return d
 
 
 
-    def whofaved_deviation(self, deviationid, offset=0, limit=10):
+    def whofaved_deviation(self, deviationid, offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch a list of users who faved the deviation
 
@@ -363,15 +609,19 @@ class Api(object):
             'limit' : limit
         })
 
-        users = []
+        if self._raw(raw):
+            users = response['results']
+        else:
+            # the client map may hold outdated users
+            identity_map = self._identities(False if identity_map is None else identity_map)
+            users = []
 
-        for item in response['results']:
-            u = {}
-            u['user'] = User()
-            u['user'].from_dict(item['user'])
-            u['time'] = item['time']
+            for item in response['results']:
+                u = {}
+                u['user'] = self._model(User, item['user'], raw, identity_map)
+                u['time'] = item['time']
 
-            users.append(u)
+                users.append(u)
 
         return {
             "results" : users,
@@ -381,7 +631,7 @@ class Api(object):
 
 
 
-    def get_deviation_metadata(self, deviationids, ext_submission=False, ext_camera=False, ext_stats=False, ext_collection=False):
+    def get_deviation_metadata(self, deviationids, ext_submission=False, ext_camera=False, ext_stats=False, ext_collection=False, raw=None, identity_map=None):
 
         """Fetch deviation metadata for a set of deviations
 
@@ -400,43 +650,46 @@ class Api(object):
         },
         post_data={
             'deviationids[]' : deviationids
-        })
+        }, idempotent=True)
 
-        metadata = []
+        if self._raw(raw):
+            metadata = response['metadata']
+        else:
+            identity_map = self._identities(identity_map)
+            metadata = []
 
-        for item in response['metadata']:
-            m = {}
-            m['deviationid'] = item['deviationid']
-            m['printid'] = item['printid']
+            for item in response['metadata']:
+                m = {}
+                m['deviationid'] = item['deviationid']
+                m['printid'] = item['printid']
 
-            m['author'] = User()
-            m['author'].from_dict(item['author'])
+                m['author'] = self._model(User, item['author'], raw, identity_map)
 
-            m['is_watching'] = item['is_watching']
-            m['title'] = item['title']
-            m['description'] = item['description']
-            m['license'] = item['license']
-            m['allows_comments'] = item['allows_comments']
-            m['tags'] = item['tags']
-            m['is_favourited'] = item['is_favourited']
-            m['is_mature'] = item['is_mature']
+                m['is_watching'] = item['is_watching']
+                m['title'] = item['title']
+                m['description'] = item['description']
+                m['license'] = item['license']
+                m['allows_comments'] = item['allows_comments']
+                m['tags'] = item['tags']
+                m['is_favourited'] = item['is_favourited']
+                m['is_mature'] = item['is_mature']
 
-            if "submission" in item:
-                m['submission'] = item['submission']
+                if "submission" in item:
+                    m['submission'] = item['submission']
 
-            if "camera" in item:
-                m['camera'] = item['camera']
+                if "camera" in item:
+                    m['camera'] = item['camera']
 
-            if "collections" in item:
-                m['collections'] = item['collections']
+                if "collections" in item:
+                    m['collections'] = item['collections']
 
-            metadata.append(m)
+                metadata.append(m)
 
         return metadata
 
 
 
-    def get_deviation_embeddedcontent(self, deviationid, offset_deviationid="", offset=0, limit=10):
+    def get_deviation_embeddedcontent(self, deviationid, offset_deviationid="", offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch content embedded in a deviation
 
@@ -453,14 +706,7 @@ class Api(object):
             'limit' : 0
         })
 
-        deviations = []
-
-        for item in response['results']:
-
-            d = Deviation()
-            d.from_dict(item)
-
-            deviations.append(d)
+        deviations = self._models(Deviation, response['results'], raw, identity_map)
 
         return {
             "results" : deviations,
@@ -517,7 +763,7 @@ class Api(object):
             'filesize' : response['filesize']
         }
 
-    def get_collections(self, username="", calculate_size=False, ext_preload=False, offset=0, limit=10):
+    def get_collections(self, username="", calculate_size=False, ext_preload=False, offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch collection folders
 
@@ -547,25 +793,24 @@ class Api(object):
                     "limit":limit
                 })
 
-        folders = []
-
-        for item in response['results']:
-            f = {}
-            f['folderid'] = item['folderid']
-            f['name'] = item['name']
+        if self._raw(raw):
+            folders = response['results']
+        else:
+            identity_map = self._identities(identity_map)
+            folders = []
 
-            if "size" in item:
-                f['size'] = item['size']
+            for item in response['results']:
+                f = {}
+                f['folderid'] = item['folderid']
+                f['name'] = item['name']
 
-            if "deviations" in item:
-                f['deviations'] = []
+                if "size" in item:
+                    f['size'] = item['size']
 
-                for deviation_item in item['deviations']:
-                    d = Deviation()
-                    d.from_dict(deviation_item)
-                    f['deviations'].append(d)
+                if "deviations" in item:
+                    f['deviations'] = self._models(Deviation, item['deviations'], raw, identity_map)
 
-            folders.append(f)
+                folders.append(f)
 
         return {
             "results" : folders,
@@ -575,7 +820,7 @@ class Api(object):
 
 
 
-    def get_collection(self, folderid, username="", offset=0, limit=10):
+    def get_collection(self, folderid, username="", offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch collection folder contents
 
@@ -600,12 +845,7 @@ class Api(object):
                     "limit":limit
                 })
 
-        deviations = []
-
-        for item in response['results']:
-            d = Deviation()
-            d.from_dict(item)
-            deviations.append(d)
+        deviations = self._models(Deviation, response['results'], raw, identity_map)
 
         if "name" in response:
             name = response['name']
@@ -669,7 +909,7 @@ class Api(object):
 
 
 
-    def get_gallery_folders(self, username="", calculate_size=False, ext_preload=False, offset=0, limit=10):
+    def get_gallery_folders(self, username="", calculate_size=False, ext_preload=False, offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch gallery folders
 
@@ -699,26 +939,25 @@ class Api(object):
                     "limit":limit
                 })
 
-        folders = []
-
-        for item in response['results']:
-            f = {}
-            f['folderid'] = item['folderid']
-            f['name'] = item['name']
-            f['name'] = item['name']
+        if self._raw(raw):
+            folders = response['results']
+        else:
+            identity_map = self._identities(identity_map)
+            folders = []
 
-            if "parent" in item:
-                f['parent'] = item['parent']
+            for item in response['results']:
+                f = {}
+                f['folderid'] = item['folderid']
+                f['name'] = item['name']
+                f['name'] = item['name']
 
-            if "deviations" in item:
-                f['deviations'] = []
+                if "parent" in item:
+                    f['parent'] = item['parent']
 
-                for deviation_item in item['deviations']:
-                    d = Deviation()
-                    d.from_dict(deviation_item)
-                    f['deviations'].append(d)
+                if "deviations" in item:
+                    f['deviations'] = self._models(Deviation, item['deviations'], raw, identity_map)
 
-            folders.append(f)
+                folders.append(f)
 
         return {
             "results" : folders,
@@ -728,7 +967,7 @@ class Api(object):
 
 
 
-    def get_gallery_all(self, username='', offset=0, limit=10):
+    def get_gallery_all(self, username='', offset=0, limit=10, raw=None, identity_map=None):
         """
         Get all of a user's deviations
 
@@ -743,12 +982,7 @@ class Api(object):
                                                'offset': offset,
                                                'limit': limit})
 
-        deviations = []
-
-        for item in response['results']:
-            d = Deviation()
-            d.from_dict(item)
-            deviations.append(d)
+        deviations = self._models(Deviation, response['results'], raw, identity_map)
 
         if "name" in response:
             name = response['name']
@@ -764,7 +998,7 @@ class Api(object):
 
 
 
-    def get_gallery_folder(self, username="", folderid="", mode="popular", offset=0, limit=10):
+    def get_gallery_folder(self, username="", folderid="", mode="popular", offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch gallery folder contents
 
@@ -792,12 +1026,7 @@ class Api(object):
                     "limit":limit
                 })
 
-        deviations = []
-
-        for item in response['results']:
-            d = Deviation()
-            d.from_dict(item)
-            deviations.append(d)
+        deviations = self._models(Deviation, response['results'], raw, identity_map)
 
         if "name" in response:
             name = response['name']
@@ -824,8 +1053,7 @@ class Api(object):
 
         if not username and self.standard_grant_type == "authorization_code":
             response = self._req('/user/whoami')
-            u = User()
-            u.from_dict(response)
+            u = self._model(User, response, identity_map=False)
         else:
             if not username:
                 raise DeviantartError("No username defined.")
@@ -834,8 +1062,7 @@ class Api(object):
                     'ext_collections' : ext_collections,
                     'ext_galleries' : ext_galleries
                 })
-                u = User()
-                u.from_dict(response['user'])
+                u = self._model(User, response['user'], identity_map=False)
 
         return u
 
@@ -864,7 +1091,7 @@ class Api(object):
 #
 #         return friends
 
-    def get_users(self, usernames):
+    def get_users(self, usernames, raw=None, identity_map=None):
 
         """Fetch user info for given usernames
 
@@ -876,14 +1103,10 @@ class Api(object):
 
         response = self._req('/user/whois', post_data={
             "usernames":usernames
-        })
+        }, idempotent=True)
 
-        users = []
-
-        for item in response['results']:
-            u = User()
-            u.from_dict(item)
-            users.append(u)
+        # the client map may hold outdated users
+        users = self._models(User, response['results'], raw, False if identity_map is None else identity_map)
 
         return users
 
@@ -922,6 +1145,7 @@ class Api(object):
             "watch[activity]": watch['activity'],
             "watch[collections]": watch['collections'],
         })
+        self._forget_user(username)
 
         return response['success']
 
@@ -937,7 +1161,8 @@ class Api(object):
         if self.standard_grant_type is not "authorization_code":
             raise DeviantartError("Authentication through Authorization Code (Grant Type) is required in order to connect to this endpoint.")
 
-        response = self._req('/user/friends/unwatch/{}'.format(username))
+        response = self._req('/user/friends/unwatch/{}'.format(username), idempotent=False)
+        self._forget_user(username)
 
         return response['success']
 
@@ -1005,6 +1230,9 @@ class Api(object):
             post_data["bio"] = bio
 
         response = self._req('/user/profile/update', post_data=post_data)
+        if self.identity_map is not None:
+            # the map does not know which user is authenticated
+            self.identity_map.clear()
 
         return response['success']
 
@@ -1021,7 +1249,7 @@ class Api(object):
 
 
 
-    def get_watchers(self, username, offset=0, limit=10):
+    def get_watchers(self, username, offset=0, limit=10, raw=None, identity_map=None):
 
         """Get the user's list of watchers
 
@@ -1035,26 +1263,29 @@ class Api(object):
             'limit' : limit
         })
 
-        watchers = []
-
-        for item in response['results']:
-            w = {}
-            w['user'] = User()
-            w['user'].from_dict(item['user'])
-            w['is_watching'] = item['is_watching']
-            w['lastvisit'] = item['lastvisit']
-            w['watch'] = {
-                "friend" : item['watch']['friend'],
-                "deviations" : item['watch']['deviations'],
-                "journals" : item['watch']['journals'],
-                "forum_threads" : item['watch']['forum_threads'],
-                "critiques" : item['watch']['critiques'],
-                "scraps" : item['watch']['scraps'],
-                "activity" : item['watch']['activity'],
-                "collections" : item['watch']['collections']
-            }
-
-            watchers.append(w)
+        if self._raw(raw):
+            watchers = response['results']
+        else:
+            identity_map = self._identities(identity_map)
+            watchers = []
+
+            for item in response['results']:
+                w = {}
+                w['user'] = self._model(User, item['user'], raw, identity_map)
+                w['is_watching'] = item['is_watching']
+                w['lastvisit'] = item['lastvisit']
+                w['watch'] = {
+                    "friend" : item['watch']['friend'],
+                    "deviations" : item['watch']['deviations'],
+                    "journals" : item['watch']['journals'],
+                    "forum_threads" : item['watch']['forum_threads'],
+                    "critiques" : item['watch']['critiques'],
+                    "scraps" : item['watch']['scraps'],
+                    "activity" : item['watch']['activity'],
+                    "collections" : item['watch']['collections']
+                }
+
+                watchers.append(w)
 
         return {
             "results" : watchers,
@@ -1064,7 +1295,7 @@ class Api(object):
 
 
 
-    def get_friends(self, username, offset=0, limit=10):
+    def get_friends(self, username, offset=0, limit=10, raw=None, identity_map=None):
 
         """Get the users list of friends
 
@@ -1078,26 +1309,29 @@ class Api(object):
             'limit' : limit
         })
 
-        friends = []
-
-        for item in response['results']:
-            f = {}
-            f['user'] = User()
-            f['user'].from_dict(item['user'])
-            f['is_watching'] = item['is_watching']
-            f['lastvisit'] = item['lastvisit']
-            f['watch'] = {
-                "friend" : item['watch']['friend'],
-                "deviations" : item['watch']['deviations'],
-                "journals" : item['watch']['journals'],
-                "forum_threads" : item['watch']['forum_threads'],
-                "critiques" : item['watch']['critiques'],
-                "scraps" : item['watch']['scraps'],
-                "activity" : item['watch']['activity'],
-                "collections" : item['watch']['collections']
-            }
-
-            friends.append(f)
+        if self._raw(raw):
+            friends = response['results']
+        else:
+            identity_map = self._identities(identity_map)
+            friends = []
+
+            for item in response['results']:
+                f = {}
+                f['user'] = self._model(User, item['user'], raw, identity_map)
+                f['is_watching'] = item['is_watching']
+                f['lastvisit'] = item['lastvisit']
+                f['watch'] = {
+                    "friend" : item['watch']['friend'],
+                    "deviations" : item['watch']['deviations'],
+                    "journals" : item['watch']['journals'],
+                    "forum_threads" : item['watch']['forum_threads'],
+                    "critiques" : item['watch']['critiques'],
+                    "scraps" : item['watch']['scraps'],
+                    "activity" : item['watch']['activity'],
+                    "collections" : item['watch']['collections']
+                }
+
+                friends.append(f)
 
         return {
             "results" : friends,
@@ -1107,7 +1341,7 @@ class Api(object):
 
 
 
-    def get_statuses(self, username, offset=0, limit=10):
+    def get_statuses(self, username, offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch status updates of a user
 
@@ -1122,12 +1356,7 @@ class Api(object):
             'limit' : limit
         })
 
-        statuses = []
-
-        for item in response['results']:
-            s = Status()
-            s.from_dict(item)
-            statuses.append(s)
+        statuses = self._models(Status, response['results'], raw, identity_map)
 
         return {
             "results" : statuses,
@@ -1146,8 +1375,7 @@ class Api(object):
 
         response = self._req('/user/statuses/{}'.format(statusid))
 
-        s = Status()
-        s.from_dict(response)
+        s = self._model(Status, response)
 
         return s
 
@@ -1206,7 +1434,7 @@ class Api(object):
 
 
 
-    def get_comments(self, endpoint="deviation", deviationid="", commentid="", username="", statusid="", ext_item=False, offset=0, limit=10, maxdepth=0):
+    def get_comments(self, endpoint="deviation", deviationid="", commentid="", username="", statusid="", ext_item=False, offset=0, limit=10, maxdepth=0, raw=None, identity_map=None):
 
         """Fetch comments
 
@@ -1266,12 +1494,7 @@ class Api(object):
         else:
             raise DeviantartError("Unknown endpoint.")
 
-        comments = []
-
-        for item in response['thread']:
-            c = Comment()
-            c.from_dict(item)
-            comments.append(c)
+        comments = self._models(Comment, response['thread'], raw, identity_map)
 
         return {
             "thread" : comments,
@@ -1314,14 +1537,13 @@ class Api(object):
         else:
             raise DeviantartError("Unknown comment type.")
 
-        comment = Comment()
-        comment.from_dict(response)
+        comment = self._model(Comment, response)
 
         return comment
 
 
 
-    def get_messages(self, folderid="", stack=1, cursor=""):
+    def get_messages(self, folderid="", stack=1, cursor="", raw=None, identity_map=None):
 
         """Feed of all messages
 
@@ -1338,14 +1560,7 @@ class Api(object):
             'cursor' : cursor
         })
 
-        messages = []
-
-        for item in response['results']:
-
-            m = Message()
-            m.from_dict(item)
-
-            messages.append(m)
+        messages = self._models(Message, response['results'], raw, identity_map)
 
         return {
             "results" : messages,
@@ -1355,6 +1570,73 @@ class Api(object):
 
 
 
+    def stream_messages(self, folderid="", stack=1, cursor="", max_items=None, prefetch=2, checkpoint=None, raw=None, identity_map=None):
+
+        """Stream the feed of all messages, decoding them while the next pages are fetched
+
+        Yields :class:`deviantart.message.Message` objects. The cursor after
+        the last page is kept in the cursor attribute of the returned
+        :class:`deviantart.pagination.CursorIterator` and saved to the
+        checkpoint, so passing the same checkpoint again continues the feed
+        where it stopped::
+
+            checkpoint = Checkpoint(SQLiteCheckpointStore("feeds.db"), "inbox", interval=1)
+            for message in da.stream_messages(checkpoint=checkpoint):
+                notify(message)
+
+        The requests of all pages are children of a span named
+        stream_messages, which ends with the iteration.
+
+        :param folderid: The folder to fetch messages from, defaults to inbox
+        :param stack: True to use stacked mode, false to use flat mode
+        :param cursor: The cursor to start at (a saved checkpoint takes precedence)
+        :param max_items: Stop after this many messages (None for all)
+        :param prefetch: The number of pages fetched ahead of decoding
+        :param checkpoint: A :class:`deviantart.checkpoint.Checkpoint` the cursor is saved to and resumed from
+        """
+
+        if self.standard_grant_type != "authorization_code":
+            raise DeviantartError("Authentication through Authorization Code (Grant Type) is required in order to connect to this endpoint.")
+
+        params = {
+            'folderid' : folderid,
+            'stack' : stack
+        }
+
+        if checkpoint is not None:
+            checkpoint.start("stream_messages", [], params, {"max_items" : max_items, "prefetch" : prefetch})
+
+        def fetch(cursor):
+            return self._messages_page(dict(params, cursor=cursor))
+
+        span = self.tracer.begin("stream_messages", params=dict(params))
+        fetch = self._in_span(fetch, span)
+
+        if not self._raw(raw):
+            identity_map = self._identities(identity_map)
+
+        def decode(item):
+            # runs in the consuming thread, which did not make the request
+            self._local.endpoint = "/messages/feed"
+            return self._model(Message, item, raw, identity_map)
+
+        messages = self._cursor_iterator(fetch, cursor, max_items=max_items, prefetch=prefetch, checkpoint=checkpoint, decode=decode)
+        messages.trace(self.tracer, span)
+        return messages
+
+
+
+    def _messages_page(self, params):
+
+        """Fetches an undecoded page of the messages feed
+
+        :param params: folderid, stack and cursor
+        """
+
+        return self._req('/messages/feed', params)
+
+
+
     def delete_message(self, messageid="", folderid="", stackid=""):
 
         """Delete a message or a message stack
@@ -1377,7 +1659,7 @@ class Api(object):
 
 
 
-    def get_feedback(self, feedbacktype="comments", folderid="", stack=1, offset=0, limit=10):
+    def get_feedback(self, feedbacktype="comments", folderid="", stack=1, offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch feedback messages
 
@@ -1399,14 +1681,7 @@ class Api(object):
             'limit' : limit
         })
 
-        messages = []
-
-        for item in response['results']:
-
-            m = Message()
-            m.from_dict(item)
-
-            messages.append(m)
+        messages = self._models(Message, response['results'], raw, identity_map)
 
         return {
             "results" : messages,
@@ -1416,7 +1691,7 @@ class Api(object):
 
 
 
-    def get_feedback_in_stack(self, stackid, offset=0, limit=10):
+    def get_feedback_in_stack(self, stackid, offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch feedback messages in a stack
 
@@ -1433,14 +1708,7 @@ class Api(object):
             'limit' : limit
         })
 
-        messages = []
-
-        for item in response['results']:
-
-            m = Message()
-            m.from_dict(item)
-
-            messages.append(m)
+        messages = self._models(Message, response['results'], raw, identity_map)
 
         return {
             "results" : messages,
@@ -1450,7 +1718,7 @@ class Api(object):
 
 
 
-    def get_mentions(self, folderid="", stack=1, offset=0, limit=10):
+    def get_mentions(self, folderid="", stack=1, offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch mention messages
 
@@ -1470,14 +1738,7 @@ class Api(object):
             'limit' : limit
         })
 
-        messages = []
-
-        for item in response['results']:
-
-            m = Message()
-            m.from_dict(item)
-
-            messages.append(m)
+        messages = self._models(Message, response['results'], raw, identity_map)
 
         return {
             "results" : messages,
@@ -1487,7 +1748,7 @@ class Api(object):
 
 
 
-    def get_mentions_in_stack(self, stackid, offset=0, limit=10):
+    def get_mentions_in_stack(self, stackid, offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch mention messages in a stack
 
@@ -1504,14 +1765,7 @@ class Api(object):
             'limit' : limit
         })
 
-        messages = []
-
-        for item in response['results']:
-
-            m = Message()
-            m.from_dict(item)
-
-            messages.append(m)
+        messages = self._models(Message, response['results'], raw, identity_map)
 
         return {
             "results" : messages,
@@ -1521,7 +1775,7 @@ class Api(object):
 
 
 
-    def get_notes(self, folderid="", offset=0, limit=10):
+    def get_notes(self, folderid="", offset=0, limit=10, raw=None, identity_map=None):
 
         """Fetch notes
 
@@ -1539,29 +1793,27 @@ class Api(object):
             'limit' : limit
         })
 
-        notes = []
+        if self._raw(raw):
+            notes = response['results']
+        else:
+            identity_map = self._identities(identity_map)
+            notes = []
 
-        for item in response['results']:
-            n = {}
+            for item in response['results']:
+                n = {}
+
+                n['noteid'] = item['noteid']
+                n['ts'] = item['ts']
+                n['unread'] = item['unread']
+                n['starred'] = item['starred']
+                n['sent'] = item['sent']
+                n['subject'] = item['subject']
+                n['preview'] = item['preview']
+                n['body'] = item['body']
+                n['user'] = self._model(User, item['user'], raw, identity_map)
+                n['recipients'] = self._models(User, item['recipients'], raw, identity_map)
 
-            n['noteid'] = item['noteid']
-            n['ts'] = item['ts']
-            n['unread'] = item['unread']
-            n['starred'] = item['starred']
-            n['sent'] = item['sent']
-            n['subject'] = item['subject']
-            n['preview'] = item['preview']
-            n['body'] = item['body']
-            n['user'] = User()
-            n['user'].from_dict(item['user'])
-            n['recipients'] = []
-
-            for recipient_item in item['recipients']:
-                u = User()
-                u.from_dict(recipient_item)
-                n['recipients'].append(u)
-
-            notes.append(n)
+                notes.append(n)
 
         return {
             "results" : notes,
@@ -1612,8 +1864,7 @@ class Api(object):
         for item in response['results']:
             n = {}
             n['success'] = item['success']
-            n['user'] = User()
-            n['user'].from_dict(item['user'])
+            n['user'] = self._model(User, item['user'])
 
             sent_notes.append(n)
 
@@ -1741,34 +1992,799 @@ class Api(object):
         if self.standard_grant_type is not "authorization_code":
             raise DeviantartError("Authentication through Authorization Code (Grant Type) is required in order to connect to this endpoint.")
 
-        response = self._req('/notes/folders/remove/{}'.format(folderid))
+        response = self._req('/notes/folders/remove/{}'.format(folderid), idempotent=False)
 
         return response
 
 
 
-    def _req(self, endpoint, get_data=dict(), post_data=dict()):
+    def max_limit(self, endpoint):
 
-        """Helper method to make API calls
+        """The largest page size of a paginated endpoint, used for limit="auto"
 
-        :param endpoint: The endpoint to make the API call to
-        :param get_data: data send through GET
-        :param post_data: data send through POST
+        Limits the API rejected are remembered in page_limits and take
+        precedence over :data:`deviantart.pagination.MAX_LIMITS`.
+
+        :param endpoint: The endpoint or its label, e.g. "/gallery/all"
         """
 
-        if get_data:
-            request_parameter = "{}?{}".format(endpoint, urlencode(get_data))
+        label = endpoint_label(endpoint)
+        return self.page_limits.get(label) or MAX_LIMITS.get(label, DEFAULT_LIMIT)
+
+
+
+    def paginate(self, method, *args, **kwargs):
+
+        """Iterate over the items of all pages of an offset paginated method
+
+        The items are yielded lazily while the next pages are fetched in the
+        background. Unless a limit is given, every page is as large as the
+        endpoint allows (see :meth:`max_limit`)::
+
+            for deviation in da.paginate(da.get_gallery_all, username="devart", max_items=500):
+                print(deviation.title)
+
+        With fanout, several pages are fetched at once by a
+        :class:`deviantart.pagination.ParallelPageIterator`, which speeds up
+        crawls of long listings::
+
+            for deviation in da.paginate(da.get_gallery_all, username="devart", limit=24, fanout=8):
+                print(deviation.title)
+
+        With a :class:`deviantart.checkpoint.Checkpoint`, the progress is
+        saved while the items are consumed and a crawl that died can be
+        continued with :meth:`resume`.
+
+        The requests of all pages are children of a span named after method,
+        which ends with the iteration.
+
+        With identity_map=True, the pages share one
+        :class:`deviantart.identity.IdentityMap`, so every user repeated in
+        the listing is one object.
+
+        :param method: The paginated method, e.g. :meth:`get_gallery_all`
+        :param args: Positional parameters of method
+        :param kwargs: Keyword parameters of method, plus offset, key, max_items, prefetch, fanout and checkpoint of the iterator
+        """
+
+        options = dict((name, kwargs.pop(name)) for name in PAGE_OPTIONS if name in kwargs)
+        kwargs.setdefault("limit", "auto")
+
+        identity_map = kwargs.get("identity_map")
+        if options.get("checkpoint") is not None:
+            # a map is saved as True, a resumed crawl gets a new one
+            saved = dict(kwargs, identity_map=True) if isinstance(identity_map, IdentityMap) else kwargs
+            resumed = dict((name, value) for name, value in options.items() if name in RESUMED_OPTIONS)
+            options["checkpoint"].start(method.__name__, args, saved, resumed)
+
+        if identity_map is True:
+            kwargs = dict(kwargs, identity_map=IdentityMap())
+
+        def fetch(offset):
+            return method(*args, offset=offset, **kwargs)
+
+        span = self.tracer.begin(method.__name__, args=list(args), params=dict(kwargs))
+        fetch = self._in_span(fetch, span)
+
+        if options.get("fanout"):
+            pages = self._parallel_page_iterator(fetch, **options)
         else:
-            request_parameter = endpoint
+            options.pop("fanout", None)
+            pages = self._page_iterator(fetch, **options)
 
-        try:
-            encdata = urlencode(post_data, True).encode('utf-8')
-            response = self.oauth.request(request_parameter, data=encdata)
-            self._checkResponseForErrors(response)
-        except HTTPError as e:
-            raise DeviantartError(e)
+        pages.trace(self.tracer, span)
+        return pages
 
-        return response
+
+
+    def resume(self, checkpoint, **options):
+
+        """Continue a crawl started by :meth:`paginate` or :meth:`stream_messages` from its checkpoint
+
+        The crawl is continued with the method, parameters and iterator
+        options (e.g. max_items) it was started with, items yielded before
+        the last save are skipped::
+
+            checkpoint = Checkpoint(FileCheckpointStore("crawls"), "gallery-devart")
+            if checkpoint.resumed:
+                deviations = da.resume(checkpoint)
+            else:
+                deviations = da.iter_gallery_all("devart", checkpoint=checkpoint)
+
+        :param checkpoint: The :class:`deviantart.checkpoint.Checkpoint` of the crawl
+        :param options: Options of the iterator replacing the saved ones, e.g. prefetch or fanout
+        """
+
+        if not checkpoint.resumed:
+            raise DeviantartError("No checkpoint of crawl {} found.".format(checkpoint.crawl_id))
+
+        state = checkpoint.state
+        params = dict(state['params'], **dict(state.get('options') or {}, **options))
+
+        if state['method'] == "stream_messages":
+            # the feed is paginated by cursors, the saved cursor takes precedence
+            return self.stream_messages(checkpoint=checkpoint, **params)
+
+        return self.paginate(getattr(self, state['method']), *state['args'], checkpoint=checkpoint, **params)
+
+
+
+    def iter_browse(self, endpoint="hot", max_items=None, prefetch=1, **params):
+
+        """Iterate over a browse listing
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param endpoint: The endpoint from which the deviations will be fetched (hot/morelikethis/newest/undiscovered/popular/tags)
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`browse`, e.g. limit
+        """
+
+        return self.paginate(self.browse, endpoint=endpoint, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_userjournals(self, username, max_items=None, prefetch=1, **params):
+
+        """Iterate over the journals of a user
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param username: name of user to retrieve journals from
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`browse_userjournals`, e.g. limit
+        """
+
+        return self.paginate(self.browse_userjournals, username, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_whofaved_deviation(self, deviationid, max_items=None, prefetch=1, **params):
+
+        """Iterate over the users who faved a deviation
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param deviationid: The deviationid you want to fetch
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`whofaved_deviation`, e.g. limit
+        """
+
+        return self.paginate(self.whofaved_deviation, deviationid, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_collections(self, username="", max_items=None, prefetch=1, **params):
+
+        """Iterate over the collection folders of a user
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param username: The user to list folders for, if omitted the authenticated user is used
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`get_collections`, e.g. limit
+        """
+
+        return self.paginate(self.get_collections, username=username, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_collection(self, folderid, max_items=None, prefetch=1, **params):
+
+        """Iterate over the deviations of a collection folder
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param folderid: UUID of the folder to list
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`get_collection`, e.g. limit
+        """
+
+        return self.paginate(self.get_collection, folderid, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_gallery_all(self, username, max_items=None, prefetch=1, **params):
+
+        """Iterate over all of a user's deviations
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param username: The user to query
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`get_gallery_all`, e.g. limit
+        """
+
+        return self.paginate(self.get_gallery_all, username=username, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_gallery_folder(self, username, folderid, max_items=None, prefetch=1, **params):
+
+        """Iterate over the deviations of a gallery folder
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param username: The user to query
+        :param folderid: UUID of the folder to list
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`get_gallery_folder`, e.g. limit
+        """
+
+        return self.paginate(self.get_gallery_folder, username=username, folderid=folderid, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_watchers(self, username, max_items=None, prefetch=1, **params):
+
+        """Iterate over the watchers of a user
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param username: The username you want to get a list of watchers of
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`get_watchers`, e.g. limit
+        """
+
+        return self.paginate(self.get_watchers, username, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_friends(self, username, max_items=None, prefetch=1, **params):
+
+        """Iterate over the friends of a user
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param username: The username you want to get a list of friends of
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`get_friends`, e.g. limit
+        """
+
+        return self.paginate(self.get_friends, username, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_statuses(self, username, max_items=None, prefetch=1, **params):
+
+        """Iterate over the statuses of a user
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param username: The username you want to get a list of statuses of
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`get_statuses`, e.g. limit
+        """
+
+        return self.paginate(self.get_statuses, username, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def iter_comments(self, endpoint="deviation", max_items=None, prefetch=1, **params):
+
+        """Iterate over a comment thread
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param endpoint: The source/endpoint you want to fetch comments from (deviation/profile/status/siblings)
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`get_comments`, e.g. limit
+        """
+
+        return self.paginate(self.get_comments, endpoint, max_items=max_items, prefetch=prefetch, key="thread", **params)
+
+
+
+    def iter_notes(self, folderid="", max_items=None, prefetch=1, **params):
+
+        """Iterate over the notes of a folder
+
+        Yields the items of all pages, see :meth:`paginate`.
+
+        :param folderid: The UUID of the folder to fetch notes from
+        :param max_items: Stop after this many items (None for all)
+        :param prefetch: The number of pages fetched ahead in the background
+        :param params: Further parameters of :meth:`get_notes`, e.g. limit
+        """
+
+        return self.paginate(self.get_notes, folderid=folderid, max_items=max_items, prefetch=prefetch, **params)
+
+
+
+    def _req(self, endpoint, get_data=dict(), post_data=dict(), idempotent=None):
+
+        """Helper method to make API calls
+
+        :param endpoint: The endpoint to make the API call to
+        :param get_data: data send through GET
+        :param post_data: data send through POST
+        :param idempotent: whether the call may be retried after it was sent (defaults to True without post_data)
+        """
+
+        if idempotent is None:
+            idempotent = not post_data
+
+        label = endpoint_label(endpoint)
+        get_data = self._resolve_limit(label, get_data)
+        self._local.endpoint = label
+        self.metrics.increment(label, "calls")
+        span, token = self.tracer.start(label, endpoint=endpoint, params=dict(get_data))
+        error = None
+
+        try:
+            cache_key, cached = self._cache_lookup(endpoint, get_data, post_data, idempotent)
+            if cached is not None and cached.fresh:
+                span.attributes["cached"] = True
+                return self._decode_timed(label, cached.response())
+
+            if idempotent and self.single_flight is not None:
+                key = cache_key or BaseCache.key(endpoint, get_data, post_data)
+                response = self.single_flight.do(key, self._fetch, endpoint, get_data, post_data, idempotent, cached)
+            else:
+                response = self._fetch(endpoint, get_data, post_data, idempotent, cached)
+
+            span.attributes["status"] = response.status
+            span.attributes["bytes"] = response.received
+            data = self._decode_timed(label, response)
+            self._cache_update(endpoint, cache_key, idempotent, response)
+        except Exception as e:
+            error = e
+            self.metrics.increment(label, "errors")
+            raise
+        finally:
+            self.tracer.finish(span, token, error)
+
+        return data
+
+
+
+    def _fetch(self, endpoint, get_data, post_data, idempotent, cached=None):
+
+        """Sends an API call and returns its :class:`deviantart.transport.Response`
+
+        :param endpoint: The endpoint to make the API call to
+        :param get_data: data send through GET
+        :param post_data: data send through POST
+        :param idempotent: whether the call may be retried after it was sent
+        :param cached: a stale :class:`deviantart.cache.CacheEntry` to revalidate
+        """
+
+        self._ensure_token()
+        token = self.access_token
+
+        method, url, encdata, headers = self._prepare_request(endpoint, get_data, post_data, cached)
+        response = self._send(method, url, encdata, headers, idempotent, endpoint)
+
+        if self._token_rejected(response):
+            # the call was not processed, so it is replayed once with a new token
+            self._refresh(token)
+            method, url, encdata, headers = self._prepare_request(endpoint, get_data, post_data, cached)
+            response = self._send(method, url, encdata, headers, idempotent, endpoint)
+
+        clamped = self._limit_rejected(endpoint, get_data, response)
+        if clamped is not None:
+            method, url, encdata, headers = self._prepare_request(endpoint, clamped, post_data, cached)
+            response = self._send(method, url, encdata, headers, idempotent, endpoint)
+
+        return self._cache_revalidated(cached, response)
+
+
+
+    def _resolve_limit(self, label, get_data):
+
+        """Replaces limit="auto" by the largest page size of the endpoint
+
+        :param label: The endpoint label of the call
+        :param get_data: data send through GET
+        """
+
+        if get_data.get('limit') != "auto":
+            return get_data
+
+        return dict(get_data, limit=self.max_limit(label))
+
+
+
+    def _limit_rejected(self, endpoint, get_data, response):
+
+        """Checks whether the API rejected the limit of a call
+
+        Returns get_data with the limit clamped to what the API accepts,
+        which is remembered for the endpoint, or None.
+
+        :param endpoint: The endpoint of the call
+        :param get_data: data send through GET
+        :param response: The :class:`deviantart.transport.Response` to check
+        """
+
+        if response.status != 400 or 'limit' not in get_data:
+            return None
+
+        try:
+            data = self._decode(response)
+            limit = int(get_data['limit'])
+        except ValueError:
+            return None
+
+        clamped = rejected_limit(data, limit) if isinstance(data, dict) else None
+        if clamped is None:
+            return None
+
+        self.page_limits[endpoint_label(endpoint)] = clamped
+        return dict(get_data, limit=clamped)
+
+
+
+    def _decode_timed(self, label, response):
+
+        """Handles a response, reporting the time it took to the metrics sink
+
+        :param label: The endpoint label of the call
+        :param response: The :class:`deviantart.transport.Response` to handle
+        """
+
+        start = clock()
+        data = self._handle_response(response)
+        self.metrics.observe(label, "decode", clock() - start)
+
+        return data
+
+
+
+    def _raw(self, raw):
+
+        """Whether a call returns decoded items instead of models
+
+        :param raw: The raw parameter of the call (None for the setting of the client)
+        """
+
+        return self.raw if raw is None else raw
+
+
+
+    def _identities(self, identity_map):
+
+        """The identity map of a call
+
+        Calls building their models one by one resolve it once, so that
+        identity_map=True gives all of them the same map.
+
+        :param identity_map: The identity_map parameter of the call
+        """
+
+        return _identity_map(self.identity_map if identity_map is None else identity_map, self.lazy)
+
+
+
+    def _forget_user(self, username):
+
+        """Removes a user changed by a write from the identity map of the client
+
+        :param username: The username of the user
+        """
+
+        if self.identity_map is not None:
+            username = username.lower()
+            self.identity_map.discard(lambda user: (user.username or "").lower() == username)
+
+
+
+    def _model(self, cls, item, raw=None, identity_map=None):
+
+        """Builds a single model from a decoded item
+
+        :param cls: The model class (e.g. :class:`deviantart.deviation.Deviation`)
+        :param item: The decoded item
+        :param raw: Return the item itself (None for the setting of the client)
+        :param identity_map: The identity_map parameter of the call
+        """
+
+        if self._raw(raw):
+            return item
+
+        if self.lazy:
+            cls = lazy_class(cls)
+
+        start = clock()
+        model = decode(cls, item, self._identities(identity_map))
+        self.metrics.observe(getattr(self._local, "endpoint", None), "model", clock() - start)
+
+        return model
+
+
+
+    def _models(self, cls, items, raw=None, identity_map=None):
+
+        """Builds a list of models from decoded items
+
+        :param cls: The model class (e.g. :class:`deviantart.deviation.Deviation`)
+        :param items: The decoded items
+        :param raw: Return the items themselves (None for the setting of the client)
+        :param identity_map: The identity_map parameter of the call
+        """
+
+        if self._raw(raw):
+            return items
+
+        if self.lazy:
+            cls = lazy_class(cls)
+
+        start = clock()
+        models = decode_many(cls, items, self._identities(identity_map))
+        self.metrics.observe(getattr(self._local, "endpoint", None), "model", clock() - start)
+
+        return models
+
+
+
+    def _in_span(self, fetch, span):
+
+        """Wraps the page fetching function of an iterator to make its requests children of span
+
+        :param fetch: The function fetching a page
+        :param span: The span of the crawl
+        """
+
+        return bind(fetch, span)
+
+
+
+    def span(self, name, **attributes):
+
+        """Opens a span the API calls made inside of it become children of
+
+        Use it around operations made of several calls, e.g. a crawl::
+
+            with da.span("crawl", username="devart"):
+                da.get_gallery_all("devart")
+
+        :param name: The name of the operation
+        :param attributes: Details of the operation
+        """
+
+        return self.tracer.span(name, **attributes)
+
+
+
+    def stats(self):
+
+        """Returns a snapshot of the per endpoint metrics and the counters of the cache, retries and coalescing"""
+
+        return {
+            "endpoints" : self.metrics.snapshot(),
+            "retry" : self.retry_policy.stats(),
+            "cache" : self.cache.stats() if self.cache is not None else None,
+            "single_flight" : self.single_flight.stats() if self.single_flight is not None else None
+        }
+
+
+
+    def _cache_lookup(self, endpoint, get_data, post_data, idempotent):
+
+        """Looks up a call in the cache
+
+        Returns the cache key (None if the call is not cached) and the cached
+        :class:`deviantart.cache.CacheEntry`, which may be stale.
+        """
+
+        if self.cache is None or not idempotent or self.cache.ttl(endpoint) <= 0:
+            return None, None
+
+        key = self.cache.key(endpoint, get_data, post_data)
+
+        return key, self.cache.get(key)
+
+
+
+    def _cache_revalidated(self, cached, response):
+
+        """Replaces a 304 Not Modified response with the revalidated cache entry"""
+
+        if cached is None or response.status != 304:
+            return response
+
+        self.cache.revalidated(cached)
+
+        return cached.response()
+
+
+
+    def _cache_update(self, endpoint, key, idempotent, response):
+
+        """Stores a successful response in the cache, or drops the entries a write made stale"""
+
+        if self.cache is None:
+            return
+
+        if key is not None and response.status == 200:
+            self.cache.set(key, self.cache.entry(endpoint, response))
+        elif not idempotent:
+            self.cache.invalidate_after(endpoint)
+
+
+
+    def _send(self, method, url, encdata, headers, idempotent, endpoint=None):
+
+        """Sends a request through the transport, pacing and retrying it
+
+        :param method: The HTTP method
+        :param url: The absolute URL
+        :param encdata: The encoded request body
+        :param headers: The request headers
+        :param idempotent: whether the request may be retried after it was sent
+        :param endpoint: The API endpoint used for rate limiting (None to skip)
+        """
+
+        attempt = 0
+
+        while True:
+            if self.rate_limiter is not None and endpoint is not None:
+                self.rate_limiter.wait(endpoint)
+
+            response = error = None
+            start = clock()
+
+            try:
+                response = self.transport.request(method, url, body=encdata, headers=headers)
+            except (HTTPException, IOError, OSError) as e:
+                error = e
+            else:
+                if endpoint is not None:
+                    self._report_rate(endpoint, response)
+                    self._report_transfer(endpoint, response, clock() - start)
+
+            delay = self.retry_policy.backoff(attempt, idempotent, response=response, error=error)
+            if delay is None:
+                break
+
+            self._report_retry(attempt, delay, response, error)
+            time.sleep(delay)
+            attempt += 1
+
+        if error is not None:
+            raise DeviantartError(error)
+
+        return response
+
+
+
+    def _report_retry(self, attempt, delay, response, error):
+
+        """Records a retry in the span of the current call
+
+        :param attempt: The number of the failed attempt (starting at 0)
+        :param delay: Seconds until the next attempt
+        :param response: The :class:`deviantart.transport.Response` of the failed attempt or None
+        :param error: The exception of the failed attempt or None
+        """
+
+        span = current_span()
+        if span is not None:
+            span.attributes.setdefault("retries", []).append({
+                "attempt" : attempt,
+                "delay" : delay,
+                "status" : response.status if response is not None else None,
+                "error" : repr(error) if error is not None else None
+            })
+
+
+
+    def _report_transfer(self, endpoint, response, elapsed):
+
+        """Reports connect and transfer time and the response size to the metrics sink
+
+        :param endpoint: The endpoint the request was sent to
+        :param response: The :class:`deviantart.transport.Response` received
+        :param elapsed: Seconds the transport took
+        """
+
+        label = endpoint_label(endpoint)
+
+        if response.connect_time:
+            self.metrics.observe(label, "connect", response.connect_time)
+        self.metrics.observe(label, "transfer", elapsed - response.connect_time)
+        self.metrics.observe(label, "response_bytes", response.received)
+
+
+
+    def _report_rate(self, endpoint, response):
+
+        """Tells the rate limiter whether the request was throttled
+
+        :param endpoint: The endpoint the request was sent to
+        :param response: The :class:`deviantart.transport.Response` received
+        """
+
+        if self.rate_limiter is None:
+            return
+
+        retry_after = parse_retry_after(response.headers.get('retry-after'))
+
+        if response.status == 429 or (response.status == 503 and retry_after is not None):
+            self.rate_limiter.on_throttle(endpoint, retry_after)
+        else:
+            self.rate_limiter.on_success(endpoint)
+
+
+
+    def _prepare_request(self, endpoint, get_data=dict(), post_data=dict(), cached=None):
+
+        """Builds method, url, body and headers of an API call
+
+        :param endpoint: The endpoint to make the API call to
+        :param get_data: data send through GET
+        :param post_data: data send through POST
+        :param cached: a stale :class:`deviantart.cache.CacheEntry` to revalidate
+        """
+
+        if get_data:
+            request_parameter = "{}?{}".format(endpoint, urlencode(get_data))
+        else:
+            request_parameter = endpoint
+
+        url = "{}{}".format(self.resource_endpoint, request_parameter)
+        headers = {"Authorization": "Bearer {}".format(self.access_token)}
+        if cached is not None:
+            headers.update(cached.validators)
+
+        if post_data:
+            method = "POST"
+            encdata = urlencode(post_data, True).encode('utf-8')
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        else:
+            method = "GET"
+            encdata = None
+
+        return method, url, encdata, headers
+
+
+
+    def _handle_response(self, response):
+
+        """Decodes a transport response and raises on API errors
+
+        :param response: The :class:`deviantart.transport.Response` to handle
+        """
+
+        try:
+            data = self._decode(response)
+        except ValueError:
+            data = {}
+
+        if response.status >= 400:
+            if 'error_description' in data:
+                raise DeviantartError(data['error_description'])
+            raise DeviantartError("HTTP Error {}: {}".format(response.status, response.reason))
+
+        self._checkResponseForErrors(data)
+
+        return data
+
+
+
+    def _decode(self, response):
+
+        """Decodes the JSON body of a response with the configured decoder
+
+        :param response: The :class:`deviantart.transport.Response` to decode
+        """
+
+        body = response.body
+        if response.charset.lower() not in ("utf-8", "utf8"):
+            body = body.decode(response.charset)
+
+        return self.decoder(body)
 
 
 
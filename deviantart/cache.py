@@ -0,0 +1,584 @@
+"""
+    deviantart.cache
+    ^^^^^^^^^^^^^^^^
+
+    Caching of API responses
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+    from urllib import urlencode
+except ImportError:
+    from urllib.parse import urlencode
+
+from .transport import Response
+
+#: Seconds responses of read endpoints are cached for, by endpoint prefix.
+#: The longest matching prefix wins, endpoints without a match are not cached.
+DEFAULT_TTLS = {
+    "/browse/categorytree" : 24 * 3600,
+    "/browse/dailydeviations" : 3600,
+    "/data/countries" : 24 * 3600,
+    "/data/privacy" : 24 * 3600,
+    "/data/submission" : 24 * 3600,
+    "/data/tos" : 24 * 3600,
+    "/deviation/" : 300,
+    "/deviation/metadata" : 300,
+    "/user/profile/" : 300,
+}
+
+#: Cached endpoint prefixes that a successful write to an endpoint prefix
+#: makes stale.
+INVALIDATIONS = {
+    "/collections/fave" : ("/deviation/", "/collections/"),
+    "/collections/unfave" : ("/deviation/", "/collections/"),
+    "/user/profile/update" : ("/user/",),
+    "/user/friends/watch/" : ("/user/",),
+    "/user/friends/unwatch/" : ("/user/",),
+    "/user/statuses/post" : ("/user/statuses",),
+    "/comments/post/" : ("/comments/",),
+    "/messages/delete" : ("/messages/",),
+    "/notes" : ("/notes",),
+}
+
+
+def _longest_prefix(table, endpoint):
+    match = None
+    for prefix in table:
+        if endpoint.startswith(prefix) and (match is None or len(prefix) > len(match)):
+            match = prefix
+    return match
+
+
+class CacheEntry(object):
+
+    """A cached response
+
+    :param body: the response body as bytes
+    :param headers: the response headers worth keeping (content type and validators)
+    :param expires: the unix timestamp the entry is fresh until
+    """
+
+    def __init__(self, body, headers, expires):
+        self.body = body
+        self.headers = headers
+        self.expires = expires
+
+    @property
+    def fresh(self):
+        return time.time() < self.expires
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    @property
+    def validators(self):
+
+        """The request headers to revalidate the entry with"""
+
+        validators = {}
+        if "etag" in self.headers:
+            validators["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            validators["If-Modified-Since"] = self.headers["last-modified"]
+        return validators
+
+    def response(self):
+
+        """The entry as :class:`deviantart.transport.Response`"""
+
+        return Response(200, self.headers, self.body)
+
+
+class BaseCache(object):
+
+    """Base class of response caches
+
+    :param ttls: dict of endpoint prefix => seconds, merged into :data:`DEFAULT_TTLS`
+    """
+
+    #: response headers stored with an entry
+    headers = ("content-type", "etag", "last-modified")
+
+    def __init__(self, ttls=None):
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.bytes_saved = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+
+    def ttl(self, endpoint):
+
+        """Seconds responses of endpoint are cached for (0 if they are not)"""
+
+        prefix = _longest_prefix(self.ttls, endpoint)
+
+        return self.ttls[prefix] if prefix is not None else 0
+
+    @staticmethod
+    def key(endpoint, get_data=None, post_data=None):
+
+        """The cache key of a call, independent of the order of its parameters
+
+        :param endpoint: the API endpoint
+        :param get_data: data send through GET
+        :param post_data: data send through POST
+        """
+
+        return "{}?{}|{}".format(
+            endpoint,
+            urlencode(sorted((get_data or {}).items()), True),
+            urlencode(sorted((post_data or {}).items()), True)
+        )
+
+    def entry(self, endpoint, response):
+
+        """Builds the :class:`CacheEntry` for a response of endpoint"""
+
+        headers = dict((name, value) for name, value in response.headers.items() if name in self.headers)
+
+        return CacheEntry(response.body, headers, time.time() + self.ttl(endpoint))
+
+    def get(self, key):
+
+        """Returns the :class:`CacheEntry` stored under key (even if it is stale) or None"""
+
+        raise NotImplementedError
+
+    def set(self, key, entry):
+
+        """Stores entry under key
+
+        :param key: the cache key
+        :param entry: the :class:`CacheEntry` to store
+        """
+
+        raise NotImplementedError
+
+    def invalidate(self, prefix):
+
+        """Removes all entries of endpoints starting with prefix, returns how many were removed"""
+
+        raise NotImplementedError
+
+    def invalidate_after(self, endpoint):
+
+        """Removes the entries a successful write to endpoint made stale"""
+
+        prefix = _longest_prefix(INVALIDATIONS, endpoint)
+
+        if prefix is not None:
+            for stale in INVALIDATIONS[prefix]:
+                self.invalidate(stale)
+
+    def revalidated(self, entry):
+
+        """Counts a stale entry DeviantArt confirmed as unchanged (304)"""
+
+        with self._lock:
+            self.revalidations += 1
+            self.bytes_saved += entry.size
+
+    def _counted(self, entry):
+
+        """Counts a lookup of entry as hit or miss and passes it on"""
+
+        with self._lock:
+            if entry is not None and entry.fresh:
+                self.hits += 1
+                self.bytes_saved += entry.size
+            else:
+                self.misses += 1
+
+        return entry
+
+    def clear(self):
+
+        """Removes all entries"""
+
+        raise NotImplementedError
+
+    def stats(self):
+
+        """Returns the cache counters as dict"""
+
+        with self._lock:
+            return {
+                "hits" : self.hits,
+                "misses" : self.misses,
+                "revalidations" : self.revalidations,
+                "bytes_saved" : self.bytes_saved,
+                "invalidations" : self.invalidations
+            }
+
+
+class ResponseCache(BaseCache):
+
+    """In-memory LRU cache of API responses with per endpoint TTLs
+
+    Entries are evicted least recently used first once more than max_entries
+    are stored or their bodies take more than max_bytes. Expired entries are
+    kept until evicted, so they can be revalidated.
+
+    Responses can depend on the authenticated user (is_favourited,
+    is_watching), so a cache should not be shared by clients of different
+    users.
+
+    :param ttls: dict of endpoint prefix => seconds, merged into :data:`DEFAULT_TTLS`
+    :param max_entries: the maximum number of cached responses
+    :param max_bytes: the maximum size of all cached bodies
+    """
+
+    def __init__(self, ttls=None, max_entries=1024, max_bytes=32 * 1024 * 1024):
+        BaseCache.__init__(self, ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.evictions = 0
+        self.bytes = 0
+
+        self._entries = OrderedDict()
+
+    def get(self, key):
+
+        """Returns the :class:`CacheEntry` stored under key (even if it is stale) or None"""
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+
+        return self._counted(entry)
+
+    def set(self, key, entry):
+
+        """Stores entry under key, evicting the least recently used entries
+
+        :param key: the cache key
+        :param entry: the :class:`CacheEntry` to store
+        """
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+
+            if entry.size > self.max_bytes:
+                return
+
+            self._entries[key] = entry
+            self.bytes += entry.size
+
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+
+    def invalidate(self, prefix):
+
+        """Removes all entries of endpoints starting with prefix, returns how many were removed"""
+
+        with self._lock:
+            keys = [k for k in self._entries if k.startswith(prefix)]
+            for key in keys:
+                self.bytes -= self._entries.pop(key).size
+            self.invalidations += len(keys)
+
+        return len(keys)
+
+    def clear(self):
+
+        """Removes all entries"""
+
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+
+        """Returns the cache counters as dict"""
+
+        stats = BaseCache.stats(self)
+        with self._lock:
+            stats.update({
+                "evictions" : self.evictions,
+                "entries" : len(self._entries),
+                "bytes" : self.bytes
+            })
+        return stats
+
+
+class SQLiteCache(BaseCache):
+
+    """Persistent cache of API responses in a SQLite database
+
+    Bodies are stored zlib compressed together with their ETag and
+    Last-Modified validators, so expired entries can be revalidated with a
+    conditional request instead of being downloaded again. Once the stored
+    bodies take more than max_bytes, the least recently used entries are
+    evicted.
+
+    The database runs in WAL mode, so any number of threads and processes
+    can share one file: readers never block, writers wait for each other up
+    to timeout seconds.
+
+    :param path: the path of the database file
+    :param ttls: dict of endpoint prefix => seconds, merged into :data:`DEFAULT_TTLS`
+    :param max_bytes: the maximum size of all stored (compressed) bodies
+    :param level: the zlib compression level
+    :param timeout: seconds to wait for the database lock of another writer
+    """
+
+    #: seconds between updates of the last access time of an entry
+    touch_interval = 60
+
+    def __init__(self, path, ttls=None, max_bytes=256 * 1024 * 1024, level=6, timeout=30):
+        BaseCache.__init__(self, ttls)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.level = level
+        self.timeout = timeout
+
+        self.evictions = 0
+        self.bytes_written = 0
+
+        self._local = threading.local()
+        self._db().close()
+        self._local.db = None
+
+    def _db(self):
+
+        """The connection of the calling thread"""
+
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, body BLOB, size INTEGER, stored INTEGER, "
+                "headers TEXT, expires REAL, accessed REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            with db:
+                # the size of all stored bodies, kept up to date by triggers so
+                # that writes need not sum it up (seeded once for older files)
+                db.execute("BEGIN IMMEDIATE")
+                db.execute("CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY, stored INTEGER)")
+                db.execute("INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(stored), 0) FROM responses")
+                db.execute(
+                    "CREATE TRIGGER IF NOT EXISTS responses_inserted AFTER INSERT ON responses "
+                    "BEGIN UPDATE totals SET stored = stored + NEW.stored WHERE id = 0; END"
+                )
+                db.execute(
+                    "CREATE TRIGGER IF NOT EXISTS responses_deleted AFTER DELETE ON responses "
+                    "BEGIN UPDATE totals SET stored = stored - OLD.stored WHERE id = 0; END"
+                )
+            self._local.db = db
+        return db
+
+    def get(self, key):
+
+        """Returns the :class:`CacheEntry` stored under key (even if it is stale) or None"""
+
+        db = self._db()
+        row = db.execute(
+            "SELECT body, headers, expires, accessed FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            return self._counted(None)
+
+        body, headers, expires, accessed = row
+        now = time.time()
+        if now - accessed > self.touch_interval:
+            db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+
+        return self._counted(CacheEntry(zlib.decompress(body), json.loads(headers), expires))
+
+    def set(self, key, entry):
+
+        """Stores entry under key, evicting the least recently used entries
+
+        :param key: the cache key
+        :param entry: the :class:`CacheEntry` to store
+        """
+
+        body = zlib.compress(entry.body, self.level)
+        if len(body) > self.max_bytes:
+            return
+
+        db = self._db()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            # no INSERT OR REPLACE, its deletion would not fire the trigger
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            db.execute(
+                "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(body), entry.size, len(body),
+                 json.dumps(entry.headers), entry.expires, time.time())
+            )
+            evicted = self._evict(db)
+
+        with self._lock:
+            self.bytes_written += len(body)
+            self.evictions += evicted
+
+    def _evict(self, db):
+
+        """Deletes the least recently used entries until the bodies fit into max_bytes"""
+
+        excess = db.execute("SELECT stored FROM totals WHERE id = 0").fetchone()[0] - self.max_bytes
+        evicted = 0
+
+        while excess > 0:
+            oldest = db.execute("SELECT key, stored FROM responses ORDER BY accessed LIMIT 100").fetchall()
+            if not oldest:
+                break
+            for key, stored in oldest:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                evicted += 1
+                excess -= stored
+                if excess <= 0:
+                    break
+        return evicted
+
+    def invalidate(self, prefix):
+
+        """Removes all entries of endpoints starting with prefix, returns how many were removed"""
+
+        db = self._db()
+        with db:
+            deleted = db.execute(
+                "DELETE FROM responses WHERE key >= ? AND key < ?", (prefix, prefix + u"\uffff")
+            ).rowcount
+
+        with self._lock:
+            self.invalidations += deleted
+
+        return deleted
+
+    def clear(self):
+
+        """Removes all entries"""
+
+        db = self._db()
+        with db:
+            db.execute("DELETE FROM responses")
+
+    def close(self):
+
+        """Closes the connection of the calling thread"""
+
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def stats(self):
+
+        """Returns the cache counters and the size of the database as dict"""
+
+        entries, size, stored = self._db().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored), 0) FROM responses"
+        ).fetchone()
+
+        stats = BaseCache.stats(self)
+        with self._lock:
+            stats.update({
+                "evictions" : self.evictions,
+                "entries" : entries,
+                "bytes" : size,
+                "stored_bytes" : stored,
+                "bytes_written" : self.bytes_written
+            })
+        return stats
+
+
+class TieredCache(BaseCache):
+
+    """Combines a fast cache with a slower, bigger one
+
+    Lookups try the tiers in order and copy entries found in a lower tier
+    into the tiers above it, writes and invalidations go to all tiers. The
+    TTLs of the first tier apply.
+
+    :param tiers: the caches, fastest first (e.g. a :class:`ResponseCache` and a :class:`SQLiteCache`)
+    """
+
+    def __init__(self, *tiers):
+        BaseCache.__init__(self)
+        self.tiers = tiers
+        self.ttls = tiers[0].ttls
+
+    def get(self, key):
+
+        """Returns the :class:`CacheEntry` of the first tier that stores key or None"""
+
+        found = None
+        for i, tier in enumerate(self.tiers):
+            entry = tier.get(key)
+            if entry is not None and (found is None or entry.expires > found.expires):
+                found = entry
+                for upper in self.tiers[:i]:
+                    upper.set(key, entry)
+            if found is not None and found.fresh:
+                break
+
+        return self._counted(found)
+
+    def set(self, key, entry):
+
+        """Stores entry under key in all tiers"""
+
+        for tier in self.tiers:
+            tier.set(key, entry)
+
+    def invalidate(self, prefix):
+
+        """Removes all entries of endpoints starting with prefix from all tiers, returns how many were removed"""
+
+        removed = 0
+        for tier in self.tiers:
+            removed += tier.invalidate(prefix) or 0
+        with self._lock:
+            self.invalidations += removed
+
+        return removed
+
+    def revalidated(self, entry):
+        BaseCache.revalidated(self, entry)
+        for tier in self.tiers:
+            tier.revalidated(entry)
+
+    def clear(self):
+
+        """Removes all entries from all tiers"""
+
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self):
+
+        """Returns the combined counters and the stats of every tier as dict"""
+
+        stats = BaseCache.stats(self)
+        stats["tiers"] = [tier.stats() for tier in self.tiers]
+        return stats
@@ -0,0 +1,227 @@
+"""
+    deviantart.cassette
+    ^^^^^^^^^^^^^^^^^^^
+
+    Recording of API sessions and their offline replay
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import base64
+import gzip
+import io
+import json
+import threading
+import time
+from collections import deque
+
+try:
+    from urllib import urlencode
+    from urlparse import parse_qsl, urlsplit
+except ImportError:
+    from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from .transport import Response, Transport
+
+#: Parameters and JSON fields that are replaced by :data:`SCRUBBED` before
+#: anything is written to a cassette
+SECRETS = frozenset(["access_token", "refresh_token", "client_secret", "code", "password"])
+
+#: Response headers that are not written to a cassette (cookies, and the
+#: length of the body, which is stored re-encoded)
+SKIPPED_HEADERS = frozenset(["set-cookie", "content-length"])
+
+SCRUBBED = "SCRUBBED"
+
+
+class CassetteError(LookupError):
+
+    """Raised on replay when the cassette holds no response for a request"""
+
+
+def _scrub_params(pairs):
+    return [(key, SCRUBBED if key in SECRETS else value) for key, value in pairs]
+
+
+def _scrub_json(data):
+    if isinstance(data, dict):
+        return dict((key, SCRUBBED if key in SECRETS else _scrub_json(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return [_scrub_json(item) for item in data]
+    return data
+
+
+def request_key(method, url, body=None):
+
+    """The scrubbed method, path and body a request is recorded and matched by
+
+    The host is left out, so a session recorded against one server can be
+    replayed against another URL.
+
+    :param method: the HTTP method
+    :param url: the absolute URL
+    :param body: the form encoded request body
+    """
+
+    parts = urlsplit(url)
+    path = parts.path
+    if parts.query:
+        path = "{}?{}".format(path, urlencode(_scrub_params(parse_qsl(parts.query, True))))
+
+    if body:
+        body = urlencode(_scrub_params(parse_qsl(body.decode("utf-8"), True)))
+    else:
+        body = ""
+
+    return method, path, body
+
+
+def _encode_body(body):
+    try:
+        return _scrub_json(json.loads(body.decode("utf-8")))
+    except ValueError:
+        return {"base64" : base64.b64encode(body).decode("ascii")}
+
+
+def _decode_body(body):
+    if isinstance(body, dict) and set(body) == set(["base64"]):
+        return base64.b64decode(body["base64"])
+    return json.dumps(body).encode("utf-8")
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, mode + "b"), encoding="utf-8")
+    return io.open(path, mode, encoding="utf-8")
+
+
+def load(path):
+
+    """Returns the interactions stored in a cassette as list of dicts
+
+    :param path: the cassette file (gzip compressed if it ends with .gz)
+    """
+
+    with _open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class RecordingTransport(Transport):
+
+    """Passes requests on to another transport and appends every exchange to a cassette
+
+    The cassette is a file with one JSON object per line. Secrets
+    (:data:`SECRETS`) in URLs, request bodies and JSON responses are
+    scrubbed and request headers, which carry the access token, are not
+    written at all.
+
+    :param path: the cassette file (gzip compressed if it ends with .gz)
+    :param transport: the transport that sends the requests
+    """
+
+    def __init__(self, path, transport):
+        self.path = path
+        self.transport = transport
+        self._lock = threading.Lock()
+
+    def request(self, method, url, body=None, headers=None):
+        start = time.time()
+        response = self.transport.request(method, url, body=body, headers=headers)
+        elapsed = time.time() - start
+
+        method, path, form = request_key(method, url, body)
+        interaction = {
+            "method" : method,
+            "path" : path,
+            "body" : form,
+            "status" : response.status,
+            "reason" : response.reason,
+            "headers" : dict((k, v) for k, v in response.headers.items() if k not in SKIPPED_HEADERS),
+            "response" : _encode_body(response.body),
+            "elapsed" : round(elapsed, 6)
+        }
+        line = json.dumps(interaction, sort_keys=True, separators=(",", ":"))
+
+        with self._lock:
+            with _open(self.path, "a") as f:
+                f.write(line + u"\n")
+
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+
+    """Answers requests with the responses of a cassette, without any network
+
+    Identical requests get their recorded responses in the order they were
+    recorded, so pagination and retries replay as they happened.
+
+    :param path: the cassette file written by :class:`RecordingTransport`
+    :param latency: seconds to wait before every response, "recorded" to wait as long as the recorded request took, or None
+    """
+
+    def __init__(self, path, latency=None):
+        self.path = path
+        self.latency = latency
+        self.played = 0
+
+        self._interactions = {}
+        for interaction in load(path):
+            key = (interaction["method"], interaction["path"], interaction["body"])
+            self._interactions.setdefault(key, deque()).append(interaction)
+        self._lock = threading.Lock()
+
+    def next_interaction(self, method, url, body=None):
+
+        """Takes the next recorded interaction matching a request
+
+        :param method: the HTTP method
+        :param url: the absolute URL
+        :param body: the form encoded request body
+        """
+
+        key = request_key(method, url, body)
+
+        with self._lock:
+            recorded = self._interactions.get(key)
+            if not recorded:
+                raise CassetteError("No recorded response left for {} {}".format(key[0], key[1]))
+            self.played += 1
+            return recorded.popleft()
+
+    def delay(self, interaction):
+
+        """Seconds to wait before answering with interaction"""
+
+        if self.latency == "recorded":
+            return interaction["elapsed"]
+        return self.latency or 0
+
+    @staticmethod
+    def response(interaction):
+
+        """Builds the :class:`deviantart.transport.Response` of a recorded interaction"""
+
+        return Response(interaction["status"], interaction["headers"], _decode_body(interaction["response"]), interaction["reason"])
+
+    def request(self, method, url, body=None, headers=None):
+        interaction = self.next_interaction(method, url, body)
+
+        delay = self.delay(interaction)
+        if delay:
+            time.sleep(delay)
+
+        return self.response(interaction)
+
+    @property
+    def remaining(self):
+
+        """The number of recorded interactions that were not replayed yet"""
+
+        with self._lock:
+            return sum(len(recorded) for recorded in self._interactions.values())
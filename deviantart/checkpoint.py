@@ -0,0 +1,240 @@
+"""
+    deviantart.checkpoint
+    ^^^^^^^^^^^^^^^^^^^^^
+
+    Checkpoints of long crawls, so they can be resumed after a crash
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
+
+from .tokenstore import _replace
+
+
+class CheckpointStore(object):
+
+    """Base class of checkpoint stores
+
+    A checkpoint is a JSON serializable dict describing the progress of a
+    crawl, see :class:`Checkpoint`.
+    """
+
+    def load(self, crawl_id):
+
+        """Returns the checkpoint of a crawl or None
+
+        :param crawl_id: the id of the crawl
+        """
+
+        raise NotImplementedError
+
+    def save(self, crawl_id, state):
+
+        """Stores the checkpoint of a crawl, replacing the previous one
+
+        :param crawl_id: the id of the crawl
+        :param state: the checkpoint dict
+        """
+
+        raise NotImplementedError
+
+    def delete(self, crawl_id):
+
+        """Removes the checkpoint of a crawl
+
+        :param crawl_id: the id of the crawl
+        """
+
+        raise NotImplementedError
+
+
+class FileCheckpointStore(CheckpointStore):
+
+    """Stores every checkpoint in a JSON file of its own, replaced atomically
+
+    :param directory: the directory of the files (created if missing)
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, crawl_id):
+        return os.path.join(self.directory, quote(crawl_id, safe="") + ".json")
+
+    def load(self, crawl_id):
+        try:
+            with open(self._path(crawl_id)) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def save(self, crawl_id, state):
+        fd, tmp_path = tempfile.mkstemp(prefix=".checkpoint", dir=self.directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            _replace(tmp_path, self._path(crawl_id))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def delete(self, crawl_id):
+        try:
+            os.unlink(self._path(crawl_id))
+        except OSError:
+            pass
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+
+    """Stores checkpoints in a SQLite database, which threads and processes can share
+
+    :param path: the path of the database file
+    :param timeout: seconds to wait for the database lock of another writer
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+
+        self._local = threading.local()
+
+    def _db(self):
+
+        """The connection of the calling thread"""
+
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "crawl_id TEXT PRIMARY KEY, state TEXT, updated REAL)"
+            )
+            self._local.db = db
+        return db
+
+    def load(self, crawl_id):
+        row = self._db().execute("SELECT state FROM checkpoints WHERE crawl_id = ?", (crawl_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def save(self, crawl_id, state):
+        self._db().execute(
+            "INSERT OR REPLACE INTO checkpoints (crawl_id, state, updated) VALUES (?, ?, ?)",
+            (crawl_id, json.dumps(state), time.time())
+        )
+
+    def delete(self, crawl_id):
+        self._db().execute("DELETE FROM checkpoints WHERE crawl_id = ?", (crawl_id,))
+
+    def close(self):
+
+        """Closes the connection of the calling thread"""
+
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class Checkpoint(object):
+
+    """The progress of a crawl, saved to a store at most every interval seconds
+
+    The state records the paginated method, its parameters and the options
+    of the iterator, the offset of the page being consumed (or the cursor),
+    how many of its items were already yielded and the number of items
+    yielded in total. A crawl resumed from it starts at that page and skips
+    the yielded items. Items yielded after the last save are yielded again.
+
+    :param store: the :class:`CheckpointStore` to save to
+    :param crawl_id: the id the crawl is saved and resumed under
+    :param interval: seconds between saves (0 saves after every item)
+    """
+
+    def __init__(self, store, crawl_id, interval=10.0):
+        self.store = store
+        self.crawl_id = crawl_id
+        self.interval = interval
+        self.state = store.load(crawl_id)
+
+        self._saved = time.time()
+
+    @property
+    def resumed(self):
+
+        """Whether the crawl was started before"""
+
+        return self.state is not None
+
+    def start(self, method, args, params, options=None):
+
+        """Records a crawl, or checks a resumed one was started the same way
+
+        The parameters are compared as they are loaded from the store, e.g.
+        tuples as lists. ValueError is raised if they are not JSON serializable.
+
+        :param method: the name of the paginated method
+        :param args: its positional parameters
+        :param params: its keyword parameters
+        :param options: the options of the iterator (e.g. max_items), applied again by a resume
+        """
+
+        try:
+            args, params, options = json.loads(json.dumps([list(args), params, options or {}]))
+        except (TypeError, ValueError) as e:
+            raise ValueError("Crawl {} has parameters that cannot be saved: {}".format(self.crawl_id, e))
+
+        if self.state is None:
+            self.state = {
+                "crawl_id" : self.crawl_id,
+                "method" : method,
+                "args" : args,
+                "params" : params,
+                "options" : options,
+                "offset" : None,
+                "cursor" : None,
+                "skip" : 0,
+                "items" : 0,
+                "done" : False
+            }
+        elif [self.state["method"]] + json.loads(json.dumps([self.state["args"], self.state["params"]])) != [method, args, params]:
+            raise ValueError("Crawl {} was started with other parameters".format(self.crawl_id))
+
+    def update(self, force=False, **progress):
+
+        """Records progress, saving it when interval has passed
+
+        :param force: save right away
+        :param progress: the state keys to change, e.g. offset, skip and items
+        """
+
+        self.state.update(progress)
+
+        if force or time.time() - self._saved >= self.interval:
+            self.save()
+
+    def save(self):
+
+        """Saves the state to the store"""
+
+        self.state["updated"] = time.time()
+        self.store.save(self.crawl_id, self.state)
+        self._saved = time.time()
@@ -7,10 +7,15 @@
     :copyright: (c) 2015 by Kevin Eichhorn
 """
 
+from .schema import Field, define
 from .user import User
 
 class Comment(object):
-    
+
+    __slots__ = (
+        "commentid", "parentid", "posted", "replies", "hidden", "body", "user",
+    )
+
     def __init__(self):
         self.commentid = None
         self.parentid = None
@@ -20,29 +25,15 @@ class Comment(object):
         self.body = None
         self.user = None
     
-    def from_dict(self, c):
-        
-        if 'commentid' in c:
-            self.commentid = c['commentid']
-            
-        if 'parentid' in c:
-            self.parentid = c['parentid']
-            
-        if 'posted' in c:
-            self.posted = c['posted']
-            
-        if 'replies' in c:
-            self.replies = c['replies']
-            
-        if 'hidden' in c:
-            self.hidden = c['hidden']
-            
-        if 'body' in c:
-            self.body = c['body']
-            
-        if 'user' in c:
-            self.user = User()
-            self.user.from_dict(c['user'])
-    
     def __repr__(self):        
-        return self.commentid
\ No newline at end of file
+        return self.commentid
+
+define(Comment, (
+    Field("commentid"),
+    Field("parentid"),
+    Field("posted"),
+    Field("replies"),
+    Field("hidden"),
+    Field("body"),
+    Field("user", model=User),
+))
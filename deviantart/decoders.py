@@ -0,0 +1,58 @@
+"""
+    deviantart.decoders
+    ^^^^^^^^^^^^^^^^^^^
+
+    JSON decoders for API responses
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import importlib
+import json
+
+#: Optional JSON libraries, fastest first
+BACKENDS = ("orjson", "ujson", "simplejson")
+
+
+def json_loads(body):
+
+    """Decodes a JSON body with the json module of the standard library
+
+    :param body: the body as bytes (utf-8) or text
+    """
+
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    return json.loads(body)
+
+
+def load_backend(name):
+
+    """Returns the loads function of a JSON library (None if it is not installed)
+
+    :param name: the module name of the library
+    """
+
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        return None
+    return module.loads
+
+
+def best_decoder(backends=BACKENDS):
+
+    """Returns the loads function of the fastest installed JSON library
+
+    Falls back to :func:`json_loads` if none of backends is installed.
+
+    :param backends: module names of the libraries to try, fastest first
+    """
+
+    for name in backends:
+        loads = load_backend(name)
+        if loads is not None:
+            return loads
+    return json_loads
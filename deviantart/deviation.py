@@ -7,10 +7,20 @@
     :copyright: (c) 2015 by Kevin Eichhorn
 """
 
+from .schema import Field, define
 from .user import User
 
 class Deviation(object):
-	
+
+	__slots__ = (
+		"deviationid", "printid", "url", "title", "category", "category_path",
+		"is_favourited", "is_deleted", "author", "stats", "published_time",
+		"allows_comments", "preview", "content", "thumbs", "videos", "flash",
+		"daily_deviation", "excerpt", "is_mature", "is_downloadable",
+		"download_filesize", "challenge", "challenge_entry", "motion_book",
+		"html", "css",
+	)
+
 	def __init__(self):
 		self.deviationid = None
 		self.printid = None
@@ -42,85 +52,33 @@ class Deviation(object):
 	
 	def __repr__(self):
 		return self.deviationid
-					
-	def from_dict(self, d):
-	
-		self.deviationid = d['deviationid']
-		self.printid = d['printid']
-		
-		if 'url' in d:
-			self.url = d['url']
-		
-		if 'title' in d:
-			self.title = d['title']
-		
-		if 'category' in d:
-			self.category = d['category']
-		
-		if 'category_path' in d:
-			self.category_path = d['category_path']
-		
-		if 'is_favourited' in d:
-			self.is_downloadable = d['is_downloadable']
-
-		if 'is_deleted' in d:
-			self.is_deleted = d['is_deleted']
 
-		if 'author' in d:
-			self.author = User()
-			self.author.from_dict(d['author'])
-			
-		if 'stats' in d:
-			self.stats = d['stats']
-			
-		if 'published_time' in d:
-			self.published_time = d['published_time']
-			
-		if 'allows_comments' in d:
-			self.allows_comments = d['allows_comments']
-			
-		if 'preview' in d:
-			self.preview = d['preview']
-			
-		if 'content' in d:
-			self.content = d['content']
-			
-		if 'thumbs' in d:
-			self.thumbs = d['thumbs']
-			
-		if 'videos' in d:
-			self.videos = d['videos']
-			
-		if 'flash' in d:
-			self.flash = d['flash']
-			
-		if 'daily_deviation' in d:
-			self.daily_deviation = d['daily_deviation']
-			
-		if 'excerpt' in d:
-			self.excerpt = d['excerpt']
-			
-		if 'is_mature' in d:
-			self.is_mature = d['is_mature']
-			
-		if 'is_downloadable' in d:
-			self.is_downloadable = d['is_downloadable']
-			
-		if 'download_filesize' in d:
-			self.download_filesize = d['download_filesize']
-			
-		if 'challenge' in d:
-			self.challenge = d['challenge']
-			
-		if 'challenge_entry' in d:
-			self.challenge_entry = d['challenge_entry']
-			
-		if 'motion_book' in d:
-			self.motion_book = d['motion_book']			
-		
-		if 'html' in d:
-			self.html = d['html']
-			
-		if 'css' in d:
-			self.css = d['css']
-	
\ No newline at end of file
+define(Deviation, (
+	Field("deviationid", required=True),
+	Field("printid", required=True),
+	Field("url"),
+	Field("title"),
+	Field("category"),
+	Field("category_path"),
+	Field("is_favourited"),
+	Field("is_deleted"),
+	Field("author", model=User),
+	Field("stats"),
+	Field("published_time"),
+	Field("allows_comments"),
+	Field("preview"),
+	Field("content"),
+	Field("thumbs"),
+	Field("videos"),
+	Field("flash"),
+	Field("daily_deviation"),
+	Field("excerpt"),
+	Field("is_mature"),
+	Field("is_downloadable"),
+	Field("download_filesize"),
+	Field("challenge"),
+	Field("challenge_entry"),
+	Field("motion_book"),
+	Field("html"),
+	Field("css"),
+))
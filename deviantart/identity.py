@@ -0,0 +1,118 @@
+"""
+    deviantart.identity
+    ^^^^^^^^^^^^^^^^^^^
+
+    Identity map sharing one model between the items of results
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import threading
+from collections import OrderedDict
+
+#: Whether OrderedDict is the C implementation of Python 3
+_MOVE_TO_END = hasattr(OrderedDict, "move_to_end")
+
+
+class IdentityMap(object):
+
+    """LRU map of the users decoded so far, keyed on userid
+
+    The authors of a gallery page, the originators of a message feed or the
+    users of a comment thread repeat a lot. Decoded with an identity map,
+    every repeated user is the :class:`deviantart.user.User` built the first
+    time it was seen, so the results share one instance per user. That
+    instance keeps the fields of the first item, later items of the same
+    user do not update it. The API Interface therefore fetches users asked
+    for by name without its identity map, and discards the users its
+    writes change.
+
+    The least recently used users are dropped once more than max_entries
+    are mapped.
+
+    :param max_entries: the maximum number of mapped users
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+
+        """Returns the model mapped to key or None
+
+        :param key: the id of the model
+        """
+
+        model = self._models.get(key)
+        if model is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        if _MOVE_TO_END:
+            # without the lock, every operation of the C OrderedDict is atomic
+            try:
+                self._models.move_to_end(key)
+            except KeyError:
+                # dropped by another thread in the meantime
+                pass
+        else:
+            with self._lock:
+                if key in self._models:
+                    self._models[key] = self._models.pop(key)
+
+        return model
+
+    def add(self, key, model):
+
+        """Maps key to model, dropping the least recently used models
+
+        :param key: the id of the model
+        :param model: the decoded model
+        """
+
+        with self._lock:
+            self._models[key] = model
+            while len(self._models) > self.max_entries:
+                self._models.popitem(last=False)
+
+    def discard(self, match):
+
+        """Removes the models match is true for
+
+        :param match: function(model) returning whether to remove the model
+        """
+
+        with self._lock:
+            for key, model in list(self._models.items()):
+                if match(model):
+                    del self._models[key]
+
+    def clear(self):
+
+        """Removes all models"""
+
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+
+        """Returns the counters as dict (approximate while threads share the map)"""
+
+        with self._lock:
+            return {
+                "hits" : self.hits,
+                "misses" : self.misses,
+                "entries" : len(self._models)
+            }
+
+    def __len__(self):
+        return len(self._models)
@@ -0,0 +1,101 @@
+"""
+    deviantart.lazy
+    ^^^^^^^^^^^^^^^
+
+    Models that keep the decoded response and build their fields on access
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+from .comment import Comment
+from .deviation import Deviation
+from .message import Message
+from .status import Status
+from .user import User
+
+
+class LazyModel(object):
+
+    """Mixin of the lazy models
+
+    from_dict only keeps the decoded item. A field is built the first time
+    it is read and then stored like in an eagerly built model, nested models
+    are lazy as well. Lazy models are instances of the model they stand in
+    for, e.g. ``isinstance(lazy_class(Deviation)(), Deviation)`` holds.
+    """
+
+    __slots__ = ()
+
+    #: attribute => function building it from the decoded item
+    _fields = {}
+
+    def __init__(self):
+        self._data = {}
+
+    def from_dict(self, d):
+        self._data = d
+
+    def __getattr__(self, name):
+        build = type(self)._fields.get(name)
+        if build is None:
+            raise AttributeError(name)
+
+        value = build(self._data)
+        setattr(self, name, value)
+        return value
+
+    def hydrate(self):
+
+        """Builds all fields that were not read yet, e.g. before pickling"""
+
+        for name in type(self)._fields:
+            getattr(self, name)
+        return self
+
+
+def _lazy_model(cls, item):
+    model = lazy_class(cls)()
+    model.from_dict(item)
+    return model
+
+
+def _builder(field):
+
+    """Builds the value of a :class:`deviantart.schema.Field` from the decoded item"""
+
+    if field.model is None and field.models is None:
+        key = field.key
+        return lambda d: d.get(key)
+    return lambda d: field.convert(d.get(field.key), _lazy_model)
+
+
+_LAZY_CLASSES = {}
+
+
+def lazy_class(cls):
+
+    """Returns the lazy variant of a model class
+
+    :param cls: the model class, e.g. :class:`deviantart.deviation.Deviation` (its fields are taken from the table passed to :func:`deviantart.schema.define`)
+    """
+
+    lazy = _LAZY_CLASSES.get(cls)
+    if lazy is None:
+        fields = dict((field.name, _builder(field)) for field in cls.fields)
+        lazy = type("Lazy" + cls.__name__, (LazyModel, cls), {
+            "__slots__" : ("_data",),
+            "__module__" : __name__,
+            "_fields" : fields,
+        })
+        _LAZY_CLASSES[cls] = lazy
+    return lazy
+
+
+# module level names, so lazy models can be pickled
+LazyComment = lazy_class(Comment)
+LazyDeviation = lazy_class(Deviation)
+LazyMessage = lazy_class(Message)
+LazyStatus = lazy_class(Status)
+LazyUser = lazy_class(User)
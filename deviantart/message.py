@@ -7,6 +7,7 @@
     :copyright: (c) 2015 by Kevin Eichhorn
 """
 
+from .schema import Field, define
 from .user import User
 from .deviation import Deviation
 from .status import Status
@@ -14,6 +15,12 @@ from .comment import Comment
 
 class Message(object):
 
+	__slots__ = (
+		"messageid", "messagetype", "orphaned", "ts", "stackid", "stack_count",
+		"originator", "subject", "html", "profile", "deviation", "status",
+		"comment", "collection", "template", "template_items",
+	)
+
 	def __init__(self):
 		self.messageid = None
 		self.messagetype = None
@@ -33,79 +40,24 @@ class Message(object):
 		self.template_items = None
 
 		
-	def from_dict(self, m):
-	
-		self.messageid = m['messageid']
-		
-		self.messagetype = m['type']
-		
-		self.orphaned = m['orphaned']
-		
-		if 'ts' in m:
-		    self.ts = m['ts']
-		    
-		if 'stackid' in m:
-		    self.stackid = m['stackid']
-		    
-		if 'stack_count' in m:
-		    self.stack_count = m['stack_count']
-		    
-		if 'originator' in m:
-		    self.originator = User()
-		    self.originator.from_dict(m['originator'])
-		    
-		if 'subject' in m:
-		    self.subject = {}
-		    
-		    if "profile" in m['subject']:
-		        self.subject['profile'] = User()
-		        self.subject['profile'].from_dict(m['subject']['profile'])
-		    
-		    if "deviation" in m['subject']:
-		        self.subject['deviation'] = Deviation()
-		        self.subject['deviation'].from_dict(m['subject']['deviation'])
-		    
-		    if "status" in m['subject']:
-		        self.subject['status'] = Status()
-		        self.subject['status'].from_dict(m['subject']['status'])
-		    
-		    if "comment" in m['subject']:
-		        self.subject['comment'] = Status()
-		        self.subject['comment'].from_dict(m['subject']['comment'])
-		    
-		    if "collection" in m['subject']:
-		        self.subject['collection'] = m['subject']['collection']
-		    
-		    if "gallery" in m['subject']:
-		        self.subject['gallery'] = m['subject']['gallery']
-		        		        		        		        		        		    
-		if 'html' in m:
-		    self.html = m['html']
-		    
-		if 'profile' in m:
-		    self.profile = User()
-		    self.profile.from_dict(m['profile'])
-		    
-		if 'deviation' in m:
-		    self.deviation = Deviation()
-		    self.deviation.from_dict(m['deviation'])
-		    
-		if 'status' in m:
-		    self.status = Status()
-		    self.status.from_dict(m['status'])
-		    
-		if 'comment' in m:
-		    self.comment = Comment()
-		    self.comment.from_dict(m['comment'])
-		    
-		if 'collection' in m:
-		    self.collection = m['collection']
-		    
-		if 'template' in m:
-		    self.template = m['template']
-		    
-		if 'template_items' in m:
-		    self.template_items = template_items
-	
 	def __repr__(self):		
-		return self.messageid
\ No newline at end of file
+		return self.messageid
+
+define(Message, (
+	Field("messageid", required=True),
+	Field("messagetype", "type", required=True),
+	Field("orphaned", required=True),
+	Field("ts"),
+	Field("stackid"),
+	Field("stack_count"),
+	Field("originator", model=User),
+	Field("subject", models={"profile" : User, "deviation" : Deviation, "status" : Status, "comment" : Comment}),
+	Field("html"),
+	Field("profile", model=User),
+	Field("deviation", model=Deviation),
+	Field("status", model=Status),
+	Field("comment", model=Comment),
+	Field("collection"),
+	Field("template"),
+	Field("template_items"),
+))
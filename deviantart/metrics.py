@@ -0,0 +1,250 @@
+"""
+    deviantart.metrics
+    ^^^^^^^^^^^^^^^^^^
+
+    Per endpoint counters and latency histograms of API calls
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import re
+import threading
+import time
+
+#: A high resolution clock for measuring phases
+clock = getattr(time, "perf_counter", time.time)
+
+#: Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#: Upper bounds of the response size histogram buckets
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+#: The observed values, their histogram buckets and descriptions
+OBSERVATIONS = {
+    "connect" : (LATENCY_BUCKETS, "Seconds spent opening connections"),
+    "transfer" : (LATENCY_BUCKETS, "Seconds spent sending requests and receiving responses"),
+    "decode" : (LATENCY_BUCKETS, "Seconds spent decoding JSON bodies"),
+    "model" : (LATENCY_BUCKETS, "Seconds spent building models from decoded responses"),
+    "response_bytes" : (SIZE_BUCKETS, "Bytes of response bodies received"),
+}
+
+#: The counters and their descriptions
+COUNTERS = {
+    "calls" : "API calls made",
+    "errors" : "API calls that raised an error",
+}
+
+#: Endpoints without parameters in their path
+ENDPOINTS = frozenset([
+    "/browse/categorytree", "/browse/dailydeviations", "/browse/hot",
+    "/browse/morelikethis", "/browse/morelikethis/preview", "/browse/newest",
+    "/browse/popular", "/browse/tags", "/browse/tags/search",
+    "/browse/undiscovered", "/browse/user/journals", "/collections/fave",
+    "/collections/folders", "/collections/unfave", "/data/countries",
+    "/data/privacy", "/data/submission", "/data/tos", "/deviation/content",
+    "/deviation/embeddedcontent", "/deviation/metadata", "/deviation/whofaved",
+    "/gallery/all", "/gallery/folders", "/messages/delete", "/messages/feed",
+    "/messages/feedback", "/messages/mentions", "/notes", "/notes/delete",
+    "/notes/folders", "/notes/folders/create", "/notes/mark", "/notes/move",
+    "/notes/send", "/user/damntoken", "/user/friends/search",
+    "/user/profile/update", "/user/statuses/", "/user/statuses/post",
+    "/user/whoami", "/user/whois",
+])
+
+#: Endpoints with parameters in their path, the first matching one wins
+TEMPLATES = (
+    "/collections/{folderid}",
+    "/comments/post/deviation/{deviationid}",
+    "/comments/post/profile/{username}",
+    "/comments/post/status/{statusid}",
+    "/comments/deviation/{deviationid}",
+    "/comments/profile/{username}",
+    "/comments/status/{statusid}",
+    "/comments/{commentid}/siblings",
+    "/deviation/download/{deviationid}",
+    "/deviation/{deviationid}",
+    "/gallery/{folderid}",
+    "/messages/feedback/{stackid}",
+    "/messages/mentions/{stackid}",
+    "/notes/folders/remove/{folderid}",
+    "/notes/folders/rename/{folderid}",
+    "/notes/{noteid}",
+    "/user/friends/unwatch/{username}",
+    "/user/friends/watch/{username}",
+    "/user/friends/watching/{username}",
+    "/user/friends/{username}",
+    "/user/profile/{username}",
+    "/user/statuses/{statusid}",
+    "/user/watchers/{username}",
+)
+
+_TEMPLATES = [
+    (re.compile("^" + re.sub(r"\\\{\w+\\\}", "[^/]+", re.escape(template)) + "$"), template)
+    for template in TEMPLATES
+]
+
+
+def endpoint_label(endpoint):
+
+    """The endpoint with ids and usernames replaced by placeholders, so metrics of all deviations add up
+
+    :param endpoint: the API endpoint
+    """
+
+    if endpoint in ENDPOINTS:
+        return endpoint
+
+    for pattern, template in _TEMPLATES:
+        if pattern.match(endpoint):
+            return template
+
+    return endpoint
+
+
+class Histogram(object):
+
+    """Counts observations into buckets
+
+    :param buckets: the upper bounds of the buckets, ascending
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+
+        """Returns count, sum and the cumulative bucket counts as dict"""
+
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            cumulative.append((bound, total))
+
+        return {"count" : self.count, "sum" : self.sum, "buckets" : cumulative}
+
+
+class MetricsSink(object):
+
+    """Base class of metric sinks
+
+    The API Interface reports every measurement to its sink. Subclass this
+    to forward measurements to a monitoring system.
+    """
+
+    def increment(self, endpoint, name, value=1):
+
+        """Adds value to a counter
+
+        :param endpoint: the endpoint label (see :func:`endpoint_label`)
+        :param name: one of :data:`COUNTERS`
+        :param value: the amount to add
+        """
+
+        pass
+
+    def observe(self, endpoint, name, value):
+
+        """Records a measurement
+
+        :param endpoint: the endpoint label (see :func:`endpoint_label`)
+        :param name: one of :data:`OBSERVATIONS`
+        :param value: the measured seconds or bytes
+        """
+
+        pass
+
+    def snapshot(self):
+
+        """Returns the collected metrics as dict (empty if the sink keeps none)"""
+
+        return {}
+
+
+class Metrics(MetricsSink):
+
+    """Keeps counters and histograms per endpoint in memory"""
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _metrics(self, endpoint):
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = dict((name, 0) for name in COUNTERS)
+            metrics.update((name, Histogram(buckets)) for name, (buckets, _) in OBSERVATIONS.items())
+            self._endpoints[endpoint] = metrics
+        return metrics
+
+    def increment(self, endpoint, name, value=1):
+        with self._lock:
+            self._metrics(endpoint)[name] += value
+
+    def observe(self, endpoint, name, value):
+        with self._lock:
+            self._metrics(endpoint)[name].observe(value)
+
+    def snapshot(self):
+
+        """Returns the counters and histograms of every endpoint as dict"""
+
+        with self._lock:
+            return dict(
+                (endpoint, dict(
+                    (name, value.snapshot() if isinstance(value, Histogram) else value)
+                    for name, value in metrics.items()
+                ))
+                for endpoint, metrics in self._endpoints.items()
+            )
+
+    def prometheus(self, prefix="deviantart"):
+
+        """Returns the metrics in the Prometheus text exposition format
+
+        :param prefix: the prefix of all metric names
+        """
+
+        snapshot = self.snapshot()
+        lines = []
+
+        for name in sorted(COUNTERS):
+            metric = "{}_{}_total".format(prefix, name)
+            lines.append("# HELP {} {}".format(metric, COUNTERS[name]))
+            lines.append("# TYPE {} counter".format(metric))
+            for endpoint in sorted(snapshot):
+                lines.append('{}{{endpoint="{}"}} {}'.format(metric, _escape(endpoint), snapshot[endpoint][name]))
+
+        for name in sorted(OBSERVATIONS):
+            metric = "{}_{}{}".format(prefix, name, "" if name.endswith("bytes") else "_seconds")
+            lines.append("# HELP {} {}".format(metric, OBSERVATIONS[name][1]))
+            lines.append("# TYPE {} histogram".format(metric))
+            for endpoint in sorted(snapshot):
+                histogram = snapshot[endpoint][name]
+                label = _escape(endpoint)
+                for bound, count in histogram["buckets"]:
+                    lines.append('{}_bucket{{endpoint="{}",le="{}"}} {}'.format(metric, label, bound, count))
+                lines.append('{}_sum{{endpoint="{}"}} {!r}'.format(metric, label, histogram["sum"]))
+                lines.append('{}_count{{endpoint="{}"}} {}'.format(metric, label, histogram["count"]))
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,536 @@
+"""
+    deviantart.pagination
+    ^^^^^^^^^^^^^^^^^^^^^
+
+    Iteration over the items of offset paginated listings
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import re
+import threading
+from collections import deque
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from .tracing import bind
+
+#: The keyword arguments of :meth:`deviantart.api.Api.paginate` that configure the iterator
+PAGE_OPTIONS = ("offset", "key", "max_items", "prefetch", "fanout", "checkpoint")
+
+#: The options saved to the checkpoint of a crawl and applied again by :meth:`deviantart.api.Api.resume`
+RESUMED_OPTIONS = ("key", "max_items", "prefetch", "fanout")
+
+#: The largest limit the paginated endpoints accept, by endpoint label (see
+#: :func:`deviantart.metrics.endpoint_label`)
+MAX_LIMITS = {
+    "/browse/hot" : 120,
+    "/browse/newest" : 120,
+    "/browse/popular" : 120,
+    "/browse/undiscovered" : 120,
+    "/browse/morelikethis" : 50,
+    "/browse/tags" : 50,
+    "/browse/user/journals" : 50,
+    "/deviation/embeddedcontent" : 50,
+    "/deviation/whofaved" : 50,
+    "/collections/folders" : 50,
+    "/collections/{folderid}" : 24,
+    "/gallery/all" : 24,
+    "/gallery/folders" : 50,
+    "/gallery/{folderid}" : 24,
+    "/user/friends/{username}" : 50,
+    "/user/statuses/" : 50,
+    "/user/watchers/{username}" : 50,
+    "/comments/deviation/{deviationid}" : 50,
+    "/comments/profile/{username}" : 50,
+    "/comments/status/{statusid}" : 50,
+    "/comments/{commentid}/siblings" : 50,
+    "/messages/feedback" : 50,
+    "/messages/feedback/{stackid}" : 50,
+    "/messages/mentions" : 50,
+    "/messages/mentions/{stackid}" : 50,
+    "/notes" : 50,
+}
+
+#: The limit of endpoints missing from :data:`MAX_LIMITS`
+DEFAULT_LIMIT = 10
+
+
+def rejected_limit(data, limit):
+
+    """The limit to use after an error response rejected limit (None if it did not)
+
+    The largest number below limit in the error details is taken, without
+    one the limit is halved.
+
+    :param data: the decoded error response
+    :param limit: the rejected limit
+    """
+
+    details = data.get("error_details")
+    if data.get("error") != "invalid_request" or not isinstance(details, dict) or not details.get("limit"):
+        return None
+
+    numbers = [int(number) for number in re.findall(r"\d+", details["limit"]) if 0 < int(number) < limit]
+    if numbers:
+        return max(numbers)
+
+    return limit // 2 or None
+
+
+#: The attributes (or keys) identifying listed items, the first one present is used
+ID_KEYS = ("deviationid", "commentid", "statusid", "messageid", "noteid", "folderid", "userid")
+
+
+def item_id(item):
+
+    """The id of a listed model or dict (None if it has none)
+
+    Dicts without an id of their own, like the entries of watcher lists,
+    are identified by their user.
+
+    :param item: the listed item
+    """
+
+    if isinstance(item, dict):
+        for key in ID_KEYS:
+            if item.get(key):
+                return item[key]
+        if "user" in item:
+            return item_id(item["user"])
+        return None
+
+    for key in ID_KEYS:
+        value = getattr(item, key, None)
+        if value:
+            return value
+
+    return None
+
+
+class PageIterator(object):
+
+    """Yields the items of an offset paginated listing, page after page
+
+    While the items of one page are consumed, the next pages are fetched by
+    a background thread. At most prefetch pages are buffered, so a slow
+    consumer holds back the fetching instead of piling up pages. Errors of
+    the background fetches are raised by the iteration, which is over after
+    an error: every later call raises it again.
+
+    Spans that are open when the iteration starts become the parents of the
+    requests of all pages.
+
+    :param fetch: A function fetching the page at an offset, returning a dict with the items, has_more and next_offset
+    :param offset: The offset of the first page
+    :param key: The key of the items in a page
+    :param max_items: Stop after this many items (None for all)
+    :param prefetch: The number of pages fetched ahead (0 fetches every page when it is needed)
+    :param checkpoint: A :class:`deviantart.checkpoint.Checkpoint` the progress is saved to and resumed from
+    """
+
+    def __init__(self, fetch, offset=0, key="results", max_items=None, prefetch=1, checkpoint=None):
+        self.fetch = fetch
+        self.offset = offset
+        self.key = key
+        self.max_items = max_items
+        self.prefetch = prefetch
+        self.checkpoint = checkpoint
+
+        #: The offset of the page after the ones consumed so far (None once the listing ends)
+        self.next_offset = offset
+        self.pages = 0
+        self.emitted = 0
+
+        self._items = deque()
+        self._exhausted = False
+        self._error = None
+        self._pages = None
+        self._queue = None
+        self._stopped = threading.Event()
+        self._page_offset = offset
+        self._page_emitted = 0
+        self._skip = 0
+        self._trace = None
+
+        if checkpoint is not None and checkpoint.state is not None and checkpoint.state[self._position_key] is not None:
+            state = checkpoint.state
+            self.offset = self.next_offset = self._page_offset = state[self._position_key]
+            self.emitted = state["items"]
+            self._skip = state["skip"]
+            self._exhausted = state["done"]
+
+    #: The checkpoint key the position of the page being consumed is saved under
+    _position_key = "offset"
+
+    def __iter__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _following(self, page, fetched):
+
+        """The offset of the page after page, or None if there is none to fetch
+
+        :param page: the fetched page
+        :param fetched: the number of items fetched up to and including page
+        """
+
+        if self.max_items is not None and fetched >= self.max_items:
+            return None
+
+        return self._after(page)
+
+    def _after(self, page):
+
+        """The position of the page after page (None at the end of the listing)"""
+
+        if not page['has_more']:
+            return None
+
+        return page['next_offset']
+
+    def _fetch_pages(self):
+        offset = self.offset
+        fetched = 0
+
+        while offset is not None and not self._stopped.is_set():
+            page = self.fetch(offset)
+            fetched += len(page[self.key])
+            yield page
+            offset = self._following(page, fetched)
+
+    def _produce(self):
+
+        """Runs in the background thread, putting (page, error) pairs into the queue"""
+
+        try:
+            for page in self._fetch_pages():
+                if not self._put((page, None)):
+                    return
+        except Exception as e:
+            self._put((None, e))
+            return
+
+        self._put((None, None))
+
+    def _put(self, entry):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fail(self, error):
+
+        """Stops the iteration after a failed fetch, every later call raises error again"""
+
+        self._error = error
+        self.close()
+
+    def _next_page(self):
+        if self._error is not None:
+            raise self._error
+
+        if self.prefetch <= 0:
+            if self._pages is None:
+                self._pages = self._fetch_pages()
+            try:
+                return next(self._pages, None)
+            except Exception as e:
+                self._fail(e)
+                raise
+
+        if self._queue is None:
+            self._queue = queue.Queue(self.prefetch)
+            thread = threading.Thread(target=bind(self._produce))
+            thread.daemon = True
+            thread.start()
+
+        page, error = self._queue.get()
+        if error is not None:
+            self._fail(error)
+            raise error
+
+        return page
+
+    def _consume(self, page):
+
+        """Takes the items of a page, returns False at the end of the listing"""
+
+        if page is None:
+            self._exhausted = True
+            self.next_offset = None
+            if self.checkpoint is not None:
+                self._finished()
+            self.close()
+            return False
+
+        self.pages += 1
+        self._page_offset = self.next_offset
+        self._page_emitted = self._skip
+        self.next_offset = self._after(page)
+        self._items.extend(page[self.key][self._skip:])
+        self._skip = 0
+        return True
+
+    def _emit(self):
+
+        """Takes the next item, recording the progress in the checkpoint"""
+
+        self.emitted += 1
+        self._page_emitted += 1
+
+        if self.checkpoint is not None:
+            progress = {self._position_key : self._page_offset, "skip" : self._page_emitted, "items" : self.emitted}
+            self.checkpoint.update(**progress)
+
+        return self._items.popleft()
+
+    def _finished(self):
+
+        """Records the end of the listing in the checkpoint"""
+
+        self.checkpoint.update(done=True)
+
+    def _limit_reached(self):
+        if self.max_items is not None and self.emitted >= self.max_items:
+            self.close()
+            return True
+        return False
+
+    def _ended(self):
+
+        """Whether no page follows, at the end of the listing or once closed (a failed iteration raises its error instead)"""
+
+        return self._exhausted or (self._stopped.is_set() and self._error is None)
+
+    def __next__(self):
+        if self._limit_reached():
+            raise StopIteration
+
+        while not self._items:
+            if self._ended():
+                self.close()
+                raise StopIteration
+            if not self._consume(self._next_page()):
+                raise StopIteration
+
+        return self._emit()
+
+    next = __next__
+
+    def trace(self, tracer, span):
+
+        """Ends span when the iteration is over, with the error that ended it
+
+        :param tracer: the :class:`deviantart.tracing.Tracer` span was opened by
+        :param span: the span opened by :meth:`deviantart.tracing.Tracer.begin`
+        """
+
+        self._trace = (tracer, span)
+
+    def close(self):
+
+        """Stops fetching pages in the background, saves the checkpoint and ends the span"""
+
+        if self.checkpoint is not None and not self._stopped.is_set():
+            self.checkpoint.save()
+        self._stopped.set()
+
+        if self._trace is not None:
+            (tracer, span), self._trace = self._trace, None
+            tracer.end(span, self._error)
+
+
+class CursorIterator(PageIterator):
+
+    """Yields the items of a cursor paginated feed, page after page
+
+    Works like :class:`PageIterator`, with cursors in place of offsets. The
+    items are decoded by the consumer while the next pages are fetched. The
+    cursor after the last page is kept (and saved to the checkpoint), so a
+    drained feed can be continued from it later on.
+
+    :param fetch: A function fetching the page at a cursor, returning a dict with the items, has_more and cursor
+    :param cursor: The cursor of the first page
+    :param key: The key of the items in a page
+    :param max_items: Stop after this many items (None for all)
+    :param prefetch: The number of pages fetched ahead (0 fetches every page when it is needed)
+    :param checkpoint: A :class:`deviantart.checkpoint.Checkpoint` the cursor is saved to and resumed from
+    :param decode: A function turning each item into the object to yield
+    """
+
+    _position_key = "cursor"
+
+    def __init__(self, fetch, cursor="", key="results", max_items=None, prefetch=1, checkpoint=None, decode=None):
+        PageIterator.__init__(self, fetch, cursor, key, max_items, prefetch, checkpoint)
+        self.decode = decode
+
+        #: The cursor after the last page consumed
+        self.cursor = self.offset
+
+    def _after(self, page):
+        if not page['has_more']:
+            return None
+
+        return page['cursor']
+
+    def _consume(self, page):
+        if page is not None:
+            self.cursor = page['cursor']
+
+        return PageIterator._consume(self, page)
+
+    def _emit(self):
+        item = PageIterator._emit(self)
+        return self.decode(item) if self.decode is not None else item
+
+    def _finished(self):
+        self.checkpoint.update(cursor=self.cursor, skip=0)
+
+
+class _Window(object):
+
+    """A page fetched by a thread of its own"""
+
+    def __init__(self, fetch, offset):
+        self.page = None
+        self.error = None
+        self._thread = threading.Thread(target=bind(self._run), args=(fetch, offset))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, fetch, offset):
+        try:
+            self.page = fetch(offset)
+        except Exception as e:
+            self.error = e
+
+    def result(self):
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.page
+
+
+class ParallelPageIterator(PageIterator):
+
+    """Yields the items of an offset paginated listing, fetching several pages at once
+
+    The first page tells the page size, then the pages at the following
+    offsets are fetched concurrently, at most fanout at a time. Pages are
+    yielded in offset order and no further ones are requested once a page
+    says the listing ends. Items that shift from one page to the next while
+    the listing is fetched are yielded only once.
+
+    :param fetch: A function fetching the page at an offset, returning a dict with the items, has_more and next_offset
+    :param offset: The offset of the first page
+    :param key: The key of the items in a page
+    :param max_items: Stop after this many items (None for all)
+    :param prefetch: The number of merged pages buffered for the consumer
+    :param fanout: The number of pages fetched at once
+    :param identity: A function returning the id items are deduplicated by (None to not deduplicate an item)
+    :param checkpoint: A :class:`deviantart.checkpoint.Checkpoint` the progress is saved to and resumed from
+    """
+
+    def __init__(self, fetch, offset=0, key="results", max_items=None, prefetch=1, fanout=4, identity=item_id, checkpoint=None):
+        PageIterator.__init__(self, fetch, offset, key, max_items, prefetch, checkpoint)
+        self.fanout = fanout
+        self.identity = identity
+        self.duplicates = 0
+
+        self._seen = set()
+        self._step = None
+        self._next_window = None
+        self._end = None
+
+    def _plan(self, page, offset):
+
+        """Learns the page size from the first page, returns the offset of the next one
+
+        :param page: the first page
+        :param offset: the offset of the first page
+        """
+
+        following = self._following(page, len(page[self.key]))
+        if following is not None:
+            self._step = max(following - offset, 1)
+            self._next_window = following
+        return following
+
+    def _schedule(self, pending, start):
+
+        """Starts fetches of the windows after the ones pending, up to fanout
+
+        :param pending: dict of the pending fetches by offset
+        :param start: function starting the fetch of an offset
+        """
+
+        while len(pending) < self.fanout and not self._stopped.is_set():
+            if self._end is not None and self._next_window > self._end:
+                return
+            if self.max_items is not None and self._next_window - self.offset >= self.max_items:
+                return
+            pending[self._next_window] = start(self._next_window)
+            self._next_window += self._step
+
+    def _merged(self, page, offset, fetched):
+
+        """Takes a page fetched in parallel, returns the offset of the next one
+
+        :param page: the fetched page
+        :param offset: the offset of page
+        :param fetched: the number of items fetched up to and including page
+        """
+
+        following = self._following(page, fetched)
+        if following is None:
+            self._end = offset
+        return following
+
+    def _fetch_pages(self):
+        page = self.fetch(self.offset)
+        yield page
+
+        offset = self._plan(page, self.offset)
+        fetched = len(page[self.key])
+        pending = {}
+
+        while offset is not None and not self._stopped.is_set():
+            if offset not in pending:
+                # the listing moved on differently than planned, start over from offset
+                pending.clear()
+                self._next_window = offset
+            self._schedule(pending, lambda window: _Window(self.fetch, window))
+
+            page = pending.pop(offset).result()
+            fetched += len(page[self.key])
+            yield page
+            offset = self._merged(page, offset, fetched)
+
+    def _consume(self, page):
+        if page is not None and self.identity is not None:
+            items = []
+            for item in page[self.key]:
+                key = self.identity(item)
+                if key is None or key not in self._seen:
+                    self._seen.add(key)
+                    items.append(item)
+                else:
+                    self.duplicates += 1
+            page = dict(page)
+            page[self.key] = items
+
+        return PageIterator._consume(self, page)
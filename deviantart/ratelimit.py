@@ -0,0 +1,188 @@
+"""
+    deviantart.ratelimit
+    ^^^^^^^^^^^^^^^^^^^^
+
+    Client side rate limiting of API requests
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+_now = getattr(time, "monotonic", time.time)
+
+
+def parse_retry_after(value):
+
+    """Parses a Retry-After header into seconds (None if it can't be parsed)
+
+    :param value: delay in seconds or a HTTP date
+    """
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+
+    return max(0.0, mktime_tz(date) - time.time())
+
+
+class TokenBucket(object):
+
+    """A token bucket that refills at rate tokens per second
+
+    Callers reserve a token and get back the number of seconds they have to
+    wait before sending, so the bucket works for threads and coroutines alike.
+
+    :param rate: tokens added per second
+    :param burst: the number of tokens the bucket holds
+    """
+
+    def __init__(self, rate, burst, clock=_now):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.blocked_until = 0.0
+
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+
+        """Take a token and return the seconds to wait before using it"""
+
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= 1
+
+            delay = max(0.0, self.blocked_until - now)
+            if self.tokens < 0:
+                delay = max(delay, -self.tokens / self.rate)
+
+            return delay
+
+    def block(self, seconds):
+
+        """Hand out no tokens for the next seconds"""
+
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, self._clock() + seconds)
+
+
+class RateLimiter(object):
+
+    """Token bucket rate limiter with one bucket per endpoint family
+
+    The family of an endpoint is its first path segment (browse, deviation,
+    user, messages, ...). The rate of a family is lowered multiplicatively
+    when DeviantArt throttles a request and raised additively (about
+    increase requests/sec per second) while requests succeed. Above the rate
+    it was last throttled at it only grows at a tenth of that speed, so the
+    throughput settles just below the threshold instead of oscillating.
+
+    One limiter can be shared by several :class:`deviantart.api.Api` (and
+    :class:`deviantart.aio.AsyncApi`) instances.
+
+    :param rate: requests per second allowed per family
+    :param burst: requests that may be sent at once per family
+    :param rates: dict of family => (rate, burst) overriding the defaults
+    :param min_rate: the lowest rate a family is slowed down to
+    :param increase: additive increase of the rate per second without throttling
+    :param decrease: factor the rate is multiplied with when throttled
+    """
+
+    def __init__(self, rate=10.0, burst=10, rates=None, min_rate=0.1, increase=0.5, decrease=0.5, clock=_now):
+        self.rate = rate
+        self.burst = burst
+        self.rates = rates or {}
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+
+        self._clock = clock
+        self._buckets = {}
+        self._ceilings = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def family(endpoint):
+
+        """The endpoint family an endpoint belongs to
+
+        :param endpoint: the API endpoint, e.g. /browse/hot
+        """
+
+        return endpoint.lstrip('/').split('/', 1)[0].split('?', 1)[0]
+
+    def bucket(self, endpoint):
+
+        """The :class:`TokenBucket` of the family of endpoint"""
+
+        family = self.family(endpoint)
+
+        with self._lock:
+            if family not in self._buckets:
+                rate, burst = self.rates.get(family, (self.rate, self.burst))
+                self._buckets[family] = TokenBucket(rate, burst, clock=self._clock)
+
+            return self._buckets[family]
+
+    def reserve(self, endpoint):
+
+        """Take a token for endpoint and return the seconds to wait"""
+
+        return self.bucket(endpoint).reserve()
+
+    def wait(self, endpoint):
+
+        """Block until a request to endpoint may be sent"""
+
+        delay = self.reserve(endpoint)
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_success(self, endpoint):
+
+        """Additively raise the rate of the family after a successful request"""
+
+        bucket = self.bucket(endpoint)
+        ceiling = self._ceilings.get(self.family(endpoint))
+        maximum, _ = self.rates.get(self.family(endpoint), (self.rate, self.burst))
+
+        with bucket._lock:
+            step = self.increase / bucket.rate
+            if ceiling is not None and bucket.rate >= ceiling:
+                step /= 10
+            bucket.rate = min(maximum, bucket.rate + step)
+
+    def on_throttle(self, endpoint, retry_after=None):
+
+        """Multiplicatively lower the rate of the family after a throttled request
+
+        :param endpoint: the throttled endpoint
+        :param retry_after: seconds DeviantArt asked us to wait
+        """
+
+        bucket = self.bucket(endpoint)
+
+        with bucket._lock:
+            self._ceilings[self.family(endpoint)] = bucket.rate * (1 - (1 - self.decrease) / 4)
+            bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+            bucket.tokens = min(bucket.tokens, 0.0)
+
+        if retry_after:
+            bucket.block(retry_after)
@@ -0,0 +1,115 @@
+"""
+    deviantart.retry
+    ^^^^^^^^^^^^^^^^
+
+    Retrying of API requests that failed for transient reasons
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import random
+import threading
+
+from .ratelimit import parse_retry_after
+from .transport import ConnectError
+
+
+class RetryPolicy(object):
+
+    """Decides whether and when a failed request is sent again
+
+    Idempotent requests (reads) are retried on connection errors, timeouts
+    and the statuses in retry_statuses. Other requests (writes) are only
+    retried if the connection could not be established, i.e. before anything
+    was sent. The delays use exponential backoff with full jitter, a
+    Retry-After header sent by DeviantArt is honored.
+
+    Retries are paid from a budget: every request adds budget_ratio to it and
+    every retry takes one, so retries can't multiply the load when the API is
+    down. The budget holds at most budget_reserve retries.
+
+    :param max_retries: how often a single request is retried at most
+    :param backoff_base: the backoff of the first retry in seconds
+    :param backoff_max: the longest backoff in seconds
+    :param retry_statuses: HTTP statuses that are worth retrying
+    :param budget_ratio: the share of requests that may be retries
+    :param budget_reserve: the retries that may be made at once
+    """
+
+    def __init__(self, max_retries=3, backoff_base=0.5, backoff_max=30.0, retry_statuses=(429, 500, 502, 503, 504), budget_ratio=0.2, budget_reserve=10):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.budget_ratio = budget_ratio
+        self.budget_reserve = budget_reserve
+
+        self.requests = 0
+        self.retries = 0
+        self.retry_time = 0.0
+        self.budget_exhausted = 0
+        self.given_up = 0
+
+        self._budget = float(budget_reserve)
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt, idempotent, response=None, error=None):
+
+        """Returns the seconds to wait before retrying or None to give up
+
+        :param attempt: the number of retries made so far for the request
+        :param idempotent: whether the request may be sent twice
+        :param response: the :class:`deviantart.transport.Response` received
+        :param error: the exception raised by the transport
+        """
+
+        with self._lock:
+            if attempt == 0:
+                self.requests += 1
+                self._budget = min(self.budget_reserve, self._budget + self.budget_ratio)
+
+            if error is None and response.status not in self.retry_statuses:
+                return None
+
+            if error is not None and not isinstance(error, ConnectError) and not idempotent:
+                return None
+
+            if response is not None and not idempotent:
+                return None
+
+            if attempt >= self.max_retries:
+                self.given_up += 1
+                return None
+
+            if self._budget < 1:
+                self.budget_exhausted += 1
+                return None
+
+            self._budget -= 1
+
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+            if response is not None:
+                retry_after = parse_retry_after(response.headers.get('retry-after'))
+                if retry_after is not None:
+                    delay = max(delay, min(retry_after, self.backoff_max))
+
+            self.retries += 1
+            self.retry_time += delay
+
+            return delay
+
+    def stats(self):
+
+        """Returns the retry metrics as dict"""
+
+        with self._lock:
+            return {
+                "requests" : self.requests,
+                "retries" : self.retries,
+                "retry_time" : self.retry_time,
+                "budget_exhausted" : self.budget_exhausted,
+                "given_up" : self.given_up
+            }
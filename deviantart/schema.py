@@ -0,0 +1,258 @@
+"""
+    deviantart.schema
+    ^^^^^^^^^^^^^^^^^
+
+    Table driven decoding of the models
+
+    Every model module describes the fields of its model with a table of
+    :class:`Field` specs passed to :func:`define`, which generates the
+    from_dict method of the model and a batch decoder specialized to them::
+
+        define(User, (
+            Field("userid", required=True),
+            Field("usertype", "type", required=True),
+            Field("details"),
+        ))
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import functools
+
+
+class Field(object):
+
+    """The spec of a model field
+
+    :param name: the attribute of the model
+    :param key: the key of the decoded item (defaults to name)
+    :param required: whether items always have the key (KeyError if one has not)
+    :param model: the model class the value is decoded to
+    :param models: key => model class of the values of a dict value decoded to models, the other keys are kept
+    :param many: whether the value is a list of such dicts
+    """
+
+    __slots__ = ("name", "key", "required", "model", "models", "many")
+
+    def __init__(self, name, key=None, required=False, model=None, models=None, many=False):
+        self.name = name
+        self.key = key or name
+        self.required = required
+        self.model = model
+        self.models = models
+        self.many = many
+
+    def convert(self, value, decode_model):
+
+        """Converts the decoded value of the field
+
+        :param value: the value of the key (None if missing)
+        :param decode_model: function(cls, item) building a nested model
+        """
+
+        if value is None:
+            return None
+
+        if self.model is not None:
+            return decode_model(self.model, value)
+
+        if self.models is not None:
+            if self.many:
+                return [self._submodels(item, decode_model) for item in value]
+            return self._submodels(value, decode_model)
+
+        return value
+
+    def _submodels(self, value, decode_model):
+        submodels = {}
+        for key, item in value.items():
+            cls = self.models.get(key)
+            submodels[key] = item if cls is None else decode_model(cls, item)
+        return submodels
+
+    def __repr__(self):
+        return self.name
+
+
+#: The generated functions of every defined model (cls => (decode, decode_many))
+_DECODERS = {}
+
+#: The globals of the generated functions. The decode function of a nested
+#: model is looked up there (as decode_<class name>) when it is called, so
+#: models can nest each other regardless of the order they are defined in
+_NAMESPACE = {}
+
+
+def _body(cls, fields, indent):
+
+    """The statements filling the model self from the item d"""
+
+    lines = []
+    for field in fields:
+        if field.required:
+            value = "d[%r]" % field.key
+        else:
+            value = "get(%r)" % field.key
+
+        if field.model is not None:
+            lines.append("value = %s" % value)
+            lines.append("self.%s = None if value is None else decode_%s(value, identities)" % (field.name, field.model.__name__))
+        elif field.models is not None:
+            # the decode functions of the keys, see _submodel_decoders
+            decoders = "submodels_%s_%s" % (cls.__name__, field.name)
+            lines.append("value = %s" % value)
+            lines.append("if value is None:")
+            lines.append("    self.%s = None" % field.name)
+            lines.append("else:")
+            if field.many:
+                lines.append("    submodels = []")
+                lines.append("    for entry in value:")
+                lines.append("        submodel = {}")
+                lines.append("        for key, item in entry.items():")
+                lines.append("            decoder = %s.get(key)" % decoders)
+                lines.append("            submodel[key] = item if decoder is None else decoder(item, identities)")
+                lines.append("        submodels.append(submodel)")
+            else:
+                lines.append("    submodels = {}")
+                lines.append("    for key, item in value.items():")
+                lines.append("        decoder = %s.get(key)" % decoders)
+                lines.append("        submodels[key] = item if decoder is None else decoder(item, identities)")
+            lines.append("    self.%s = submodels" % field.name)
+        else:
+            lines.append("self.%s = %s" % (field.name, value))
+
+    if any(not field.required for field in fields):
+        lines.insert(0, "get = d.get")
+
+    return "".join(indent + line + "\n" for line in lines)
+
+
+def _submodel_decoders(field):
+
+    """key => decode function of the models in the dicts of a field"""
+
+    decoders = {}
+    for key, cls in field.models.items():
+        if cls in _DECODERS:
+            decoders[key] = _DECODERS[cls][0]
+        else:
+            decoders[key] = functools.partial(decode, cls)
+    return decoders
+
+
+def _shared(identity, indent, found):
+
+    """The statements taking self from the identity map, found when it was there"""
+
+    if identity is None:
+        return ""
+    return "".join(indent + line + "\n" for line in (
+        "if identities is not None:",
+        "    self = identities.get(d[%r])" % identity,
+        "    if self is not None:",
+        "        " + found,
+    ))
+
+
+def _share(identity, indent):
+
+    """The statement adding the new self to the identity map"""
+
+    if identity is None:
+        return ""
+    return "%sif identities is not None:\n%s    identities.add(d[%r], self)\n" % (indent, indent, identity)
+
+
+def define(cls, fields, identity=None):
+
+    """Sets the fields of a model and generates its decoders
+
+    Replaces the from_dict method of cls by one assigning the fields.
+
+    :param cls: the model class
+    :param fields: the :class:`Field` specs of all its fields
+    :param identity: the key of the id the models are shared under when decoded with a :class:`deviantart.identity.IdentityMap`
+    """
+
+    name = cls.__name__
+    _NAMESPACE["new_%s" % name] = cls.__new__
+    _NAMESPACE["cls_%s" % name] = cls
+
+    source = (
+        "def from_dict(self, d, identities=None):\n" + _body(cls, fields, "    ") +
+        "\n"
+        "def decode_%s(d, identities=None):\n" % name +
+        _shared(identity, "    ", "return self") +
+        "    self = new_%s(cls_%s)\n" % (name, name) + _body(cls, fields, "    ") +
+        _share(identity, "    ") +
+        "    return self\n"
+        "\n"
+        "def decode_many_%s(items, identities=None):\n" % name +
+        "    new = new_%s\n" % name +
+        "    cls = cls_%s\n" % name +
+        "    models = []\n"
+        "    append = models.append\n"
+        "    for d in items:\n" +
+        _shared(identity, "        ", "append(self)\n                continue") +
+        "        self = new(cls)\n" + _body(cls, fields, "        ") +
+        _share(identity, "        ") +
+        "        append(self)\n"
+        "    return models\n"
+    )
+
+    code = {}
+    exec(compile(source, "<%s decoder>" % name, "exec"), _NAMESPACE, code)
+
+    cls.fields = tuple(fields)
+    cls.from_dict = code["from_dict"]
+    _NAMESPACE["decode_%s" % name] = code["decode_%s" % name]
+    _DECODERS[cls] = (code["decode_%s" % name], code["decode_many_%s" % name])
+
+    # after registering cls, which may be nested in its own fields
+    for field in fields:
+        if field.models is not None:
+            _NAMESPACE["submodels_%s_%s" % (name, field.name)] = _submodel_decoders(field)
+
+    return cls
+
+
+def decode(cls, item, identities=None):
+
+    """Builds a model from a decoded item
+
+    :param cls: the model class
+    :param item: the decoded item
+    :param identities: an :class:`deviantart.identity.IdentityMap` sharing the repeated users
+    """
+
+    decoders = _DECODERS.get(cls)
+    if decoders is None:
+        model = cls()
+        model.from_dict(item)
+        return model
+    return decoders[0](item, identities)
+
+
+def decode_many(cls, items, identities=None):
+
+    """Builds a list of models from decoded items
+
+    Classes not passed to :func:`define` (e.g. subclasses of the models)
+    are built one by one through their from_dict method.
+
+    :param cls: the model class
+    :param items: the decoded items
+    :param identities: an :class:`deviantart.identity.IdentityMap` sharing the repeated users
+    """
+
+    decoders = _DECODERS.get(cls)
+    if decoders is None:
+        models = []
+        for item in items:
+            model = cls()
+            model.from_dict(item)
+            models.append(model)
+        return models
+    return decoders[1](items, identities)
@@ -0,0 +1,95 @@
+"""
+    deviantart.singleflight
+    ^^^^^^^^^^^^^^^^^^^^^^^
+
+    Coalescing of concurrent identical API calls
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import threading
+
+
+class _Call(object):
+
+    """A call in flight, waited for by its duplicates"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+
+    """Runs only one of several concurrent calls with the same key
+
+    Callers arriving while a call with their key is in flight wait for it
+    and share its result (or exception) instead of running their own.
+    Results are only shared while the call is in flight, nothing is cached.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.absorbed = 0
+
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key, new_call):
+
+        """Returns the call in flight under key (or registers new_call) and whether the caller leads it"""
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.absorbed += 1
+                return call, False
+
+            call = self._calls[key] = new_call()
+            self.leaders += 1
+            return call, True
+
+    def _leave(self, key):
+        with self._lock:
+            del self._calls[key]
+
+    def do(self, key, func, *args):
+
+        """Calls func(*args) unless a call with the same key is in flight
+
+        :param key: identifies calls with the same result
+        :param func: the function to call
+        """
+
+        call, leader = self._join(key, _Call)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._leave(key)
+            call.done.set()
+
+        return call.result
+
+    def stats(self):
+
+        """Returns the number of calls run and duplicates absorbed as dict"""
+
+        with self._lock:
+            return {
+                "leaders" : self.leaders,
+                "absorbed" : self.absorbed,
+                "in_flight" : len(self._calls)
+            }
@@ -7,11 +7,17 @@
     :copyright: (c) 2015 by Kevin Eichhorn
 """
 
+from .schema import Field, define
 from .user import User
 from .deviation import Deviation
 
 class Status(object):
 
+	__slots__ = (
+		"statusid", "body", "ts", "url", "comments_count", "is_share",
+		"is_deleted", "author", "items",
+	)
+
 	def __init__(self):
 		self.statusid = None
 		self.body = None
@@ -23,49 +29,17 @@ class Status(object):
 		self.author = None
 		self.items = None	
 		
-	def from_dict(self, s):
-		if 'statusid' in s:
-			self.statusid = s['statusid']
-			
-		if 'body' in s:
-			self.body = s['body']
-			
-		if 'ts' in s:
-			self.ts = s['ts']
-			
-		if 'url' in s:
-			self.url = s['url']
-			
-		if 'comments_count' in s:
-			self.comments_count = s['comments_count']
-			
-		if 'is_share' in s:
-			self.is_share = s['is_share']
-			
-		if 'is_deleted' in s:
-			self.is_deleted = s['is_deleted']
-					
-		if 'author' in s:
-			self.author = User()
-			self.author.from_dict(s['author'])
-			
-		if 'items' in s:
-		
-			self.items = ()
-			
-			for item in s['items']:
-				status_item = {}
-				status_item['type'] = item['type']
-				
-				if 'status' in item:
-					status_item['status'] = Status()
-					status_item['status'].from_dict(item['status'])
-				
-				if 'deviation' in item:
-					status_item['deviation'] = Deviation()
-					status_item['deviation'].from_dict(item['deviation'])
-					
-				self.items.append(status_item)
-	
 	def __repr__(self):		
-		return self.statusid
\ No newline at end of file
+		return self.statusid
+
+define(Status, (
+	Field("statusid"),
+	Field("body"),
+	Field("ts"),
+	Field("url"),
+	Field("comments_count"),
+	Field("is_share"),
+	Field("is_deleted"),
+	Field("author", model=User),
+	Field("items", models={"status" : Status, "deviation" : Deviation}, many=True),
+))
@@ -0,0 +1,491 @@
+"""
+    deviantart.stub
+    ^^^^^^^^^^^^^^^
+
+    A local stand-in for the DeviantArt API to load test clients against
+
+    Serves synthetic, paginated data for every endpoint the API Interface
+    uses, with configurable latency, error rate and throttling. Run it with
+    ``python -m deviantart.stub --port 8000`` or start it from code::
+
+        server = StubServer(items=1000, latency=0.02, rate_limit=50)
+        server.start()
+        da = deviantart.Api("id", "secret")
+        server.configure(da)
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlsplit
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlsplit
+
+_now = getattr(time, "monotonic", time.time)
+
+#: The path prefix of resource endpoints
+RESOURCE_PATH = "/api/v1/oauth2"
+
+#: Parameters that may be repeated and reach the routes as lists
+LIST_PARAMS = frozenset(["usernames", "deviationids[]", "noteids[]", "to[]"])
+
+#: The largest limit the stub accepts, bigger ones are clamped
+MAX_LIMIT = 120
+
+
+def _id(kind, i):
+    return "{:08X}-{:04X}-0000-0000-{:012X}".format(0x5EED0000 + kind, kind, i)
+
+
+def user(i):
+    return {
+        "userid" : _id(1, i),
+        "username" : "user{}".format(i),
+        "usericon" : "https://a.deviantart.net/avatars/default.gif",
+        "type" : "regular",
+    }
+
+
+def deviation(i):
+    return {
+        "deviationid" : _id(2, i),
+        "printid" : None,
+        "url" : "https://www.deviantart.com/user{}/art/Synthetic-{}".format(i % 50, i),
+        "title" : "Synthetic deviation {}".format(i),
+        "category" : "Digital Art",
+        "category_path" : "digitalart/paintings/other",
+        "is_favourited" : False,
+        "is_deleted" : False,
+        "author" : user(i % 50),
+        "stats" : {"comments" : i % 17, "favourites" : i % 101},
+        "published_time" : 1420070400 + i * 60,
+        "allows_comments" : True,
+        "preview" : {"src" : "https://img.deviantart.net/{}-pre.jpg".format(i), "width" : 1024, "height" : 768, "transparency" : False},
+        "content" : {"src" : "https://img.deviantart.net/{}.jpg".format(i), "width" : 2048, "height" : 1536, "transparency" : False, "filesize" : 734003},
+        "thumbs" : [
+            {"src" : "https://img.deviantart.net/{}-150.jpg".format(i), "width" : 150, "height" : 113, "transparency" : False},
+            {"src" : "https://img.deviantart.net/{}-300.jpg".format(i), "width" : 300, "height" : 225, "transparency" : False},
+        ],
+        "is_mature" : False,
+        "is_downloadable" : True,
+        "download_filesize" : 734003,
+    }
+
+
+def comment(i):
+    # every comment but the first three replies to an earlier one, which makes a tree
+    return {
+        "commentid" : _id(3, i),
+        "parentid" : _id(3, (i - 3) // 3) if i >= 3 else None,
+        "posted" : "2015-01-01T00:00:00-0800",
+        "replies" : 3,
+        "hidden" : None,
+        "body" : "Synthetic comment {}".format(i),
+        "user" : user(i % 50),
+    }
+
+
+def status(i):
+    return {
+        "statusid" : _id(4, i),
+        "body" : "Synthetic status {}".format(i),
+        "ts" : "2015-01-01T00:00:00-0800",
+        "url" : "https://www.deviantart.com/user0/statuses/{}".format(i),
+        "comments_count" : 0,
+        "is_share" : False,
+        "is_deleted" : False,
+        "author" : user(0),
+    }
+
+
+def message(i):
+    return {
+        "messageid" : _id(5, i),
+        "type" : "feedback.favourite",
+        "orphaned" : False,
+        "ts" : "2015-01-01T00:00:00-0800",
+        "stackid" : "stack{}".format(i // 5),
+        "stack_count" : 5,
+        "originator" : user(i % 50),
+        "subject" : {"deviation" : deviation(i)},
+    }
+
+
+def note(i):
+    return {
+        "noteid" : _id(6, i),
+        "ts" : "2015-01-01T00:00:00-0800",
+        "unread" : i % 2 == 0,
+        "starred" : False,
+        "sent" : False,
+        "subject" : "Synthetic note {}".format(i),
+        "preview" : "Hello",
+        "body" : "Hello from user{}".format(i % 50),
+        "user" : user(i % 50),
+        "recipients" : [user(0)],
+    }
+
+
+def folder(i, kind=7):
+    return {"folderid" : _id(kind, i), "name" : "Folder {}".format(i), "size" : 24, "parent" : None}
+
+
+def watcher(i):
+    return {
+        "user" : user(i),
+        "is_watching" : i % 2 == 0,
+        "lastvisit" : "2015-01-01T00:00:00-0800",
+        "watch" : dict((kind, True) for kind in ("friend", "deviations", "journals", "forum_threads", "critiques", "scraps", "activity", "collections")),
+    }
+
+
+SUCCESS = {"success" : True}
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+
+    """Serves the token endpoint and synthetic resource endpoints
+
+    :param address: the (host, port) to listen on, port 0 picks a free one
+    :param items: the number of items every paginated listing holds
+    :param latency: seconds every response is delayed
+    :param jitter: seconds of random latency added on top of latency
+    :param error_rate: the fraction of resource requests answered with a 500
+    :param rate_limit: requests per second after which requests are answered with 429 (None for no limit)
+    :param max_limit: the largest limit accepted, larger ones are rejected with 400 (None to clamp them to :data:`MAX_LIMIT`)
+    :param token_ttl: seconds issued access tokens are valid
+    :param seed: seed of the random generator deciding errors and jitter
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address=("127.0.0.1", 0), items=100, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_limit=None, max_limit=None, token_ttl=3600, seed=0):
+        HTTPServer.__init__(self, address, StubHandler)
+        self.items = items
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.max_limit = max_limit
+        self.token_ttl = token_ttl
+
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.tokens = 0
+
+        self._random = random.Random(seed)
+        self._allowance = rate_limit
+        self._last_check = _now()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def configure(self, api):
+
+        """Points an API Interface at the stub
+
+        :param api: a :class:`deviantart.api.Api`
+        """
+
+        api.token_endpoint = self.url + "/oauth2/token"
+        api.resource_endpoint = self.url + RESOURCE_PATH
+
+    def start(self):
+
+        """Serves requests from a background thread"""
+
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def stats(self):
+
+        """Returns the request counters as dict"""
+
+        with self._lock:
+            return {
+                "requests" : self.requests,
+                "errors" : self.errors,
+                "throttled" : self.throttled,
+                "tokens" : self.tokens
+            }
+
+    def _admit(self):
+
+        """Decides whether a resource request is served, throttled or fails
+
+        Returns the status to answer with and, for 429, the seconds until
+        the next request is admitted.
+        """
+
+        with self._lock:
+            self.requests += 1
+
+            if self.rate_limit is not None:
+                now = _now()
+                self._allowance = min(self.rate_limit, self._allowance + (now - self._last_check) * self.rate_limit)
+                self._last_check = now
+                if self._allowance < 1:
+                    self.throttled += 1
+                    return 429, (1 - self._allowance) / self.rate_limit
+                self._allowance -= 1
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return 500, None
+
+            return 200, None
+
+    def _delay(self):
+        with self._lock:
+            jitter = self._random.random() * self.jitter if self.jitter else 0
+        return self.latency + jitter
+
+    def issue_token(self):
+        with self._lock:
+            self.tokens += 1
+            number = self.tokens
+        return {
+            "access_token" : "stub-token-{}".format(number),
+            "refresh_token" : "stub-refresh-{}".format(number),
+            "expires_in" : self.token_ttl,
+            "token_type" : "Bearer",
+            "status" : "success"
+        }
+
+    def page(self, params, build, key="results", **extra):
+
+        """An offset paginated listing of items built by build(index)"""
+
+        offset = int(params.get("offset", 0) or 0)
+        limit = min(int(params.get("limit") or 0) or 10, MAX_LIMIT)
+        end = min(offset + limit, self.items)
+        has_more = end < self.items
+
+        data = {
+            key : [build(i) for i in range(offset, end)],
+            "has_more" : has_more,
+            "next_offset" : end if has_more else None,
+            "has_less" : offset > 0,
+            "prev_offset" : max(0, offset - limit) if offset > 0 else None,
+        }
+        data.update(extra)
+        return data
+
+    def feed(self, params):
+
+        """A cursor paginated listing of messages"""
+
+        start = int(params.get("cursor") or 0)
+        end = min(start + 10, self.items)
+        return {
+            "results" : [message(i) for i in range(start, end)],
+            "has_more" : end < self.items,
+            "cursor" : str(end)
+        }
+
+
+def _routes():
+    page_of_deviations = lambda server, params, match: server.page(params, deviation)
+    deviations_with_name = lambda server, params, match: server.page(params, deviation, name="Featured")
+
+    routes = [
+        (r"/browse/dailydeviations", lambda server, params, match: {"results" : [deviation(i) for i in range(min(24, server.items))]}),
+        (r"/browse/categorytree", lambda server, params, match: {"categories" : [
+            {"catpath" : "digitalart", "title" : "Digital Art", "has_subcategory" : True, "parent_catpath" : "/"}
+        ]}),
+        (r"/browse/morelikethis/preview", lambda server, params, match: {
+            "seed" : params.get("seed"), "author" : user(0),
+            "more_from_artist" : [deviation(i) for i in range(6)],
+            "more_from_da" : [deviation(i) for i in range(6, 12)]
+        }),
+        (r"/browse/tags/search", lambda server, params, match: {"results" : [
+            {"tag_name" : "{}{}".format(params.get("tag_name", "tag"), i)} for i in range(10)
+        ]}),
+        (r"/browse/(hot|newest|popular|undiscovered|tags|morelikethis|user/journals)", page_of_deviations),
+        (r"/deviation/whofaved", lambda server, params, match: server.page(params, lambda i: {"user" : user(i), "time" : 1420070400 + i})),
+        (r"/deviation/metadata", lambda server, params, match: {"metadata" : [
+            dict(deviation(0), deviationid=deviationid, is_watching=False, description="", license="No License",
+                 tags=[], submission={}, camera={}, collections=[])
+            for deviationid in params.get("deviationids[]", [])
+        ]}),
+        (r"/deviation/embeddedcontent", page_of_deviations),
+        (r"/deviation/content", lambda server, params, match: {"html" : "<p>Synthetic journal</p>", "css" : "", "css_fonts" : []}),
+        (r"/deviation/download/([^/]+)", lambda server, params, match: {
+            "src" : "https://img.deviantart.net/download.jpg", "width" : 2048, "height" : 1536, "filesize" : 734003
+        }),
+        (r"/deviation/([^/]+)", lambda server, params, match: dict(deviation(0), deviationid=match.group(1))),
+        (r"/collections/folders", lambda server, params, match: server.page(params, lambda i: folder(i, 8))),
+        (r"/collections/(fave|unfave)", lambda server, params, match: {"success" : True, "favourites" : 1}),
+        (r"/collections/([^/]+)", deviations_with_name),
+        (r"/gallery/folders", lambda server, params, match: server.page(params, folder)),
+        (r"/gallery/all", page_of_deviations),
+        (r"/gallery/([^/]+)", deviations_with_name),
+        (r"/user/whoami", lambda server, params, match: user(0)),
+        (r"/user/whois", lambda server, params, match: {"results" : [
+            dict(user(0), username=username) for username in params.get("usernames", [])
+        ]}),
+        (r"/user/damntoken", lambda server, params, match: {"damntoken" : "stub-damntoken"}),
+        (r"/user/profile/update", lambda server, params, match: SUCCESS),
+        (r"/user/profile/([^/]+)", lambda server, params, match: {
+            "user" : dict(user(0), username=match.group(1)), "is_watching" : False,
+            "profile_url" : "https://www.deviantart.com/{}".format(match.group(1)),
+            "stats" : {"user_deviations" : server.items, "user_favourites" : 0}
+        }),
+        (r"/user/friends/search", lambda server, params, match: {"results" : [user(i) for i in range(10)]}),
+        (r"/user/friends/watching/([^/]+)", lambda server, params, match: {"watching" : False}),
+        (r"/user/friends/(watch|unwatch)/([^/]+)", lambda server, params, match: SUCCESS),
+        (r"/user/(friends|watchers)/([^/]+)", lambda server, params, match: server.page(params, watcher)),
+        (r"/user/statuses/post", lambda server, params, match: {"statusid" : _id(4, 0)}),
+        (r"/user/statuses/", lambda server, params, match: server.page(params, status)),
+        (r"/user/statuses/([^/]+)", lambda server, params, match: dict(status(0), statusid=match.group(1))),
+        (r"/comments/post/(deviation|profile|status)/([^/]+)", lambda server, params, match: dict(comment(0), body=params.get("body", ""))),
+        (r"/comments/(deviation|profile|status)/([^/]+)", lambda server, params, match: server.page(params, comment, key="thread")),
+        (r"/comments/([^/]+)/siblings", lambda server, params, match: server.page(params, comment, key="thread", context={})),
+        (r"/messages/feed", lambda server, params, match: server.feed(params)),
+        (r"/messages/delete", lambda server, params, match: SUCCESS),
+        (r"/messages/(feedback|mentions)(/[^/]+)?", lambda server, params, match: server.page(params, message)),
+        (r"/notes/folders", lambda server, params, match: {"results" : [
+            {"folder" : _id(9, i), "parentid" : None, "title" : "Folder {}".format(i), "count" : 0} for i in range(3)
+        ]}),
+        (r"/notes/folders/create", lambda server, params, match: {"success" : True, "folderid" : _id(9, 3), "title" : params.get("title")}),
+        (r"/notes/folders/(remove|rename)/([^/]+)", lambda server, params, match: SUCCESS),
+        (r"/notes/send", lambda server, params, match: {"results" : [
+            {"success" : True, "user" : dict(user(0), username=username)} for username in params.get("to[]", [])
+        ]}),
+        (r"/notes/(delete|mark|move)", lambda server, params, match: SUCCESS),
+        (r"/notes", lambda server, params, match: server.page(params, note)),
+        (r"/notes/([^/]+)", lambda server, params, match: dict(note(0), noteid=match.group(1))),
+        (r"/data/countries", lambda server, params, match: {"results" : [{"countryid" : 1, "name" : "Afghanistan"}]}),
+        (r"/data/(privacy|submission|tos)", lambda server, params, match: {"text" : "Synthetic terms"}),
+    ]
+
+    return [(re.compile("^" + pattern + "$"), handler) for pattern, handler in routes]
+
+
+#: (compiled path pattern, handler(server, params, match)) of every resource endpoint
+ROUTES = _routes()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _params(self):
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            params.update(parse_qs(self.rfile.read(length).decode("utf-8")))
+
+        return parts.path, dict((k, v if k in LIST_PARAMS else v[0]) for k, v in params.items())
+
+    def _send(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        path, params = self._params()
+
+        delay = self.server._delay()
+        if delay:
+            time.sleep(delay)
+
+        if path == "/oauth2/token":
+            return self._send(200, self.server.issue_token())
+
+        if not path.startswith(RESOURCE_PATH):
+            return self._send(404, {"error" : "invalid_request", "error_description" : "Not found.", "status" : "error"})
+
+        if not self.headers.get("Authorization", "").startswith("Bearer stub-token-"):
+            return self._send(401, {"error" : "invalid_token", "error_description" : "Invalid token.", "status" : "error"})
+
+        outcome, retry_after = self.server._admit()
+        if outcome == 429:
+            return self._send(429, {"error" : "user_api_threshold", "error_description" : "User API Threshold", "status" : "error"}, {"Retry-After" : "{:.3f}".format(retry_after)})
+        if outcome == 500:
+            return self._send(500, {"error" : "server_error", "error_description" : "Internal error.", "status" : "error"})
+
+        max_limit = self.server.max_limit
+        if max_limit is not None and int(params.get("limit") or 0) > max_limit:
+            return self._send(400, {
+                "error" : "invalid_request",
+                "error_description" : "Request field validation failed.",
+                "error_details" : {"limit" : "limit must be between 1 and {}".format(max_limit)},
+                "status" : "error"
+            })
+
+        endpoint = path[len(RESOURCE_PATH):]
+        for pattern, handler in ROUTES:
+            match = pattern.match(endpoint)
+            if match:
+                return self._send(200, handler(self.server, params, match))
+
+        self._send(404, {"error" : "invalid_request", "error_description" : "Unknown endpoint.", "status" : "error"})
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the DeviantArt API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--items", type=int, default=100, help="items per paginated listing")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every response is delayed")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds of random extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 500")
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests per second before 429s")
+    parser.add_argument("--max-limit", type=int, default=None, help="largest limit accepted before 400s")
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), items=args.items, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, rate_limit=args.rate_limit, max_limit=args.max_limit)
+    print("Serving the DeviantArt API stub on {}".format(server.url))
+    print("  da.token_endpoint = \"{}/oauth2/token\"".format(server.url))
+    print("  da.resource_endpoint = \"{}{}\"".format(server.url, RESOURCE_PATH))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+    deviantart.tokenstore
+    ^^^^^^^^^^^^^^^^^^^^^
+
+    Persistent storage of access tokens shared between processes
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+
+class TokenStore(object):
+
+    """Base class of token stores
+
+    A token is a dict with the keys access_token, refresh_token and expires
+    (a unix timestamp or None).
+    """
+
+    def load(self, key):
+
+        """Returns the token stored under key or None
+
+        :param key: the key the token was saved under
+        """
+
+        raise NotImplementedError
+
+    def save(self, key, token):
+
+        """Stores token under key
+
+        :param key: the key to save the token under
+        :param token: the token dict
+        """
+
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self):
+
+        """Context manager that keeps other users of the store out while a
+        token is requested"""
+
+        yield
+
+
+class FileTokenStore(TokenStore):
+
+    """Stores tokens in a JSON file
+
+    The file is replaced atomically and a lock file serializes token requests
+    of all processes using the store, so a batch of processes that start at
+    once requests one token instead of one each. The file is only readable by
+    its owner.
+
+    :param path: the path of the JSON file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+
+    def load(self, key):
+        try:
+            with open(self.path) as f:
+                tokens = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        return tokens.get(key)
+
+    def save(self, key, token):
+        with self.lock():
+            try:
+                with open(self.path) as f:
+                    tokens = json.load(f)
+            except (IOError, OSError, ValueError):
+                tokens = {}
+
+            tokens[key] = token
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=".tokens", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(tokens, f)
+                _replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    @contextmanager
+    def lock(self):
+        with self._thread_lock:
+            if self._depth:
+                # already held by this thread, the file lock is not reentrant
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                _lock_file(fd)
+                self._depth = 1
+                try:
+                    yield
+                finally:
+                    self._depth = 0
+                    _unlock_file(fd)
+            finally:
+                os.close(fd)
+
+
+def _replace(src, dst):
+    if hasattr(os, "replace"):
+        os.replace(src, dst)
+    else:  # Python 2, atomic on POSIX only
+        os.rename(src, dst)
+
+
+def _lock_file(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
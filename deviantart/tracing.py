@@ -0,0 +1,269 @@
+"""
+    deviantart.tracing
+    ^^^^^^^^^^^^^^^^^^
+
+    Spans of API calls and the operations they belong to
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+
+if contextvars is not None:
+
+    # a context variable follows asyncio tasks as well as threads
+    _current = contextvars.ContextVar("deviantart_span", default=None)
+
+    def current_span():
+
+        """Returns the innermost open span of the calling thread or task (None outside of spans)"""
+
+        return _current.get()
+
+    def _activate(span):
+        return _current.set(span)
+
+    def _restore(token):
+        _current.reset(token)
+
+else:
+
+    _local = threading.local()
+
+    def current_span():
+
+        """Returns the innermost open span of the calling thread (None outside of spans)"""
+
+        return getattr(_local, "span", None)
+
+    def _activate(span):
+        previous = current_span()
+        _local.span = span
+        return previous
+
+    def _restore(token):
+        _local.span = token
+
+
+@contextmanager
+def activated(span):
+
+    """Makes span the current span inside the with block
+
+    :param span: the :class:`Span` (or None for no span)
+    """
+
+    token = _activate(span)
+    try:
+        yield span
+    finally:
+        _restore(token)
+
+
+def bind(func, span=None):
+
+    """Wraps func to run inside a span, e.g. in another thread
+
+    :param func: the function to wrap
+    :param span: the :class:`Span` to run in (defaults to the one that is current now)
+    """
+
+    if span is None:
+        span = current_span()
+
+    def run(*args, **kwargs):
+        with activated(span):
+            return func(*args, **kwargs)
+
+    return run
+
+
+def _new_id():
+    return "{:016x}".format(random.getrandbits(64))
+
+
+class Span(object):
+
+    """A timed operation, e.g. an API request or a crawl made of many requests
+
+    :param name: the name of the operation (the endpoint label for requests)
+    :param parent: the enclosing :class:`Span` or None
+    :param attributes: details of the operation
+    """
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else _new_id()
+        self.span_id = _new_id()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self.end = None
+        self.error = None
+
+    def __repr__(self):
+        return "<Span {} {}>".format(self.name, self.span_id)
+
+    @property
+    def duration(self):
+
+        """Seconds the span took (None while it is open)"""
+
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+
+class TraceHook(object):
+
+    """Base class of the callbacks a :class:`Tracer` calls for every span"""
+
+    def before(self, span):
+
+        """Called when span starts (for requests: before the request is sent)"""
+
+        pass
+
+    def after(self, span):
+
+        """Called when span ended, with its duration, attributes and error set"""
+
+        pass
+
+
+class InMemoryRecorder(TraceHook):
+
+    """Keeps all finished spans, e.g. to inspect them in tests"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def after(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def find(self, name):
+
+        """Returns the finished spans called name"""
+
+        return [span for span in self.spans if span.name == name]
+
+    def children(self, span):
+
+        """Returns the finished spans whose parent is span"""
+
+        return [child for child in self.spans if child.parent_id == span.span_id]
+
+    def clear(self):
+        with self._lock:
+            del self.spans[:]
+
+
+class Tracer(object):
+
+    """Opens spans and reports them to its hooks
+
+    Spans opened while another one is open in the same thread or task
+    become its children.
+
+    :param hooks: the :class:`TraceHook` instances to call
+    """
+
+    def __init__(self, *hooks):
+        self.hooks = list(hooks)
+
+    def add_hook(self, hook):
+
+        """Adds a :class:`TraceHook`"""
+
+        self.hooks.append(hook)
+
+    def start(self, name, **attributes):
+
+        """Opens a span and makes it the current one
+
+        Returns the span and a token that must be passed to :meth:`finish`.
+
+        :param name: the name of the span
+        :param attributes: details of the operation
+        """
+
+        span = self.begin(name, **attributes)
+        return span, _activate(span)
+
+    def finish(self, span, token, error=None):
+
+        """Closes a span opened by :meth:`start`
+
+        :param span: the span to close
+        :param token: the token returned by :meth:`start`
+        :param error: the exception that ended the span, if any
+        """
+
+        _restore(token)
+        self.end(span, error)
+
+    def begin(self, name, **attributes):
+
+        """Opens a span without making it the current one
+
+        For operations spread over threads or tasks, e.g. a crawl, whose
+        parts run inside of it by means of :func:`activated` or :func:`bind`.
+        The span must be closed by :meth:`end`.
+
+        :param name: the name of the span
+        :param attributes: details of the operation
+        """
+
+        span = Span(name, current_span(), attributes)
+
+        for hook in self.hooks:
+            hook.before(span)
+
+        return span
+
+    def end(self, span, error=None):
+
+        """Closes a span opened by :meth:`begin`
+
+        :param span: the span to close
+        :param error: the exception that ended the span, if any
+        """
+
+        span.end = time.time()
+        span.error = error
+
+        for hook in self.hooks:
+            hook.after(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+
+        """Context manager around :meth:`start` and :meth:`finish`
+
+        :param name: the name of the span
+        :param attributes: details of the operation
+        """
+
+        span, token = self.start(name, **attributes)
+        error = None
+
+        try:
+            yield span
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.finish(span, token, error)
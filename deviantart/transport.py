@@ -0,0 +1,363 @@
+"""
+    deviantart.transport
+    ^^^^^^^^^^^^^^^^^^^^
+
+    HTTP transports used by the API Interface to talk to DeviantArt
+
+    :copyright: (c) 2015 by Kevin Eichhorn
+"""
+
+from __future__ import absolute_import
+
+import errno
+import socket
+import threading
+import time
+import zlib
+from collections import deque
+
+try:
+    from httplib import HTTPConnection, HTTPSConnection, HTTPException, BadStatusLine
+    from urlparse import urlsplit
+    from urllib2 import Request, urlopen, HTTPError
+except ImportError:
+    from http.client import HTTPConnection, HTTPSConnection, HTTPException, BadStatusLine
+    from urllib.parse import urlsplit
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+
+_now = getattr(time, "monotonic", time.time)
+
+#: The content codings the transports ask for and decompress
+ACCEPT_ENCODING = "gzip, deflate"
+
+#: Bytes read from the socket at once while a body is decompressed
+CHUNK_SIZE = 64 * 1024
+
+
+def decompressor(headers):
+
+    """Returns a zlib decompressor for the Content-Encoding in headers (None if the body is not compressed)
+
+    :param headers: the response headers (names are lowercased)
+    """
+
+    encoding = headers.get("content-encoding", "").strip().lower()
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        # 32 makes zlib detect the gzip or zlib header itself
+        return zlib.decompressobj(32 + zlib.MAX_WBITS)
+    return None
+
+
+def request_headers(headers, compress):
+
+    """Copies the request headers, asking for a compressed response if compress is set
+
+    :param headers: the request headers (or None)
+    :param compress: whether to send Accept-Encoding
+    """
+
+    headers = dict(headers or {})
+    if compress and not any(k.lower() == "accept-encoding" for k in headers):
+        headers["Accept-Encoding"] = ACCEPT_ENCODING
+    return headers
+
+
+def read_body(read, headers):
+
+    """Reads a body chunk by chunk, decompressing it while it arrives
+
+    Returns the body and the number of bytes received.
+
+    :param read: a function returning up to n bytes of the body (b"" at its end)
+    :param headers: the response headers (names are lowercased)
+    """
+
+    decoder = decompressor(headers)
+    chunks = []
+    received = 0
+
+    while True:
+        chunk = read(CHUNK_SIZE)
+        if not chunk:
+            break
+        received += len(chunk)
+        chunks.append(decoder.decompress(chunk) if decoder else chunk)
+
+    if decoder:
+        chunks.append(decoder.flush())
+
+    return b"".join(chunks), received
+
+
+class ConnectError(IOError):
+
+    """Raised by transports when no connection could be established
+
+    The request has not been sent when this is raised, so it is safe to send
+    it again even if it is not idempotent.
+    """
+
+
+class Response(object):
+
+    """A raw HTTP response returned by a transport
+
+    :param status: the HTTP status code
+    :param headers: the response headers (names are lowercased)
+    :param body: the response body as bytes
+    :param reason: the HTTP reason phrase
+    :param received: the number of body bytes received (defaults to the size of body)
+
+    Transports that know it set :attr:`connect_time` to the seconds spent
+    opening a new connection for the request.
+    """
+
+    connect_time = 0.0
+
+    def __init__(self, status, headers, body, reason="", received=None):
+        self.status = status
+        self.headers = dict((k.lower(), v) for k, v in headers.items())
+        self.body = body
+        self.reason = reason
+        self.received = len(body) if received is None else received
+
+    @classmethod
+    def decoded(cls, status, headers, body, reason="", received=None):
+
+        """Builds the response of an already decompressed body, dropping the headers of the compressed one"""
+
+        headers = dict((k.lower(), v) for k, v in headers.items())
+        if decompressor(headers) is not None:
+            headers.pop("content-encoding")
+            headers.pop("content-length", None)
+
+        return cls(status, headers, body, reason, received)
+
+    def __repr__(self):
+        return "<Response [{}]>".format(self.status)
+
+    @property
+    def charset(self):
+
+        """The charset announced in the Content-Type header (defaults to utf-8)"""
+
+        content_type = self.headers.get("content-type", "")
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "charset" and value:
+                return value.strip('"')
+        return "utf-8"
+
+
+def closed_before_response(error):
+
+    """Whether error tells that a kept-alive connection was closed before any byte of the response
+
+    :param error: the error raised while waiting for the response
+    """
+
+    if isinstance(error, BadStatusLine):
+        # RemoteDisconnected on Python 3, an empty status line on Python 2
+        return True
+    return getattr(error, "errno", None) in (errno.ECONNRESET, errno.EPIPE)
+
+
+class Transport(object):
+
+    """Base class of all transports
+
+    A transport sends a single HTTP request and returns a :class:`Response`.
+    It must not raise on HTTP error statuses, the API Interface decides what
+    an error is.
+    """
+
+    def request(self, method, url, body=None, headers=None):
+
+        """Send a request and return the :class:`Response`
+
+        :param method: the HTTP method
+        :param url: the absolute URL to request
+        :param body: the encoded request body
+        :param headers: additional request headers
+        """
+
+        raise NotImplementedError
+
+    def close(self):
+
+        """Release all resources held by the transport"""
+
+        pass
+
+
+class UrllibTransport(Transport):
+
+    """Opens a new connection for every request (the behaviour of sanction)
+
+    :param timeout: the socket timeout in seconds
+    :param compress: whether to ask for gzip compressed responses
+    """
+
+    def __init__(self, timeout=30, compress=True):
+        self.timeout = timeout
+        self.compress = compress
+
+    def request(self, method, url, body=None, headers=None):
+        req = Request(url, data=body, headers=request_headers(headers, self.compress))
+        req.get_method = lambda: method
+
+        try:
+            resp = urlopen(req, timeout=self.timeout)
+        except HTTPError as e:
+            headers = dict((k.lower(), v) for k, v in e.headers.items())
+            data, received = read_body(e.read, headers)
+            return Response.decoded(e.code, headers, data, e.msg, received)
+
+        try:
+            headers = dict((k.lower(), v) for k, v in resp.info().items())
+            data, received = read_body(resp.read, headers)
+            return Response.decoded(resp.getcode(), headers, data, getattr(resp, "msg", ""), received)
+        finally:
+            resp.close()
+
+
+class PooledTransport(Transport):
+
+    """Keeps connections alive and reuses them for further requests
+
+    Connections are pooled per host and can be shared between threads, every
+    connection is only used by one request at a time.
+
+    :param maxsize: the number of idle connections kept per host
+    :param idle_timeout: seconds after which an idle connection is discarded
+    :param timeout: the socket timeout in seconds
+    :param compress: whether to ask for gzip compressed responses
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=60, timeout=30, compress=True):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.compress = compress
+        self.connections_opened = 0
+
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, body=None, headers=None):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path = "{}?{}".format(path, parts.query)
+
+        headers = request_headers(headers, self.compress)
+        start = _now()
+        conn, reused = self._acquire(key)
+        connect_time = 0.0 if reused else _now() - start
+
+        try:
+            resp, data, received = self._exchange(conn, method, path, body, headers)
+        except (HTTPException, socket.error) as e:
+            conn.close()
+
+            if not reused or not getattr(e, "unsent", False):
+                raise
+
+            # the server closed the idle connection before we used it, the
+            # request never reached it so it is safe to send it again
+            start = _now()
+            conn, reused = self._acquire(key, fresh=True)
+            connect_time = _now() - start
+            try:
+                resp, data, received = self._exchange(conn, method, path, body, headers)
+            except (HTTPException, socket.error):
+                conn.close()
+                raise
+
+        response = Response.decoded(resp.status, dict(resp.getheaders()), data, resp.reason, received)
+        response.connect_time = connect_time
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+
+        return response
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+
+        for pool in pools.values():
+            for conn, _ in pool:
+                conn.close()
+
+    def _exchange(self, conn, method, path, body, headers):
+
+        """Send a request over conn and read the (decompressed) response
+
+        Errors are marked unsent while the server cannot have processed the
+        request: sending failed, or the connection was closed before the
+        first byte of the response. A timeout is never unsent, the server
+        may still be working on the request.
+        """
+
+        try:
+            conn.request(method, path, body, headers)
+        except (HTTPException, socket.error) as e:
+            e.unsent = not isinstance(e, socket.timeout)
+            raise
+
+        try:
+            resp = conn.getresponse()
+        except (HTTPException, socket.error) as e:
+            e.unsent = closed_before_response(e)
+            raise
+
+        data, received = read_body(resp.read, dict((k.lower(), v) for k, v in resp.getheaders()))
+        return resp, data, received
+
+    def _acquire(self, key, fresh=False):
+
+        """Take an idle connection for key out of the pool or open a new one"""
+
+        if not fresh:
+            now = _now()
+            with self._lock:
+                pool = self._pools.get(key)
+                while pool:
+                    conn, last_used = pool.pop()
+                    if now - last_used <= self.idle_timeout:
+                        return conn, True
+                    conn.close()
+
+        scheme, host, port = key
+        if scheme == "https":
+            conn = HTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            conn = HTTPConnection(host, port, timeout=self.timeout)
+
+        try:
+            conn.connect()
+        except (HTTPException, socket.error) as e:
+            conn.close()
+            raise ConnectError(e)
+
+        with self._lock:
+            self.connections_opened += 1
+
+        return conn, False
+
+    def _release(self, key, conn):
+
+        """Put a connection back into the pool of key"""
+
+        with self._lock:
+            pool = self._pools.setdefault(key, deque())
+            if len(pool) < self.maxsize:
+                pool.append((conn, _now()))
+                return
+
+        conn.close()
@@ -7,8 +7,15 @@
     :copyright: (c) 2015 by Kevin Eichhorn
 """
 
+from .schema import Field, define
+
 class User(object):
 
+	__slots__ = (
+		"userid", "username", "usericon", "usertype", "is_watching", "details",
+		"geo", "profile", "stats",
+	)
+
 	def __init__(self):
 		self.userid = None
 		self.username = None
@@ -20,26 +27,17 @@ class User(object):
 		self.profile = None
 		self.stats = None
 	
-	def from_dict(self, d):
-		self.userid = d['userid']
-		self.username = d['username']
-		self.usericon = d['usericon']
-		self.usertype = d['type']
-		
-		if 'is_watching' in d:
-			self.is_watching = d['is_watching']
-			
-		if 'details' in d:
-			self.details = d['details']
-			
-		if 'geo' in d:
-			self.geo = d['geo']
-			
-		if 'profile' in d:
-			self.profile = d['profile']
-			
-		if 'stats' in d:
-			self.stats = d['stats']		
-	
 	def __repr__(self):
-		return self.username
\ No newline at end of file
+		return self.username
+
+define(User, (
+	Field("userid", required=True),
+	Field("username", required=True),
+	Field("usericon", required=True),
+	Field("usertype", "type", required=True),
+	Field("is_watching"),
+	Field("details"),
+	Field("geo"),
+	Field("profile"),
+	Field("stats"),
+), identity="userid")
@@ -0,0 +1,6 @@
+import sys
+
+# the asyncio tests are written with async/await, a SyntaxError before Python 3.5
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append("test_aio.py")
@@ -1,6 +1,20 @@
+import json
 import os
+import threading
+import time
+import zlib
 
-from sanction.test import with_patched_client
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+from mock import patch
+
+from deviantart.cassette import ReplayTransport
+from deviantart.transport import PooledTransport, Response
 
 
 def mock_response(name, code=200):
@@ -9,7 +23,18 @@ def mock_response(name, code=200):
     filename = os.path.join(testdir, 'mocks', "response_%s.json" % name)
     with open(filename) as f:
         data = "".join(f.readlines())
-    return with_patched_client(data, code)
+
+    def transport_request(self, method, url, body=None, headers=None):
+        return Response(code, {"Content-Type": "application/json"},
+                        data.encode('utf-8'))
+
+    return patch.object(PooledTransport, 'request', transport_request)
+
+
+def replay(name, latency=None):
+    """Returns a transport replaying the recorded session tests/cassettes/<name>.jsonl."""
+    testdir = os.path.dirname(__file__)
+    return ReplayTransport(os.path.join(testdir, 'cassettes', "%s.jsonl" % name), latency)
 
 
 def optional(run, deco):
@@ -21,3 +46,59 @@ def optional(run, deco):
         def do_nothing(func):
             return func
         return do_nothing
+
+
+class _LocalHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.server.requests.append((self.command, self.path, self.rfile.read(length)))
+        self.server.peers.add(self.client_address)
+
+        path = self.path.split("?")[0]
+        time.sleep(self.server.delays.get(path, 0))
+        status, data = self.server.routes.get(path, (404, {"error": "not_found", "error_description": "Not found."}))
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            body = compressor.compress(body) + compressor.flush()
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if path in self.server.truncated:
+            # the connection breaks in the middle of the body
+            body = body[:len(body) // 2]
+            self.close_connection = True
+        self.wfile.write(body)
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalServer(ThreadingMixIn, HTTPServer):
+    """A local HTTP/1.1 server answering with canned JSON per path, after the delay in seconds of the path and cut off for the truncated paths."""
+
+    daemon_threads = True
+
+    def __init__(self, routes=None, delays=None, truncated=()):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), _LocalHandler)
+        self.routes = routes or {}
+        self.delays = delays or {}
+        self.truncated = set(truncated)
+        self.requests = []
+        self.peers = set()
+        self.url = "http://127.0.0.1:{}".format(self.server_address[1])
+        thread = threading.Thread(target=self.serve_forever, args=(0.05,))
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
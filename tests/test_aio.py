@@ -0,0 +1,221 @@
+from __future__ import absolute_import
+
+import asyncio
+import json
+import os
+import unittest
+
+from deviantart.api import DeviantartError
+from deviantart.stub import StubServer
+from deviantart.tracing import InMemoryRecorder
+from .helpers import LocalServer
+
+from deviantart.aio import AsyncApi, AsyncPooledTransport, AsyncReplayTransport
+
+
+def load_mock(name):
+    testdir = os.path.dirname(__file__)
+    with open(os.path.join(testdir, 'mocks', "response_%s.json" % name)) as f:
+        return json.load(f)
+
+
+class AsyncApiTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer({
+            "/oauth2/token": (200, load_mock('token')),
+            "/api/v1/oauth2/deviation/234546F5-C9D1-A9B1-D823-47C4E3D2DB95": (200, load_mock('deviation')),
+            "/api/v1/oauth2/user/profile/devart": (200, load_mock('user_profile_devart')),
+        })
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.da = AsyncApi("", "", max_concurrency=2)
+        self.da.token_endpoint = self.server.url + "/oauth2/token"
+        self.da.resource_endpoint = self.server.url + "/api/v1/oauth2"
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.da.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.server.stop()
+
+    def run_coroutine(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_authenticates_once(self):
+        calls = [self.da.get_user("devart") for _ in range(5)]
+        users = self.run_coroutine(asyncio.gather(*calls))
+        self.assertEqual(["devart"] * 5, [u.username for u in users])
+        token_requests = [r for r in self.server.requests if r[1] == "/oauth2/token"]
+        self.assertEqual(1, len(token_requests))
+        self.assertEqual(load_mock('token')["access_token"], self.da.access_token)
+
+    def test_identical_calls_share_a_request(self):
+        self.run_coroutine(self.da.auth())
+        calls = [self.da.get_user("devart") for _ in range(5)]
+        self.run_coroutine(asyncio.gather(*calls))
+        profile_requests = [r for r in self.server.requests if r[1].startswith("/api/v1/oauth2/user/profile/devart")]
+        self.assertEqual(1, len(profile_requests))
+        self.assertEqual(4, self.da.single_flight.absorbed)
+
+    def test_spans_follow_tasks(self):
+        recorder = InMemoryRecorder()
+        self.da.tracer.add_hook(recorder)
+
+        async def crawl():
+            with self.da.span("crawl") as span:
+                await asyncio.gather(self.da.get_user("devart"), self.da.get_deviation("234546F5-C9D1-A9B1-D823-47C4E3D2DB95"))
+            return span
+
+        span = self.run_coroutine(crawl())
+        names = sorted(child.name for child in recorder.children(span))
+        self.assertEqual(["/deviation/{deviationid}", "/user/profile/{username}"], names)
+
+    def test_same_decoding_as_api(self):
+        deviation = self.run_coroutine(self.da.get_deviation("234546F5-C9D1-A9B1-D823-47C4E3D2DB95"))
+        self.assertEqual("234546F5-C9D1-A9B1-D823-47C4E3D2DB95", deviation.deviationid)
+        self.assertEqual("devart", deviation.author.username)
+        metrics = self.da.stats()["endpoints"]["/deviation/{deviationid}"]
+        self.assertEqual(1, metrics["model"]["count"])
+        self.assertEqual(1, metrics["transfer"]["count"])
+
+    def test_gzip(self):
+        transport = AsyncPooledTransport()
+        url = self.server.url + "/api/v1/oauth2/user/profile/devart"
+        response = self.run_coroutine(transport.request("GET", url))
+        self.assertEqual(load_mock('user_profile_devart'), json.loads(response.body.decode(response.charset)))
+        self.assertTrue(response.received < len(response.body))
+        self.run_coroutine(transport.close())
+
+    def test_replay(self):
+        path = os.path.join(os.path.dirname(__file__), 'cassettes', 'gallery_crawl.jsonl')
+        da = AsyncApi("client", "secret", transport=AsyncReplayTransport(path))
+        da.retry_policy.backoff_base = 0
+        page = self.run_coroutine(da.get_gallery_all("devart", offset=0, limit=2))
+        self.assertEqual(["Page item 0", "Page item 1"], [d.title for d in page['results']])
+
+    def test_validation_errors(self):
+        with self.assertRaisesRegexp(DeviantartError, "Unknown endpoint"):
+            self.run_coroutine(self.da.browse(endpoint="unknown"))
+        with self.assertRaisesRegexp(DeviantartError, "Not found"):
+            self.run_coroutine(self.da.get_deviation("missing"))
+
+    def test_bounded_concurrency(self):
+        transport = self.da.transport
+        calls = [self.da.get_user("devart") for _ in range(10)]
+        self.run_coroutine(asyncio.gather(*calls))
+        self.assertTrue(isinstance(transport, AsyncPooledTransport))
+        # token request plus at most two connections in flight
+        self.assertTrue(transport.connections_opened <= 3)
+
+
+class AsyncTransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer({
+            "/item": (200, {"item": 0}),
+            "/slow": (200, {"item": "slow"}),
+            "/truncated": (200, {"results": [{"title": "Jark Promo {}".format(i)} for i in range(5000)]}),
+        }, delays={"/slow": 1.5}, truncated=["/truncated"])
+        self.loop = asyncio.new_event_loop()
+        self.transport = AsyncPooledTransport(timeout=0.5, compress=False)
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.transport.close())
+        self.loop.close()
+        self.server.stop()
+
+    def sent(self, path):
+        return len([r for r in self.server.requests if r[1] == path])
+
+    def test_timeout_is_not_sent_again(self):
+        self.loop.run_until_complete(self.transport.request("GET", self.server.url + "/item"))
+        with self.assertRaises(asyncio.TimeoutError):
+            self.loop.run_until_complete(self.transport.request("POST", self.server.url + "/slow", b"body=1"))
+        self.assertEqual(1, self.sent("/slow"))
+
+    def test_truncated_response_is_not_sent_again(self):
+        self.loop.run_until_complete(self.transport.request("GET", self.server.url + "/item"))
+        with self.assertRaises(asyncio.IncompleteReadError):
+            self.loop.run_until_complete(self.transport.request("POST", self.server.url + "/truncated", b"body=1"))
+        self.assertEqual(1, self.sent("/truncated"))
+
+    def test_closed_connection_is_sent_again(self):
+        self.loop.run_until_complete(self.transport.request("GET", self.server.url + "/item"))
+        for pool in self.transport._pools.values():
+            for conn in pool:
+                # closed by the server while idle, unnoticed by the pool yet
+                conn.writer.transport.abort()
+                conn.reader.at_eof = lambda: False
+        response = self.loop.run_until_complete(self.transport.request("POST", self.server.url + "/item", b"body=1"))
+        self.assertEqual(200, response.status)
+        self.assertEqual(2, self.transport.connections_opened)
+
+
+class AsyncPaginationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(items=45)
+        self.server.start()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.da = AsyncApi("client", "secret")
+        self.server.configure(self.da)
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.da.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.server.stop()
+
+    def collect(self, pages):
+        async def collect():
+            items = []
+            async for item in pages:
+                items.append(item)
+            return items
+        return self.loop.run_until_complete(collect())
+
+    def test_iter_gallery_all(self):
+        for prefetch in (0, 2):
+            deviations = self.collect(self.da.iter_gallery_all("devart", limit=20, prefetch=prefetch))
+            self.assertEqual(["Synthetic deviation {}".format(i) for i in range(45)], [d.title for d in deviations])
+
+    def test_pages_are_children_of_crawl_span(self):
+        recorder = InMemoryRecorder()
+        self.da.tracer.add_hook(recorder)
+        for fanout in (None, 4):
+            recorder.clear()
+            self.assertEqual(45, len(self.collect(self.da.iter_gallery_all("devart", limit=10, fanout=fanout))))
+            crawl, = recorder.find("get_gallery_all")
+            self.assertEqual(recorder.find("/gallery/all"), recorder.children(crawl))
+
+    def test_max_items(self):
+        pages = self.da.iter_browse("newest", max_items=15, limit=10)
+        self.assertEqual(15, len(self.collect(pages)))
+        self.assertEqual(20, pages.next_offset)
+
+    def test_fanout(self):
+        pages = self.da.iter_gallery_all("devart", fanout=4)
+        deviations = self.collect(pages)
+        self.assertEqual(["Synthetic deviation {}".format(i) for i in range(45)], [d.title for d in deviations])
+        self.assertEqual(0, pages.duplicates)
+
+    def test_aclose_waits_for_cancelled_fetches(self):
+        async def first(pages):
+            async with pages:
+                async for deviation in pages:
+                    return deviation
+
+        for fanout in (None, 4):
+            pages = self.da.iter_gallery_all("devart", limit=10, prefetch=2, fanout=fanout)
+            self.assertEqual("Synthetic deviation 0", self.loop.run_until_complete(first(pages)).title)
+            pending = [task for task in asyncio.all_tasks(self.loop) if not task.done()]
+            self.assertEqual([], pending)
+
+    def test_stream_messages(self):
+        self.da.standard_grant_type = "authorization_code"
+        self.loop.run_until_complete(self.da.auth(code="code"))
+        messages = self.da.stream_messages()
+        self.assertEqual(45, len(self.collect(messages)))
+        self.assertEqual("45", messages.cursor)
@@ -2,6 +2,8 @@ from __future__ import absolute_import
 
 import unittest
 import deviantart
+from deviantart import stub
+from deviantart.stub import StubServer
 from .helpers import mock_response, optional
 from .api_credentials import CLIENT_ID, CLIENT_SECRET
 
@@ -11,6 +13,7 @@ class ApiTest(unittest.TestCase):
     @optional(CLIENT_ID == "", mock_response('token'))
     def setUp(self):
         self.da = deviantart.Api(CLIENT_ID, CLIENT_SECRET)
+        self.da.auth()
 
     @optional(CLIENT_ID == "", mock_response('user_profile_devart'))
     def test_get_user(self):
@@ -30,3 +33,34 @@ class ApiTest(unittest.TestCase):
         comment = comments['thread'][0]
         self.assertEqual("E99B1CEB-933F-B54D-ABC2-88FD0F66D421", comment.commentid)
         self.assertEqual("E99B1CEB-933F-B54D-ABC2-88FD0F66D421", repr(comment))
+
+
+class RawTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(items=30)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.da = deviantart.Api("client", "secret")
+        self.server.configure(self.da)
+
+    def test_raw_call(self):
+        page = self.da.browse(limit=5, raw=True)
+        self.assertEqual([stub.deviation(i) for i in range(5)], page["results"])
+        self.assertEqual((True, 5), (page["has_more"], page["next_offset"]))
+
+        watchers = self.da.get_watchers("devart", limit=5, raw=True)["results"]
+        self.assertEqual([stub.watcher(i) for i in range(5)], watchers)
+
+        self.assertIsInstance(self.da.browse(limit=5)["results"][0], deviantart.deviation.Deviation)
+
+    def test_raw_client(self):
+        self.da.raw = True
+        self.assertEqual(stub.user(0)["userid"], self.da.get_user("devart")["userid"])
+        self.assertEqual(stub.comment(0), self.da.get_comments(deviationid="1", limit=5)["thread"][0])
+        self.assertIsInstance(self.da.get_gallery_all("devart", limit=5, raw=False)["results"][0], deviantart.deviation.Deviation)
+
+    def test_iter_raw(self):
+        items = list(self.da.iter_gallery_all("devart", raw=True))
+        self.assertEqual([stub.deviation(i) for i in range(30)], items)
@@ -0,0 +1,212 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import deviantart
+from deviantart.cache import CacheEntry, ResponseCache, SQLiteCache, TieredCache
+from deviantart.transport import Response, Transport
+from .helpers import mock_response
+
+
+class CountingTransport(Transport):
+
+    def __init__(self):
+        self.urls = []
+
+    def request(self, method, url, body=None, headers=None):
+        self.urls.append(url)
+        return Response(200, {"Content-Type": "application/json"}, b'{"results": [], "has_more": false, "next_offset": null, "success": true}')
+
+
+class ETagTransport(Transport):
+
+    """Answers conditional requests with 304 Not Modified"""
+
+    body = b'{"results": [{"countryid": 1, "country": "Afghanistan"}], "success": true}'
+
+    def __init__(self):
+        self.statuses = []
+
+    def request(self, method, url, body=None, headers=None):
+        if headers.get("If-None-Match") == '"v1"':
+            response = Response(304, {"ETag": '"v1"'}, b"")
+        else:
+            response = Response(200, {"Content-Type": "application/json", "ETag": '"v1"'}, self.body)
+        self.statuses.append(response.status)
+        return response
+
+
+def entry(body, ttl=60):
+    return CacheEntry(body, {}, time.time() + ttl)
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_key_is_canonical(self):
+        self.assertEqual(
+            ResponseCache.key("/browse/hot", {"offset": 0, "limit": 10}),
+            ResponseCache.key("/browse/hot", {"limit": 10, "offset": 0}))
+        self.assertNotEqual(
+            ResponseCache.key("/deviation/metadata", post_data={"deviationids[]": ["a"]}),
+            ResponseCache.key("/deviation/metadata", post_data={"deviationids[]": ["b"]}))
+
+    def test_ttls(self):
+        cache = ResponseCache(ttls={"/deviation/metadata": 10})
+        self.assertEqual(300, cache.ttl("/deviation/234546F5"))
+        self.assertEqual(10, cache.ttl("/deviation/metadata"))
+        self.assertEqual(0, cache.ttl("/messages/feed"))
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2, max_bytes=10)
+        cache.set("a", entry(b"aaa"))
+        cache.set("b", entry(b"bbb"))
+        cache.get("a")
+        cache.set("c", entry(b"ccc"))
+        self.assertEqual(None, cache.get("b"))
+        self.assertEqual(b"aaa", cache.get("a").body)
+        cache.set("d", entry(b"dddddd"))
+        self.assertEqual(None, cache.get("c"))
+        self.assertEqual({
+            "hits": 2,
+            "misses": 2,
+            "revalidations": 0,
+            "bytes_saved": 6,
+            "evictions": 2,
+            "invalidations": 0,
+            "entries": 2,
+            "bytes": 9
+        }, cache.stats())
+
+    def test_stale_entries_count_as_miss(self):
+        cache = ResponseCache()
+        cache.set("a", entry(b"a", ttl=-1))
+        self.assertFalse(cache.get("a").fresh)
+        self.assertEqual(1, cache.misses)
+
+
+class ApiCacheTest(unittest.TestCase):
+
+    @mock_response('token')
+    def setUp(self):
+        self.cache = ResponseCache()
+        self.da = deviantart.Api("", "", cache=self.cache)
+        self.da.auth()
+        self.transport = self.da.transport = CountingTransport()
+
+    def test_reads_are_cached(self):
+        self.assertEqual(self.da.get_countries(), self.da.get_countries())
+        self.assertEqual(1, len(self.transport.urls))
+        self.assertEqual(1, self.cache.hits)
+
+    def test_uncached_endpoints(self):
+        self.da.get_statuses("devart")
+        self.da.get_statuses("devart")
+        self.assertEqual(2, len(self.transport.urls))
+
+    def test_writes_invalidate(self):
+        self.cache.set(ResponseCache.key("/user/profile/devart", {}), entry(b"{}"))
+        self.cache.set(ResponseCache.key("/data/countries"), entry(b"{}"))
+        self.da.standard_grant_type = "authorization_code"
+        self.da.update_user(tagline="Hello")
+        self.assertEqual(1, self.cache.invalidations)
+        self.assertEqual(1, self.cache.stats()["entries"])
+
+
+class SQLiteCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "cache.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_persists_compressed(self):
+        body = b'{"results": []}' * 100
+        cache = SQLiteCache(self.path)
+        cache.set("a", CacheEntry(body, {"etag": '"v1"'}, time.time() + 60))
+        cache.close()
+
+        cached = SQLiteCache(self.path).get("a")
+        self.assertEqual(body, cached.body)
+        self.assertEqual({"If-None-Match": '"v1"'}, cached.validators)
+        stats = SQLiteCache(self.path).stats()
+        self.assertEqual(len(body), stats["bytes"])
+        self.assertTrue(stats["stored_bytes"] < len(body) / 10)
+
+    def test_eviction_and_invalidation(self):
+        # a 5 byte body takes 16 bytes uncompressed, so two fit
+        cache = SQLiteCache(self.path, max_bytes=40, level=0)
+        cache.touch_interval = 0
+        cache.set("/a?|", entry(b"a" * 5))
+        time.sleep(0.01)
+        cache.set("/b?|", entry(b"b" * 5))
+        time.sleep(0.01)
+        cache.get("/a?|")
+        cache.set("/c?|", entry(b"c" * 5))
+        self.assertEqual(None, cache.get("/b?|"))
+        self.assertEqual(1, cache.evictions)
+        cache.invalidate("/a")
+        self.assertEqual(None, cache.get("/a?|"))
+        self.assertEqual(1, cache.stats()["entries"])
+
+    def test_running_total(self):
+        def totals(cache):
+            db = cache._db()
+            return (db.execute("SELECT stored FROM totals").fetchone()[0],
+                    db.execute("SELECT COALESCE(SUM(stored), 0) FROM responses").fetchone()[0])
+
+        cache = SQLiteCache(self.path, level=0)
+        cache.set("/a?|", entry(b"a" * 5))
+        cache.set("/a?|", entry(b"a" * 50))
+        cache.set("/b?|", entry(b"b" * 5))
+        stored, actual = totals(cache)
+        self.assertEqual(actual, stored)
+        self.assertTrue(stored > 0)
+        cache.invalidate("/a")
+        self.assertEqual(*totals(cache))
+        cache.clear()
+        self.assertEqual((0, 0), totals(cache))
+
+        # a file written before the total was kept
+        cache.set("/c?|", entry(b"c" * 5))
+        db = cache._db()
+        for statement in ("DROP TRIGGER responses_inserted", "DROP TRIGGER responses_deleted", "DROP TABLE totals"):
+            db.execute(statement)
+        cache.close()
+        stored, actual = totals(SQLiteCache(self.path))
+        self.assertEqual(actual, stored)
+        self.assertTrue(stored > 0)
+
+    def test_tiered(self):
+        disk = SQLiteCache(self.path)
+        disk.set("a", entry(b"a"))
+        memory = ResponseCache()
+        cache = TieredCache(memory, disk)
+        self.assertEqual(b"a", cache.get("a").body)
+        self.assertEqual(b"a", memory.get("a").body)
+        disk.set("ab", entry(b"ab"))
+        self.assertEqual(3, cache.invalidate("a"))
+        self.assertEqual(None, disk.get("a"))
+        self.assertEqual((1, 2, 3), (memory.invalidations, disk.invalidations, cache.invalidations))
+        self.assertEqual(0, cache.invalidate("a"))
+        self.assertEqual(3, cache.stats()["invalidations"])
+
+
+    @mock_response('token')
+    def test_conditional_revalidation(self):
+        cache = SQLiteCache(self.path, ttls={"/data/countries": 0.001})
+        da = deviantart.Api("", "", cache=cache)
+        da.auth()
+        transport = da.transport = ETagTransport()
+        countries = da.get_countries()
+        time.sleep(0.01)
+        self.assertEqual(countries, da.get_countries())
+        self.assertEqual([200, 304], transport.statuses)
+        stats = cache.stats()
+        self.assertEqual(1, stats["revalidations"])
+        self.assertEqual(len(ETagTransport.body), stats["bytes_saved"])
@@ -0,0 +1,80 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import deviantart
+from deviantart.cassette import CassetteError, RecordingTransport, ReplayTransport
+from deviantart.retry import RetryPolicy
+from deviantart.transport import PooledTransport
+from .helpers import LocalServer, replay
+
+
+def crawl(da, username):
+    titles = []
+    offset = 0
+    while True:
+        page = da.get_gallery_all(username, offset=offset, limit=2)
+        titles.extend(d.title for d in page['results'])
+        if not page['has_more']:
+            return titles
+        offset = page['next_offset']
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(backoff_base=0)
+
+    def test_replays_pagination_and_retries(self):
+        transport = replay("gallery_crawl")
+        da = deviantart.Api("client", "secret", transport=transport, retry_policy=self.policy)
+        self.assertEqual(["Page item {}".format(i) for i in range(5)], crawl(da, "devart"))
+        self.assertEqual(1, self.policy.retries)
+        self.assertEqual(5, transport.played)
+        self.assertEqual(0, transport.remaining)
+
+    def test_unrecorded_request(self):
+        da = deviantart.Api("client", "secret", transport=replay("gallery_crawl"), retry_policy=self.policy)
+        with self.assertRaises(CassetteError):
+            da.get_gallery_all("someone_else")
+
+    def test_latency(self):
+        da = deviantart.Api("client", "secret", transport=replay("gallery_crawl", latency=0.02), retry_policy=self.policy)
+        start = time.time()
+        crawl(da, "devart")
+        self.assertTrue(time.time() - start >= 0.1)
+
+
+class RecordTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.server = LocalServer({
+            "/oauth2/token": (200, {"access_token": "secret-token", "expires_in": 3600, "status": "success"}),
+            "/api/v1/oauth2/data/countries": (200, {"results": [{"countryid": 1, "country": "Afghanistan"}]}),
+        })
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def session(self, transport):
+        da = deviantart.Api("client", "client-secret", transport=transport)
+        da.token_endpoint = self.server.url + "/oauth2/token"
+        da.resource_endpoint = self.server.url + "/api/v1/oauth2"
+        return da.get_countries()
+
+    def test_round_trip(self):
+        for name in ("session.jsonl", "session.jsonl.gz"):
+            path = os.path.join(self.tmpdir, name)
+            recorded = self.session(RecordingTransport(path, PooledTransport()))
+            self.assertEqual(recorded, self.session(ReplayTransport(path)))
+
+        with open(os.path.join(self.tmpdir, "session.jsonl")) as f:
+            cassette = f.read()
+        self.assertNotIn("secret-token", cassette)
+        self.assertNotIn("client-secret", cassette)
@@ -0,0 +1,216 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import deviantart
+from deviantart.checkpoint import Checkpoint, FileCheckpointStore, SQLiteCheckpointStore
+from deviantart.identity import IdentityMap
+from deviantart.pagination import CursorIterator, PageIterator
+from deviantart.stub import StubServer
+from deviantart.tracing import InMemoryRecorder
+from .test_pagination import Listing
+
+
+class CheckpointStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def check_store(self, store):
+        self.assertEqual(None, store.load("gallery/devart"))
+        store.save("gallery/devart", {"offset": 20, "skip": 3})
+        store.save("gallery/devart", {"offset": 40, "skip": 1})
+        self.assertEqual({"offset": 40, "skip": 1}, store.load("gallery/devart"))
+        store.delete("gallery/devart")
+        self.assertEqual(None, store.load("gallery/devart"))
+
+    def test_file_store(self):
+        self.check_store(FileCheckpointStore(os.path.join(self.tmpdir, "crawls")))
+
+    def test_sqlite_store(self):
+        store = SQLiteCheckpointStore(os.path.join(self.tmpdir, "crawls.db"))
+        self.check_store(store)
+        store.close()
+
+
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.store = FileCheckpointStore(self.tmpdir)
+
+    def test_resume_skips_emitted_items(self):
+        checkpoint = Checkpoint(self.store, "crawl", interval=0)
+        checkpoint.start("listing", [], {})
+        pages = PageIterator(Listing(100), checkpoint=checkpoint)
+        self.assertEqual(list(range(23)), [next(pages) for _ in range(23)])
+        # the worker dies without closing the iterator
+
+        listing = Listing(100)
+        resumed = PageIterator(listing, checkpoint=Checkpoint(self.store, "crawl"))
+        self.assertEqual(list(range(23, 100)), list(resumed))
+        self.assertEqual(20, listing.offsets[0])
+        self.assertEqual(100, resumed.emitted)
+
+        finished = PageIterator(Listing(100), checkpoint=Checkpoint(self.store, "crawl"))
+        self.assertEqual([], list(finished))
+
+    def test_saves_on_close(self):
+        checkpoint = Checkpoint(self.store, "crawl", interval=3600)
+        checkpoint.start("listing", [], {})
+        with PageIterator(Listing(100), checkpoint=checkpoint, max_items=35) as pages:
+            self.assertEqual(35, len(list(pages)))
+        self.assertEqual({"offset": 30, "skip": 5, "items": 35}, dict((key, self.store.load("crawl")[key]) for key in ("offset", "skip", "items")))
+
+
+class Feed(object):
+
+    def __init__(self, size):
+        self.size = size
+        self.cursors = []
+
+    def __call__(self, cursor):
+        self.cursors.append(cursor)
+        start = int(cursor or 0)
+        end = min(start + 10, self.size)
+        return {"results": list(range(start, end)), "has_more": end < self.size, "cursor": str(end)}
+
+
+class CursorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.store = FileCheckpointStore(self.tmpdir)
+
+    def test_decodes_and_keeps_last_cursor(self):
+        feed = Feed(25)
+        messages = CursorIterator(feed, decode=str, prefetch=2)
+        self.assertEqual([str(i) for i in range(25)], list(messages))
+        self.assertEqual(["", "10", "20"], feed.cursors)
+        self.assertEqual("25", messages.cursor)
+
+    def test_continues_from_checkpoint(self):
+        checkpoint = Checkpoint(self.store, "inbox", interval=0)
+        checkpoint.start("feed", [], {})
+        messages = CursorIterator(Feed(25), checkpoint=checkpoint)
+        self.assertEqual(list(range(12)), [next(messages) for _ in range(12)])
+
+        feed = Feed(25)
+        self.assertEqual(list(range(12, 25)), list(CursorIterator(feed, checkpoint=Checkpoint(self.store, "inbox"))))
+        self.assertEqual(["10", "20"], feed.cursors)
+        self.assertEqual({"cursor": "25", "skip": 0}, dict((key, self.store.load("inbox")[key]) for key in ("cursor", "skip")))
+
+        # new messages arrived after the feed was drained
+        feed = Feed(31)
+        self.assertEqual(list(range(25, 31)), list(CursorIterator(feed, checkpoint=Checkpoint(self.store, "inbox"))))
+
+
+class ApiResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.store = SQLiteCheckpointStore(os.path.join(self.tmpdir, "crawls.db"))
+
+        self.server = StubServer(items=60)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.da = deviantart.Api("client", "secret")
+        self.server.configure(self.da)
+
+    def test_resume(self):
+        pages = self.da.iter_gallery_all("devart", limit=10, checkpoint=Checkpoint(self.store, "gallery-devart"))
+        first = [next(pages).title for _ in range(25)]
+        pages.close()
+
+        rest = [d.title for d in self.da.resume(Checkpoint(self.store, "gallery-devart"))]
+        self.assertEqual(["Synthetic deviation {}".format(i) for i in range(60)], first + rest)
+
+    def test_resume_with_saved_options(self):
+        pages = self.da.iter_gallery_all("devart", limit=10, max_items=30, checkpoint=Checkpoint(self.store, "gallery-devart"))
+        first = [next(pages).title for _ in range(12)]
+        pages.close()
+
+        rest = [d.title for d in self.da.resume(Checkpoint(self.store, "gallery-devart"))]
+        self.assertEqual(["Synthetic deviation {}".format(i) for i in range(30)], first + rest)
+
+        rest = [d.title for d in self.da.resume(Checkpoint(self.store, "gallery-devart"), max_items=40)]
+        self.assertEqual(["Synthetic deviation {}".format(i) for i in range(30, 40)], rest)
+
+    def test_resume_unknown_crawl(self):
+        with self.assertRaises(deviantart.api.DeviantartError):
+            self.da.resume(Checkpoint(self.store, "unknown"))
+
+    def test_other_parameters(self):
+        self.da.iter_gallery_all("devart", checkpoint=Checkpoint(self.store, "gallery")).close()
+        with self.assertRaises(ValueError):
+            self.da.iter_gallery_all("someone_else", checkpoint=Checkpoint(self.store, "gallery"))
+
+
+    def test_saved_parameters(self):
+        checkpoint = Checkpoint(self.store, "gallery")
+        self.da.paginate(self.da.get_gallery_all, "devart", checkpoint=checkpoint, identity_map=IdentityMap()).close()
+        self.assertEqual(True, checkpoint.state["params"]["identity_map"])
+        self.da.paginate(self.da.get_gallery_all, "devart", checkpoint=Checkpoint(self.store, "gallery"), identity_map=True).close()
+
+        checkpoint = Checkpoint(self.store, "metadata")
+        checkpoint.start("get_deviation_metadata", [], {"deviationids" : ("d1", "d2")})
+        checkpoint.save()
+        Checkpoint(self.store, "metadata").start("get_deviation_metadata", [], {"deviationids" : ("d1", "d2")})
+
+        with self.assertRaises(ValueError):
+            self.da.paginate(self.da.get_gallery_all, object(), checkpoint=Checkpoint(self.store, "unsaved"))
+
+
+class StreamMessagesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.store = FileCheckpointStore(self.tmpdir)
+
+        self.server = StubServer(items=35)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.da = deviantart.Api("client", "secret", standard_grant_type="authorization_code")
+        self.server.configure(self.da)
+        self.da.auth(code="code")
+
+    def test_stream(self):
+        recorder = InMemoryRecorder()
+        self.da.tracer.add_hook(recorder)
+        messages = self.da.stream_messages()
+        self.assertEqual(35, len([m for m in messages if isinstance(m, deviantart.message.Message)]))
+        stream, = recorder.find("stream_messages")
+        self.assertEqual(recorder.find("/messages/feed"), recorder.children(stream))
+        self.assertEqual("35", messages.cursor)
+        self.assertEqual(35, self.da.stats()["endpoints"]["/messages/feed"]["model"]["count"])
+
+    def test_continue_stream(self):
+        messages = self.da.stream_messages(checkpoint=Checkpoint(self.store, "inbox", interval=0))
+        first = [next(messages).messageid for _ in range(12)]
+        messages.close()
+
+        rest = [m.messageid for m in self.da.stream_messages(checkpoint=Checkpoint(self.store, "inbox"))]
+        self.assertEqual(35, len(set(first + rest)))
+        self.assertEqual([], list(self.da.stream_messages(checkpoint=Checkpoint(self.store, "inbox"))))
+
+    def test_resume_stream(self):
+        messages = self.da.stream_messages(max_items=20, checkpoint=Checkpoint(self.store, "inbox", interval=0))
+        first = [next(messages).messageid for _ in range(12)]
+        messages.close()
+
+        rest = [m.messageid for m in self.da.resume(Checkpoint(self.store, "inbox"))]
+        self.assertEqual(20, len(set(first + rest)))
+
+
+if __name__ == "__main__":
+    unittest.main()
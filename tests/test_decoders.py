@@ -0,0 +1,30 @@
+from __future__ import absolute_import
+
+import json
+import unittest
+
+import deviantart
+from deviantart.decoders import best_decoder, json_loads
+from .helpers import mock_response
+
+
+class DecoderTest(unittest.TestCase):
+
+    def test_fallback(self):
+        self.assertEqual(json_loads, best_decoder(["no_such_json_library"]))
+        self.assertEqual({"a": [1]}, json_loads(b'{"a": [1]}'))
+
+    @mock_response('user_profile_devart')
+    def test_custom_decoder(self):
+        bodies = []
+
+        def decoder(body):
+            bodies.append(body)
+            return json.loads(body.decode("utf-8"))
+
+        da = deviantart.Api("", "", decoder=decoder)
+        da.access_token = "token"
+        da.token_expires = None
+        self.assertEqual("devart", da.get_user("devart").username)
+        self.assertEqual(1, len(bodies))
+        self.assertTrue(isinstance(bodies[0], bytes))
@@ -0,0 +1,105 @@
+from __future__ import absolute_import
+
+import unittest
+
+import deviantart
+from deviantart.identity import IdentityMap
+from deviantart.schema import decode_many
+from deviantart.stub import StubServer, deviation, user
+from deviantart.deviation import Deviation
+
+
+class IdentityMapTest(unittest.TestCase):
+
+    def test_lru(self):
+        users = IdentityMap(max_entries=2)
+        users.add("a", 1)
+        users.add("b", 2)
+        self.assertEqual(1, users.get("a"))
+        users.add("c", 3)
+        self.assertEqual(None, users.get("b"))
+        self.assertEqual((1, 3), (users.get("a"), users.get("c")))
+        self.assertEqual({"hits": 3, "misses": 1, "entries": 2}, users.stats())
+
+    def test_shared_authors(self):
+        users = IdentityMap()
+        deviations = decode_many(Deviation, [deviation(i) for i in range(120)], users)
+        self.assertIs(deviations[0].author, deviations[50].author)
+        self.assertIsNot(deviations[0].author, deviations[1].author)
+        self.assertEqual(50, len(users))
+        self.assertEqual(user(3)["username"], deviations[103].author.username)
+
+    def test_discard(self):
+        users = IdentityMap()
+        users.add("a", "devart")
+        users.add("b", "other")
+        users.discard(lambda name: name == "devart")
+        self.assertEqual((None, "other"), (users.get("a"), users.get("b")))
+
+    def test_without_map(self):
+        deviations = decode_many(Deviation, [deviation(0), deviation(50)])
+        self.assertIsNot(deviations[0].author, deviations[1].author)
+
+
+class ApiIdentityMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(items=120)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.da = deviantart.Api("client", "secret")
+        self.server.configure(self.da)
+
+    def test_per_call(self):
+        first = self.da.browse(limit=60, identity_map=True)["results"]
+        self.assertIs(first[0].author, first[50].author)
+
+        second = self.da.browse(limit=60, identity_map=True)["results"]
+        self.assertIsNot(first[0].author, second[0].author)
+
+        self.assertIsNot(*[d.author for d in self.da.browse(limit=60)["results"][0:51:50]])
+
+    def test_per_client(self):
+        self.da.identity_map = IdentityMap()
+        first = self.da.browse(limit=10)["results"]
+        watchers = self.da.get_watchers("devart", limit=10)["results"]
+        self.assertIs(first[0].author, watchers[0]["user"])
+        self.assertIsNot(first[0].author, self.da.browse(limit=10, identity_map=False)["results"][0].author)
+
+    def test_users_by_name_are_fetched_anew(self):
+        self.da.identity_map = IdentityMap()
+        author = self.da.browse(limit=10)["results"][0].author
+        fetched = self.da.get_user(author.username)
+        self.assertIsNot(author, fetched)
+        self.assertIs(author, self.da.browse(limit=10)["results"][0].author)
+
+    def test_writes_discard_users(self):
+        self.da.standard_grant_type = "authorization_code"
+        self.da.auth(code="code")
+        self.da.identity_map = IdentityMap()
+        author = self.da.browse(limit=10)["results"][0].author
+        self.da.watch(author.username.upper())
+        self.assertIsNot(author, self.da.browse(limit=10)["results"][0].author)
+        self.assertEqual(10, len(self.da.identity_map))
+        self.da.update_user(tagline="Synthetic")
+        self.assertEqual(0, len(self.da.identity_map))
+
+    def test_lazy_models_are_not_shared(self):
+        with self.assertRaises(ValueError):
+            deviantart.Api("client", "secret", lazy=True, identity_map=True)
+        da = deviantart.Api("client", "secret", lazy=True)
+        self.server.configure(da)
+        with self.assertRaises(ValueError):
+            da.browse(limit=10, identity_map=True)
+        self.assertEqual(10, len(da.get_watchers("devart", limit=10, raw=True, identity_map=True)["results"]))
+        self.assertEqual(10, len(da.browse(limit=10, raw=True, identity_map=True)["results"]))
+
+    def test_per_iterator(self):
+        deviations = list(self.da.iter_gallery_all("devart", limit=10, identity_map=True))
+        self.assertEqual(120, len(deviations))
+        self.assertIs(deviations[0].author, deviations[100].author)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+from __future__ import absolute_import
+
+import unittest
+
+import deviantart
+from deviantart.api import DeviantartError
+from deviantart.metrics import Histogram, Metrics, MetricsSink, endpoint_label
+from .helpers import mock_response
+
+
+class RecordingSink(MetricsSink):
+
+    def __init__(self):
+        self.records = []
+
+    def increment(self, endpoint, name, value=1):
+        self.records.append((endpoint, name))
+
+    def observe(self, endpoint, name, value):
+        self.records.append((endpoint, name))
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_endpoint_label(self):
+        self.assertEqual("/deviation/{deviationid}", endpoint_label("/deviation/234546F5-C9D1-A9B1-D823-47C4E3D2DB95"))
+        self.assertEqual("/deviation/metadata", endpoint_label("/deviation/metadata"))
+        self.assertEqual("/user/friends/watching/{username}", endpoint_label("/user/friends/watching/devart"))
+        self.assertEqual("/comments/{commentid}/siblings", endpoint_label("/comments/E99B1CEB/siblings"))
+
+    def test_histogram(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+        self.assertEqual({"count": 4, "sum": 56.5, "buckets": [(1, 2), (10, 3), ("+Inf", 4)]}, histogram.snapshot())
+
+    def test_prometheus(self):
+        metrics = Metrics()
+        metrics.increment("/data/countries", "calls")
+        metrics.observe("/data/countries", "decode", 0.003)
+        text = metrics.prometheus()
+        self.assertIn('deviantart_calls_total{endpoint="/data/countries"} 1\n', text)
+        self.assertIn('deviantart_decode_seconds_bucket{endpoint="/data/countries",le="0.005"} 1\n', text)
+        self.assertIn('deviantart_response_bytes_count{endpoint="/data/countries"} 0\n', text)
+        self.assertIn("# TYPE deviantart_model_seconds histogram\n", text)
+
+
+class ApiMetricsTest(unittest.TestCase):
+
+    @mock_response('token')
+    def setUp(self):
+        self.da = deviantart.Api("", "")
+        self.da.auth()
+
+    @mock_response('deviation')
+    def test_phases(self):
+        self.da.get_deviation("234546F5-C9D1-A9B1-D823-47C4E3D2DB95")
+        self.da.get_deviation("5F4E3D2C-C9D1-A9B1-D823-47C4E3D2DB95")
+        metrics = self.da.stats()["endpoints"]["/deviation/{deviationid}"]
+        self.assertEqual(2, metrics["calls"])
+        self.assertEqual(0, metrics["errors"])
+        for phase in ("transfer", "decode", "model", "response_bytes"):
+            self.assertEqual(2, metrics[phase]["count"])
+        self.assertTrue(metrics["response_bytes"]["sum"] > 1000)
+
+    @mock_response('user_profile_devart', 404)
+    def test_errors(self):
+        with self.assertRaises(DeviantartError):
+            self.da.get_user("devart")
+        self.assertEqual(1, self.da.stats()["endpoints"]["/user/profile/{username}"]["errors"])
+
+    @mock_response('deviation')
+    def test_custom_sink(self):
+        sink = self.da.metrics = RecordingSink()
+        self.da.get_deviation("234546F5-C9D1-A9B1-D823-47C4E3D2DB95")
+        self.assertEqual([
+            ("/deviation/{deviationid}", "calls"),
+            ("/deviation/{deviationid}", "transfer"),
+            ("/deviation/{deviationid}", "response_bytes"),
+            ("/deviation/{deviationid}", "decode"),
+            ("/deviation/{deviationid}", "model"),
+        ], sink.records)
+        self.assertEqual({}, self.da.stats()["endpoints"])
@@ -0,0 +1,104 @@
+from __future__ import absolute_import
+
+import json
+import os
+import pickle
+import unittest
+
+import deviantart
+from deviantart.comment import Comment
+from deviantart.deviation import Deviation
+from deviantart.lazy import LazyDeviation, lazy_class
+from deviantart.message import Message
+from deviantart.status import Status
+from deviantart.stub import StubServer
+from deviantart.user import User
+
+
+def load_mock(name):
+    testdir = os.path.dirname(__file__)
+    with open(os.path.join(testdir, 'mocks', "response_%s.json" % name)) as f:
+        return json.load(f)
+
+
+class ModelTest(unittest.TestCase):
+
+    def test_models_are_slotted(self):
+        for cls in (Comment, Deviation, Message, Status, User):
+            self.assertFalse(hasattr(cls(), "__dict__"), cls.__name__)
+            with self.assertRaises(AttributeError):
+                cls().unknown_field = 1
+
+    def test_pickle(self):
+        deviation = Deviation()
+        deviation.from_dict(load_mock('deviation'))
+        copy = pickle.loads(pickle.dumps(deviation, 2))
+        self.assertEqual(deviation.deviationid, copy.deviationid)
+        self.assertEqual(deviation.author.username, copy.author.username)
+        self.assertEqual(deviation.stats, copy.stats)
+
+
+class LazyModelTest(unittest.TestCase):
+
+    def test_fields_match_eager_model(self):
+        data = load_mock('deviation')
+        eager = Deviation()
+        eager.from_dict(data)
+        lazy = LazyDeviation()
+        lazy.from_dict(data)
+
+        self.assertIsInstance(lazy, Deviation)
+        for name in ("deviationid", "title", "stats", "published_time", "content"):
+            self.assertEqual(getattr(eager, name), getattr(lazy, name))
+        self.assertIsInstance(lazy.author, User)
+        self.assertEqual(eager.author.username, lazy.author.username)
+        self.assertEqual(eager.author.usertype, lazy.author.usertype)
+
+    def test_fields_are_built_once(self):
+        lazy = LazyDeviation()
+        lazy.from_dict(load_mock('deviation'))
+        self.assertIs(lazy.author, lazy.author)
+        lazy.title = "changed"
+        self.assertEqual("changed", lazy.title)
+        with self.assertRaises(AttributeError):
+            lazy.unknown_field
+
+    def test_message_subject(self):
+        message = lazy_class(Message)()
+        message.from_dict({
+            "messageid": "1",
+            "type": "feedback.comment",
+            "originator": load_mock('user_profile_devart')["user"],
+            "subject": {"comment": {"commentid": "2", "body": "Nice"}, "gallery": {"folderid": "3"}},
+        })
+        self.assertEqual("feedback.comment", message.messagetype)
+        self.assertEqual("devart", message.originator.username)
+        self.assertIsInstance(message.subject["comment"], Comment)
+        self.assertEqual("Nice", message.subject["comment"].body)
+        self.assertEqual({"folderid": "3"}, message.subject["gallery"])
+        self.assertEqual(None, message.deviation)
+
+    def test_pickle(self):
+        lazy = LazyDeviation()
+        lazy.from_dict(load_mock('deviation'))
+        lazy.title
+        copy = pickle.loads(pickle.dumps(lazy.hydrate(), 2))
+        self.assertEqual(lazy.title, copy.title)
+        self.assertEqual(lazy.author.username, copy.author.username)
+
+    def test_api(self):
+        server = StubServer(items=30)
+        server.start()
+        self.addCleanup(server.stop)
+        da = deviantart.Api("client", "secret", lazy=True)
+        server.configure(da)
+
+        results = da.browse(limit=10)["results"]
+        self.assertEqual(10, len(results))
+        self.assertIsInstance(results[0], lazy_class(Deviation))
+        self.assertEqual("Synthetic deviation 0", results[0].title)
+        self.assertIsInstance(da.get_user("devart"), lazy_class(User))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+from __future__ import absolute_import
+
+import threading
+import time
+import unittest
+
+import deviantart
+from deviantart.pagination import PageIterator, ParallelPageIterator, rejected_limit
+from deviantart.stub import StubServer
+from deviantart.tracing import InMemoryRecorder, Tracer
+
+
+class Listing(object):
+
+    def __init__(self, size, page_size=10, fail_at=None, latency=0):
+        self.size = size
+        self.page_size = page_size
+        self.fail_at = fail_at
+        self.latency = latency
+        self.offsets = []
+
+    def __call__(self, offset):
+        self.offsets.append(offset)
+        time.sleep(self.latency)
+        if offset == self.fail_at:
+            raise ValueError("page failed")
+        end = min(offset + self.page_size, self.size)
+        return {
+            "results": list(range(offset, end)),
+            "has_more": end < self.size,
+            "next_offset": end if end < self.size else None
+        }
+
+
+class PageIteratorTest(unittest.TestCase):
+
+    def test_all_items(self):
+        for prefetch in (0, 1, 3):
+            listing = Listing(35)
+            pages = PageIterator(listing, prefetch=prefetch)
+            self.assertEqual(list(range(35)), list(pages))
+            self.assertEqual([0, 10, 20, 30], listing.offsets)
+            self.assertEqual(4, pages.pages)
+            self.assertEqual(None, pages.next_offset)
+
+    def test_max_items(self):
+        listing = Listing(100)
+        pages = PageIterator(listing, offset=20, max_items=15)
+        self.assertEqual(list(range(20, 35)), list(pages))
+        self.assertEqual([20, 30], listing.offsets)
+        self.assertEqual(40, pages.next_offset)
+
+    def test_bounded_buffering(self):
+        listing = Listing(1000)
+        pages = PageIterator(listing, prefetch=2)
+        self.assertEqual(0, next(pages))
+        time.sleep(0.2)
+        # the page being consumed, two buffered and one waiting to be buffered
+        self.assertEqual(4, len(listing.offsets))
+        pages.close()
+
+    def test_errors_are_raised(self):
+        pages = PageIterator(Listing(50, fail_at=20))
+        self.assertEqual(list(range(20)), [next(pages) for _ in range(20)])
+        with self.assertRaises(ValueError):
+            next(pages)
+
+    def test_closed_iterator_ends(self):
+        for prefetch in (0, 2):
+            pages = PageIterator(Listing(100), prefetch=prefetch)
+            self.assertEqual(0, next(pages))
+            pages.close()
+            self.assertEqual(list(range(1, 10)), list(pages))
+            self.assertEqual([], list(pages))
+
+        with PageIterator(Listing(100)) as pages:
+            next(pages)
+        self.assertEqual(9, len(list(pages)))
+
+    def test_errors_end_the_iteration(self):
+        for prefetch in (0, 1):
+            listing = Listing(50, fail_at=20)
+            pages = PageIterator(listing, prefetch=prefetch)
+            with self.assertRaises(ValueError):
+                list(pages)
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    next(pages)
+            self.assertEqual([0, 10, 20], listing.offsets)
+
+
+class ParallelPageIteratorTest(unittest.TestCase):
+
+    def test_ordered_merge(self):
+        listing = Listing(200, page_size=7, latency=0.02)
+        start = time.time()
+        self.assertEqual(list(range(200)), list(ParallelPageIterator(listing, fanout=8)))
+        self.assertTrue(time.time() - start < 29 * 0.02 / 2)
+
+    def test_stops_at_end(self):
+        listing = Listing(95, latency=0.01)
+        self.assertEqual(95, len(list(ParallelPageIterator(listing, fanout=4))))
+        self.assertEqual(sorted(set(listing.offsets)), sorted(listing.offsets))
+        self.assertTrue(max(listing.offsets) < 95 + 4 * 10)
+
+    def test_max_items(self):
+        listing = Listing(1000)
+        self.assertEqual(list(range(25)), list(ParallelPageIterator(listing, max_items=25, fanout=8)))
+        self.assertEqual([0, 10, 20], sorted(listing.offsets))
+
+    def test_shifted_items_are_yielded_once(self):
+        items = [{"deviationid": "d{}".format(i)} for i in range(30)]
+
+        def fetch(offset):
+            page = items[offset:offset + 10]
+            if offset == 0:
+                # a new deviation pushes the others one offset further
+                items.insert(0, {"deviationid": "new"})
+            return {"results": page, "has_more": offset + 10 < len(items), "next_offset": offset + 10}
+
+        pages = ParallelPageIterator(fetch, fanout=2)
+        ids = [item["deviationid"] for item in pages]
+        self.assertEqual(["d{}".format(i) for i in range(30)], ids)
+        self.assertEqual(1, pages.duplicates)
+
+    def test_errors_are_raised(self):
+        pages = ParallelPageIterator(Listing(100, fail_at=50), fanout=4)
+        with self.assertRaises(ValueError):
+            list(pages)
+        with self.assertRaises(ValueError):
+            next(pages)
+
+
+class LimitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(items=60)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.da = deviantart.Api("client", "secret")
+        self.server.configure(self.da)
+
+    def test_rejected_limit(self):
+        error = {"error": "invalid_request", "error_details": {"limit": "limit must be between 1 and 24"}}
+        self.assertEqual(24, rejected_limit(error, 50))
+        self.assertEqual(25, rejected_limit({"error": "invalid_request", "error_details": {"limit": "too large"}}, 50))
+        self.assertEqual(None, rejected_limit({"error": "invalid_request", "error_details": {"offset": "too large"}}, 50))
+
+    def test_auto_limit(self):
+        self.assertEqual(24, self.da.max_limit("/gallery/all"))
+        self.assertEqual(24, self.da.max_limit("/gallery/234546F5-C9D1-A9B1-D823-47C4E3D2DB95"))
+        self.assertEqual(60, len(list(self.da.iter_gallery_all("devart"))))
+        # a token request and pages at the offsets 0, 24 and 48
+        self.assertEqual(3, self.server.stats()["requests"])
+
+    def test_clamp_and_remember(self):
+        self.server.max_limit = 20
+        self.assertEqual(20, len(self.da.get_gallery_all("devart", limit=50)["results"]))
+        self.assertEqual({"/gallery/all": 20}, self.da.page_limits)
+        self.assertEqual(2, self.server.stats()["requests"])
+
+        self.assertEqual(60, len(list(self.da.iter_gallery_all("devart"))))
+        self.assertEqual(5, self.server.stats()["requests"])
+
+
+class ApiPaginationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer(items=45)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.recorder = InMemoryRecorder()
+        self.da = deviantart.Api("client", "secret", tracer=Tracer(self.recorder))
+        self.server.configure(self.da)
+
+    def test_iter_gallery_all(self):
+        titles = [d.title for d in self.da.iter_gallery_all("devart", limit=20)]
+        self.assertEqual(["Synthetic deviation {}".format(i) for i in range(45)], titles)
+        self.assertEqual(3, self.server.stats()["requests"])
+
+    def test_fanout(self):
+        self.server.items = 95
+        titles = [d.title for d in self.da.iter_gallery_all("devart", fanout=4)]
+        self.assertEqual(["Synthetic deviation {}".format(i) for i in range(95)], titles)
+
+    def test_iter_comments(self):
+        comments = list(self.da.iter_comments(deviationid="234546F5-C9D1-A9B1-D823-47C4E3D2DB95", max_items=12, limit=10))
+        self.assertEqual(12, len(comments))
+        self.assertEqual(2, self.server.stats()["requests"])
+
+    def test_pages_are_children_of_open_span(self):
+        with self.da.span("crawl") as crawl:
+            items = list(self.da.iter_watchers("devart", limit=20, prefetch=2))
+        self.assertEqual(45, len(items))
+        watchers, = self.recorder.children(crawl)
+        self.assertEqual("get_watchers", watchers.name)
+        self.assertEqual(["/user/watchers/{username}"] * 3, [span.name for span in self.recorder.children(watchers)])
+
+    def test_pages_are_children_of_crawl_span(self):
+        for fanout in (None, 4):
+            self.recorder.clear()
+            self.assertEqual(45, len(list(self.da.iter_gallery_all("devart", limit=10, fanout=fanout))))
+            crawl, = self.recorder.find("get_gallery_all")
+            self.assertEqual(None, crawl.parent_id)
+            self.assertEqual(None, crawl.error)
+            pages = self.recorder.children(crawl)
+            self.assertTrue(len(pages) >= 5)
+            self.assertEqual(set(["/gallery/all"]), set(span.name for span in pages))
+            self.assertEqual(len(self.recorder.find("/gallery/all")), len(pages))
+
+    def test_closed_crawl_ends_span(self):
+        pages = self.da.iter_gallery_all("devart", limit=10)
+        next(pages)
+        self.assertEqual([], self.recorder.find("get_gallery_all"))
+        pages.close()
+        crawl, = self.recorder.find("get_gallery_all")
+        self.assertTrue(crawl.duration is not None)
+
+    def test_concurrent_iterators(self):
+        results = {}
+
+        def crawl(username):
+            results[username] = len(list(self.da.iter_gallery_all(username)))
+
+        threads = [threading.Thread(target=crawl, args=("user{}".format(i),)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual({"user0": 45, "user1": 45, "user2": 45}, results)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+from __future__ import absolute_import
+
+import unittest
+
+import deviantart
+from deviantart.api import DeviantartError
+from deviantart.ratelimit import RateLimiter, TokenBucket, parse_retry_after
+from deviantart.retry import RetryPolicy
+from deviantart.transport import Response, Transport
+from .helpers import mock_response
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class ThrottlingTransport(Transport):
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+
+    def request(self, method, url, body=None, headers=None):
+        status = self.statuses.pop(0)
+        if status == 429:
+            return Response(429, {"Retry-After": "2"}, b'{"error": "user_api_threshold", "error_description": "API threshold exceeded."}')
+        return Response(status, {}, b'{"results": []}')
+
+
+class RateLimitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_bucket_burst_and_refill(self):
+        bucket = TokenBucket(2, 3, clock=self.clock)
+        self.assertEqual([0, 0, 0], [bucket.reserve() for _ in range(3)])
+        self.assertAlmostEqual(0.5, bucket.reserve())
+        self.assertAlmostEqual(1.0, bucket.reserve())
+        self.clock.now += 10
+        self.assertEqual(0, bucket.reserve())
+
+    def test_families_have_own_buckets(self):
+        limiter = RateLimiter(rate=1, burst=1, rates={"browse": (5, 2)}, clock=self.clock)
+        self.assertEqual("browse", limiter.family("/browse/hot"))
+        self.assertEqual("user", limiter.family("/user/profile/devart"))
+        self.assertEqual(0, limiter.reserve("/browse/hot"))
+        self.assertEqual(0, limiter.reserve("/browse/newest"))
+        self.assertEqual(0, limiter.reserve("/deviation/x"))
+        self.assertEqual(0, limiter.reserve("/user/whoami"))
+        self.assertAlmostEqual(0.2, limiter.reserve("/browse/hot"))
+        self.assertAlmostEqual(1.0, limiter.reserve("/deviation/x"))
+
+    def test_aimd(self):
+        limiter = RateLimiter(rate=10, burst=1, clock=self.clock)
+        bucket = limiter.bucket("/browse/hot")
+        limiter.on_throttle("/browse/hot", retry_after=3)
+        self.assertAlmostEqual(5, bucket.rate)
+        self.assertTrue(limiter.reserve("/browse/hot") >= 3)
+        for _ in range(5):
+            limiter.on_success("/browse/hot")
+        self.assertTrue(5 < bucket.rate < 10)
+        for _ in range(1000):
+            limiter.on_success("/browse/hot")
+        self.assertAlmostEqual(10, bucket.rate)
+
+    def test_retry_after(self):
+        self.assertEqual(2.0, parse_retry_after("2"))
+        self.assertEqual(0.0, parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertEqual(None, parse_retry_after("soon"))
+        self.assertEqual(None, parse_retry_after(None))
+
+    @mock_response('token')
+    def test_api_reports_throttling(self):
+        limiter = RateLimiter(rate=10, burst=10, clock=self.clock)
+        da = deviantart.Api("", "", rate_limiter=limiter, retry_policy=RetryPolicy(max_retries=0))
+        da.auth()
+        da.transport = ThrottlingTransport([200, 429])
+        da.browse_dailydeviations()
+        with self.assertRaisesRegexp(DeviantartError, "threshold"):
+            da.browse_dailydeviations()
+        bucket = limiter.bucket("/browse/dailydeviations")
+        self.assertTrue(bucket.rate < 10)
+        self.assertTrue(bucket.blocked_until >= self.clock.now + 2)
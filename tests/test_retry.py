@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+
+import socket
+import unittest
+
+import deviantart
+from deviantart.api import DeviantartError
+from deviantart.retry import RetryPolicy
+from deviantart.transport import ConnectError, Response, Transport
+from .helpers import mock_response
+
+
+class ScriptedTransport(Transport):
+
+    """Plays back a list of statuses and exceptions"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.sent = 0
+
+    def request(self, method, url, body=None, headers=None):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        self.sent += 1
+        if outcome >= 400:
+            return Response(outcome, {}, b'{"error": "server_error", "error_description": "Internal error."}')
+        return Response(outcome, {}, b'{"success": true, "results": []}')
+
+
+class RetryTest(unittest.TestCase):
+
+    @mock_response('token')
+    def setUp(self):
+        self.policy = RetryPolicy(max_retries=3, backoff_base=0)
+        self.da = deviantart.Api("", "", retry_policy=self.policy)
+        self.da.auth()
+        self.da.standard_grant_type = "authorization_code"
+
+    def test_reads_are_retried(self):
+        self.da.transport = ScriptedTransport([socket.timeout(), 503, 200])
+        self.assertEqual([], self.da.browse_dailydeviations())
+        self.assertEqual(2, self.policy.retries)
+
+    def test_gives_up(self):
+        self.da.transport = ScriptedTransport([500] * 4)
+        with self.assertRaisesRegexp(DeviantartError, "Internal error"):
+            self.da.browse_dailydeviations()
+        self.assertEqual(3, self.policy.retries)
+        self.assertEqual(1, self.policy.given_up)
+
+    def test_writes_only_retried_before_sending(self):
+        self.da.transport = ScriptedTransport([ConnectError("refused"), 200])
+        self.da.fave("ignored")
+        self.assertEqual(1, self.policy.retries)
+
+        for outcome in [socket.timeout(), 503]:
+            self.da.transport = ScriptedTransport([outcome, 200])
+            with self.assertRaises(DeviantartError):
+                self.da.fave("ignored")
+        self.assertEqual(1, self.policy.retries)
+
+    def test_post_reads_are_retried(self):
+        self.da.transport = ScriptedTransport([502, 200])
+        self.da.get_users(["devart"])
+        self.assertEqual(1, self.policy.retries)
+
+    def test_budget(self):
+        policy = RetryPolicy(backoff_base=0, budget_ratio=0, budget_reserve=2)
+        self.da.retry_policy = policy
+        self.da.transport = ScriptedTransport([500] * 5)
+        with self.assertRaises(DeviantartError):
+            self.da.browse_dailydeviations()
+        self.assertEqual(2, policy.retries)
+        self.assertEqual(1, policy.budget_exhausted)
+        self.assertEqual({
+            "requests": 1,
+            "retries": 2,
+            "retry_time": 0.0,
+            "budget_exhausted": 1,
+            "given_up": 0
+        }, policy.stats())
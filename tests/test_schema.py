@@ -0,0 +1,75 @@
+from __future__ import absolute_import
+
+import unittest
+
+from deviantart.comment import Comment
+from deviantart.deviation import Deviation
+from deviantart.message import Message
+from deviantart.schema import decode, decode_many
+from deviantart.status import Status
+from deviantart.user import User
+from .test_models import load_mock
+
+
+class SchemaTest(unittest.TestCase):
+
+    def test_decode_matches_from_dict(self):
+        data = load_mock('deviation')
+        deviation = Deviation()
+        deviation.from_dict(data)
+        decoded = decode(Deviation, data)
+        for name in Deviation.__slots__:
+            if name != "author":
+                self.assertEqual(getattr(deviation, name), getattr(decoded, name), name)
+        self.assertEqual(deviation.author.username, decoded.author.username)
+
+    def test_decode_many(self):
+        user = load_mock('user_profile_devart')['user']
+        users = decode_many(User, [user, dict(user, username="someone")])
+        self.assertEqual(["devart", "someone"], [u.username for u in users])
+        self.assertEqual(user['type'], users[0].usertype)
+        self.assertEqual(None, users[0].geo)
+
+    def test_required_fields(self):
+        with self.assertRaises(KeyError):
+            decode(Deviation, {"deviationid": "1"})
+
+    def test_subclass(self):
+        class Journal(Deviation):
+            __slots__ = ()
+        journals = decode_many(Journal, [load_mock('deviation')])
+        self.assertIsInstance(journals[0], Journal)
+        self.assertIsInstance(journals[0].author, User)
+
+    def test_is_favourited(self):
+        deviation = decode(Deviation, dict(load_mock('deviation'), is_favourited=True, is_downloadable=False))
+        self.assertEqual((True, False), (deviation.is_favourited, deviation.is_downloadable))
+
+    def test_message(self):
+        message = decode(Message, {
+            "messageid": "1",
+            "type": "feedback.comment",
+            "orphaned": False,
+            "subject": {"comment": {"commentid": "2"}, "gallery": {"folderid": "3"}},
+            "template": "{originator} commented",
+            "template_items": ["originator"],
+        })
+        self.assertIsInstance(message.subject["comment"], Comment)
+        self.assertEqual({"folderid": "3"}, message.subject["gallery"])
+        self.assertEqual(["originator"], message.template_items)
+
+    def test_status_items(self):
+        status = decode(Status, {
+            "statusid": "1",
+            "items": [
+                {"type": "status", "status": {"statusid": "2"}},
+                {"type": "deviation", "deviation": load_mock('deviation')},
+            ],
+        })
+        self.assertEqual("2", status.items[0]["status"].statusid)
+        self.assertIsInstance(status.items[1]["deviation"], Deviation)
+        self.assertEqual("deviation", status.items[1]["type"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+from __future__ import absolute_import
+
+import threading
+import time
+import unittest
+
+import deviantart
+from deviantart.singleflight import SingleFlight
+from deviantart.transport import Response, Transport
+from .helpers import mock_response
+
+
+class SlowTransport(Transport):
+
+    def __init__(self, status=200):
+        self.status = status
+        self.urls = []
+
+    def request(self, method, url, body=None, headers=None):
+        self.urls.append(url)
+        time.sleep(0.05)
+        if self.status != 200:
+            return Response(self.status, {}, b'{"error": "invalid_request", "error_description": "User not found."}')
+        return Response(200, {}, b'{"user": {"userid": "1", "username": "devart", "usericon": "", "type": "admin"}}')
+
+
+def concurrently(func, n=16):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(func())) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_shares_result(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return "result"
+
+        self.assertEqual(["result"] * 8, concurrently(lambda: flight.do("key", slow), 8))
+        self.assertEqual(1, len(calls))
+        self.assertEqual({"leaders": 1, "absorbed": 7, "in_flight": 0}, flight.stats())
+
+    def test_shares_error(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.05)
+            raise ValueError("failed")
+
+        def call():
+            try:
+                flight.do("key", fail)
+            except ValueError as e:
+                return str(e)
+
+        self.assertEqual(["failed"] * 4, concurrently(call, 4))
+
+
+class ApiCoalescingTest(unittest.TestCase):
+
+    @mock_response('token')
+    def setUp(self):
+        self.da = deviantart.Api("", "")
+        self.da.auth()
+
+    def test_identical_reads_share_a_request(self):
+        transport = self.da.transport = SlowTransport()
+        users = concurrently(lambda: self.da.get_user("devart"))
+        self.assertEqual(1, len(transport.urls))
+        self.assertEqual(15, self.da.single_flight.absorbed)
+        # every caller still gets its own objects
+        self.assertEqual(16, len(set(id(user) for user in users)))
+
+    def test_errors_are_shared(self):
+        self.da.transport = SlowTransport(400)
+
+        def call():
+            try:
+                self.da.get_user("nobody")
+            except deviantart.api.DeviantartError as e:
+                return str(e)
+
+        self.assertEqual(["User not found."] * 4, concurrently(call, 4))
+
+    def test_disabled(self):
+        self.da.single_flight = None
+        transport = self.da.transport = SlowTransport()
+        concurrently(lambda: self.da.get_user("devart"), 4)
+        self.assertEqual(4, len(transport.urls))
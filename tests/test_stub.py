@@ -0,0 +1,75 @@
+from __future__ import absolute_import
+
+import threading
+import time
+import unittest
+
+import deviantart
+from deviantart.retry import RetryPolicy
+from deviantart.stub import StubServer
+
+
+class StubServerTest(unittest.TestCase):
+
+    def start(self, **kwargs):
+        self.server = StubServer(**kwargs)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.policy = RetryPolicy(max_retries=10, backoff_base=0.01, budget_reserve=100)
+        da = deviantart.Api("client", "secret", retry_policy=self.policy, coalesce=False)
+        self.server.configure(da)
+        return da
+
+    def test_pagination(self):
+        da = self.start(items=25)
+
+        titles = []
+        offset = 0
+        while True:
+            page = da.get_gallery_all("devart", offset=offset, limit=10)
+            titles.extend(d.title for d in page['results'])
+            if not page['has_more']:
+                break
+            offset = page['next_offset']
+
+        self.assertEqual(["Synthetic deviation {}".format(i) for i in range(25)], titles)
+        self.assertEqual({"requests": 3, "errors": 0, "throttled": 0, "tokens": 1}, self.server.stats())
+
+    def test_throttling(self):
+        da = self.start(rate_limit=20)
+
+        def browse():
+            for _ in range(10):
+                da.browse("newest")
+
+        threads = [threading.Thread(target=browse) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = self.server.stats()
+        self.assertTrue(stats["throttled"] > 0)
+        self.assertEqual(40, stats["requests"] - stats["throttled"])
+        self.assertEqual(stats["throttled"], self.policy.retries)
+
+    def test_error_rate(self):
+        da = self.start(error_rate=1.0)
+        self.policy.max_retries = 0
+
+        with self.assertRaises(deviantart.api.DeviantartError):
+            da.get_countries()
+        self.assertEqual(1, self.server.errors)
+
+    def test_latency(self):
+        da = self.start(latency=0.05)
+        da.get_countries()
+
+        start = time.time()
+        da.get_countries()
+        self.assertTrue(time.time() - start >= 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+from __future__ import absolute_import
+
+import json
+import threading
+import time
+import unittest
+
+try:
+    from urlparse import parse_qs
+except ImportError:
+    from urllib.parse import parse_qs
+
+import deviantart
+from deviantart.transport import Response, Transport
+
+
+class TokenTransport(Transport):
+
+    """Hands out numbered tokens and rejects all but the newest one"""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.grants = []
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, body=None, headers=None):
+        if url.endswith("/oauth2/token"):
+            time.sleep(self.delay)
+            params = parse_qs(body.decode('utf-8'))
+            with self._lock:
+                self.grants.append(params['grant_type'][0])
+                number = len(self.grants)
+            data = {"access_token": "token-{}".format(number), "expires_in": 3600, "refresh_token": "refresh-{}".format(number)}
+            return Response(200, {}, json.dumps(data).encode('utf-8'))
+
+        with self._lock:
+            self.calls.append(headers["Authorization"])
+            current = "Bearer token-{}".format(len(self.grants))
+        if headers["Authorization"] != current:
+            return Response(401, {}, b'{"error": "invalid_token", "error_description": "Expired oAuth2 client token.", "status": "error"}')
+        return Response(200, {}, b'{"results": []}')
+
+
+class TokenTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = TokenTransport()
+        self.da = deviantart.Api("", "", transport=self.transport)
+        self.da.auth()
+
+    def test_tracks_expiry(self):
+        self.assertEqual("token-1", self.da.access_token)
+        self.assertTrue(3590 < self.da.token_expires - time.time() <= 3600)
+
+    def test_single_flight_refresh(self):
+        # identical calls would share one request otherwise
+        self.da.single_flight = None
+        self.transport.delay = 0.05
+        self.da.token_expires = time.time() - 1
+
+        threads = [threading.Thread(target=self.da.browse_dailydeviations) for _ in range(64)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(["client_credentials"] * 2, self.transport.grants)
+        self.assertEqual(["Bearer token-2"] * 64, self.transport.calls)
+
+    def test_rejected_token_is_refreshed_and_replayed(self):
+        self.transport.grants.append("revoked elsewhere")
+        self.assertEqual([], self.da.browse_dailydeviations())
+        self.assertEqual(["Bearer token-1", "Bearer token-3"], self.transport.calls)
+
+    def test_background_refresh(self):
+        self.da.token_expires = time.time() + 10
+        self.da.browse_dailydeviations()
+        self.assertEqual("Bearer token-1", self.transport.calls[0])
+        self.da._background_refresh.join()
+        self.assertEqual("token-2", self.da.access_token)
+
+    def test_refresh_token_grant(self):
+        da = deviantart.Api("", "", standard_grant_type="authorization_code", transport=self.transport)
+        da.auth(code="code")
+        self.assertEqual("refresh-2", da.refresh_token)
+        da.token_expires = time.time() - 1
+        da.browse_dailydeviations()
+        self.assertEqual(["client_credentials", "authorization_code", "refresh_token"], self.transport.grants)
+        self.assertEqual("refresh-3", da.refresh_token)
@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import unittest
+
+import deviantart
+from deviantart.tokenstore import FileTokenStore
+from .test_token import TokenTransport
+
+
+class TokenStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "tokens.json")
+        self.transport = TokenTransport()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_lazy_authentication(self):
+        da = deviantart.Api("", "", transport=self.transport)
+        self.assertEqual([], self.transport.grants)
+        da.browse_dailydeviations()
+        self.assertEqual(["client_credentials"], self.transport.grants)
+
+    def test_reuses_stored_token(self):
+        deviantart.Api("id", "", transport=self.transport, token_store=FileTokenStore(self.path)).browse_dailydeviations()
+        da = deviantart.Api("id", "", transport=self.transport, token_store=FileTokenStore(self.path))
+        da.browse_dailydeviations()
+        self.assertEqual(["client_credentials"], self.transport.grants)
+        self.assertEqual("token-1", da.access_token)
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.path).st_mode))
+
+    def test_expired_token_is_not_reused(self):
+        store = FileTokenStore(self.path)
+        store.save("id:client_credentials", {"access_token": "old", "refresh_token": None, "expires": time.time() - 1})
+        da = deviantart.Api("id", "", transport=self.transport, token_store=store)
+        da.browse_dailydeviations()
+        self.assertEqual("token-1", da.access_token)
+        self.assertEqual("token-1", store.load("id:client_credentials")["access_token"])
+
+    def test_one_token_for_concurrent_clients(self):
+        # every client has its own store object and file descriptor, like
+        # separate processes would
+        self.transport.delay = 0.05
+        clients = [deviantart.Api("id", "", transport=self.transport, token_store=FileTokenStore(self.path)) for _ in range(16)]
+        threads = [threading.Thread(target=da.browse_dailydeviations) for da in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(["client_credentials"], self.transport.grants)
+        self.assertEqual(set(["token-1"]), set(da.access_token for da in clients))
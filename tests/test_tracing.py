@@ -0,0 +1,69 @@
+from __future__ import absolute_import
+
+import threading
+import unittest
+
+import deviantart
+from deviantart.retry import RetryPolicy
+from deviantart.tracing import InMemoryRecorder, Tracer, current_span
+from .helpers import mock_response
+from .test_retry import ScriptedTransport
+
+
+class TracerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.recorder = InMemoryRecorder()
+        self.tracer = Tracer(self.recorder)
+
+    def test_nesting(self):
+        with self.tracer.span("crawl") as crawl:
+            with self.tracer.span("page", offset=0) as page:
+                self.assertEqual(page, current_span())
+            self.assertEqual(crawl, current_span())
+        self.assertEqual(None, current_span())
+
+        self.assertEqual([page], self.recorder.children(crawl))
+        self.assertEqual(crawl.trace_id, page.trace_id)
+        self.assertEqual({"offset": 0}, page.attributes)
+        self.assertTrue(crawl.duration >= page.duration)
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span("crawl"):
+                raise ValueError("failed")
+        self.assertTrue(isinstance(self.recorder.find("crawl")[0].error, ValueError))
+
+    def test_threads_have_own_spans(self):
+        spans = []
+        with self.tracer.span("crawl"):
+            thread = threading.Thread(target=lambda: spans.append(current_span()))
+            thread.start()
+            thread.join()
+        self.assertEqual([None], spans)
+
+
+class ApiTracingTest(unittest.TestCase):
+
+    @mock_response('token')
+    def setUp(self):
+        self.recorder = InMemoryRecorder()
+        self.da = deviantart.Api("", "", tracer=Tracer(self.recorder), retry_policy=RetryPolicy(backoff_base=0))
+        self.da.auth()
+
+    @mock_response('deviation')
+    def test_requests_are_children(self):
+        with self.da.span("crawl", username="devart") as crawl:
+            self.da.get_deviation("234546F5-C9D1-A9B1-D823-47C4E3D2DB95")
+            self.da.get_deviation("5F4E3D2C-C9D1-A9B1-D823-47C4E3D2DB95")
+
+        requests = self.recorder.children(crawl)
+        self.assertEqual(["/deviation/{deviationid}"] * 2, [span.name for span in requests])
+        self.assertEqual(200, requests[0].attributes["status"])
+        self.assertEqual("/deviation/234546F5-C9D1-A9B1-D823-47C4E3D2DB95", requests[0].attributes["endpoint"])
+
+    def test_retries_are_recorded(self):
+        self.da.transport = ScriptedTransport([503, 200])
+        self.da.browse_dailydeviations()
+        span = self.recorder.find("/browse/dailydeviations")[0]
+        self.assertEqual([{"attempt": 0, "delay": 0.0, "status": 503, "error": None}], span.attributes["retries"])
@@ -0,0 +1,96 @@
+from __future__ import absolute_import
+
+import json
+import socket
+import threading
+import unittest
+
+from deviantart.transport import PooledTransport, UrllibTransport
+from .helpers import LocalServer
+
+
+class TransportTest(unittest.TestCase):
+
+    def setUp(self):
+        routes = dict(("/item/{}".format(i), (200, {"item": i})) for i in range(5))
+        routes["/large"] = (200, {"results": [{"title": "Jark Promo {}".format(i)} for i in range(5000)]})
+        routes["/slow"] = (200, {"item": "slow"})
+        self.server = LocalServer(routes, delays={"/slow": 1.5})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_pooled_reuses_connection(self):
+        transport = PooledTransport()
+        for i in range(5):
+            response = transport.request("GET", self.server.url + "/item/{}".format(i))
+            self.assertEqual(200, response.status)
+            self.assertEqual({"item": i}, json.loads(response.body.decode(response.charset)))
+        self.assertEqual(1, transport.connections_opened)
+        self.assertEqual(1, len(self.server.peers))
+        transport.close()
+
+    def test_pooled_shared_between_threads(self):
+        transport = PooledTransport(maxsize=2)
+
+        def worker():
+            for _ in range(10):
+                transport.request("GET", self.server.url + "/item/0")
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(40, len(self.server.requests))
+        self.assertTrue(transport.connections_opened < 40)
+        self.assertTrue(len(transport._pools[("http", "127.0.0.1", self.server.server_address[1])]) <= 2)
+        transport.close()
+
+    def test_idle_timeout(self):
+        transport = PooledTransport(idle_timeout=-1)
+        transport.request("GET", self.server.url + "/item/0")
+        transport.request("GET", self.server.url + "/item/0")
+        self.assertEqual(2, transport.connections_opened)
+        transport.close()
+
+    def test_timeout_is_not_sent_again(self):
+        transport = PooledTransport(timeout=0.5)
+        transport.request("GET", self.server.url + "/item/0")
+        with self.assertRaises(socket.timeout):
+            transport.request("POST", self.server.url + "/slow", b"body=1")
+        self.assertEqual(1, len([r for r in self.server.requests if r[1] == "/slow"]))
+        transport.close()
+
+    def test_closed_connection_is_sent_again(self):
+        transport = PooledTransport()
+        transport.request("GET", self.server.url + "/item/0")
+        for conn, _ in transport._pools[("http", "127.0.0.1", self.server.server_address[1])]:
+            # a connection the server has closed while it was idle
+            conn.sock.close()
+            conn.sock, peer = socket.socketpair()
+            peer.close()
+        response = transport.request("POST", self.server.url + "/item/1", b"body=1")
+        self.assertEqual(200, response.status)
+        self.assertEqual(2, transport.connections_opened)
+        self.assertEqual(1, len([r for r in self.server.requests if r[1] == "/item/1"]))
+        transport.close()
+
+    def test_error_status_is_returned(self):
+        for transport in [PooledTransport(), UrllibTransport()]:
+            response = transport.request("GET", self.server.url + "/missing")
+            self.assertEqual(404, response.status)
+            self.assertEqual("utf-8", response.charset)
+
+    def test_gzip(self):
+        expected = {"results": [{"title": "Jark Promo {}".format(i)} for i in range(5000)]}
+        for transport in [PooledTransport(), UrllibTransport()]:
+            response = transport.request("GET", self.server.url + "/large")
+            self.assertEqual(expected, json.loads(response.body.decode(response.charset)))
+            self.assertTrue(response.received < len(response.body) / 5)
+            self.assertNotIn("content-encoding", response.headers)
+            transport.close()
+
+    def test_compression_can_be_disabled(self):
+        response = PooledTransport(compress=False).request("GET", self.server.url + "/large")
+        self.assertEqual(len(response.body), response.received)